@@ -1,7 +1,7 @@
 from pydantic import AnyUrl, BeforeValidator, computed_field, field_validator, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 
 
 def parse_cors(value: str) -> list[str]:
@@ -37,13 +37,64 @@ class Settings(BaseSettings):
     MAX_CHAT_TURNS: int = 60
     MAX_RETRIES: int = 5
     E2B_API_KEY: Optional[str] = None
+    E2B_SYNC_MAX_CONCURRENCY: int = 4
+    E2B_POOL_SIZE: int = 1
+    E2B_POOL_TTL: int = 600
     LOG_LEVEL: str = "DEBUG"
+    # 日志格式（text / json），是否通过队列在后台线程写出，
+    # 载荷字段（LLM 响应、代码、消息内容）的截断长度与按类别的采样率，如 {"llm.response": 0.1}
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    LOG_ENQUEUE: bool = True
+    LOG_PAYLOAD_LIMIT: int = 2000
+    LOG_SAMPLE_RATES: dict[str, float] = {}
     DEBUG: bool = True
+    # 调试追踪：记录工具调用校验、记忆压缩等每轮执行的细节，默认关闭
+    DEBUG_TRACE: bool = False
     REDIS_URL: str = "redis://redis:6379/0"
     REDIS_MAX_CONNECTIONS: int = 10
     CORS_ALLOW_ORIGINS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = "*"
     SERVER_HOST: str = "http://localhost:8000"
     OPENALEX_EMAIL: Optional[str] = None
+    MAX_UPLOAD_FILE_MB: int = 500
+    MAX_TASK_UPLOAD_MB: int = 1024
+    BLOB_HARDLINK: bool = True
+    # 任务执行方式: local 在 API 进程内后台执行，celery 投递到 Redis 队列由 worker 执行
+    TASK_QUEUE: str = "local"
+    CELERY_BROKER_URL: Optional[str] = None
+    WORKER_CONCURRENCY: int = 2
+    TASK_TIMEOUT: int = 3600
+    TASK_VISIBILITY_TIMEOUT: int = 7200
+    # 同时执行的建模任务上限，以及单个用户同时执行的上限（0 表示不限制）
+    MAX_CONCURRENT_TASKS: int = 2
+    MAX_TASKS_PER_USER: int = 0
+    # EDA 完成后保存内核快照，恢复任务时直接加载，不必重放之前的代码
+    KERNEL_SNAPSHOT: bool = True
+    # 论文导出（pandoc）进程池大小，即同时执行的转换上限，以及单次转换的超时时间（秒）
+    EXPORT_WORKERS: int = 2
+    EXPORT_TIMEOUT: int = 300
+    # 进程内指标，通过 /metrics 以 Prometheus 文本格式输出
+    METRICS_ENABLED: bool = True
+    # 按任务的 span 追踪，写入工作目录下的 trace.jsonl，配置后同时发送到 OTLP/HTTP collector
+    TRACE_ENABLED: bool = True
+    TRACE_OTLP_ENDPOINT: Optional[str] = None
+    # LLM 后端：live 直接调用，record 调用的同时按任务录制响应，replay 回放录制的响应
+    LLM_BACKEND: Literal["live", "record", "replay"] = "live"
+    LLM_FIXTURE_DIR: str = "project/llm_fixtures"
+    # 回放使用的录制名称（不含 .jsonl），为空时回放与当前 task_id 同名的录制
+    LLM_FIXTURE: Optional[str] = None
+    # 回放时每次调用的固定延迟（秒）与模拟的生成速度（输出 token/秒，0 表示不模拟）
+    LLM_REPLAY_LATENCY: float = 0.0
+    LLM_REPLAY_TOKENS_PER_SECOND: float = 0.0
+    # 事件循环延迟监控：心跳间隔（秒），阻塞超过阈值（秒）时记录调用栈，
+    # 开启 LOOP_STALL_PROFILE 后阻塞期间持续采样并写出火焰图数据到 logs/stalls
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL: float = 0.1
+    LOOP_STALL_THRESHOLD: float = 0.5
+    LOOP_STALL_PROFILE: bool = False
+    # 管理接口（/admin/*）的访问令牌，通过请求头 X-Admin-Token 传入，未配置时不开放
+    ADMIN_TOKEN: Optional[str] = None
+    # 单次按需采样的最长时间（秒）
+    PROFILE_MAX_SECONDS: int = 60
 
     model_config = SettingsConfigDict(
         env_file=".env.dev",
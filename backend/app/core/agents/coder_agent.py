@@ -13,7 +13,6 @@ import json
 from json import JSONDecodeError
 from app.core.prompts import get_reflection_prompt, get_completion_check_prompt
 from app.core.functions import coder_tools
-from icecream import ic
 
 # TODO: 时间等待过久，stop 进程
 # TODO: 支持 cuda
@@ -30,6 +29,7 @@ class CoderAgent(Agent):  # 同样继承自Agent类
         max_chat_turns: int = settings.MAX_CHAT_TURNS,  # 最大聊天次数
         max_retries: int = settings.MAX_RETRIES,  # 最大反思次数
         code_interpreter: BaseCodeInterpreter = None,
+        data_profile: str = "",  # 预先统计的数据概况
     ) -> None:
         super().__init__(task_id, model, max_chat_turns)
         self.work_dir = work_dir
@@ -37,6 +37,7 @@ class CoderAgent(Agent):  # 同样继承自Agent类
         self.is_first_run = True
         self.system_prompt = CODER_PROMPT
         self.code_interpreter = code_interpreter
+        self.data_profile = data_profile
 
     async def run(self, prompt: str, subtask_title: str) -> CoderToWriter:
         logger.info(f"{self.__class__.__name__}:开始:执行子任务: {subtask_title}")
@@ -50,12 +51,22 @@ class CoderAgent(Agent):  # 同样继承自Agent类
                 {"role": "system", "content": self.system_prompt}
             )
             # 当前数据集文件
-            await self.append_chat_history(
-                {
-                    "role": "user",
-                    "content": f"当前文件夹下的数据集文件{get_current_files(self.work_dir, 'data')}",
-                }
-            )
+            dataset_info = f"当前文件夹下的数据集文件{get_current_files(self.work_dir, 'data')}"
+            parquet_files = get_current_files(self.work_dir, "parquet")
+            if parquet_files:
+                dataset_info += (
+                    f"\n数据文件已预先转换为 Parquet 副本{parquet_files}，"
+                    "内核中已定义 load_data(filename, sheet_name=None, columns=None)，"
+                    "请用 load_data('原始文件名') 读取数据，比 pd.read_excel/pd.read_csv 快得多；"
+                    "保存中间结果（如 cleaned_data.csv）请用 save_data(df, filename)，"
+                    "会同时写出 Parquet 副本，后续子任务同样用 load_data 读取"
+                )
+            if self.data_profile:
+                dataset_info += (
+                    "\n以下数据概况已预先统计（形状、类型、缺失值、描述统计、相关系数），"
+                    f"无需再编写代码重复获取：\n{self.data_profile}"
+                )
+            await self.append_chat_history({"role": "user", "content": dataset_info})
 
         # 添加 sub_task
         logger.info(f"添加子任务提示: {prompt}")
@@ -84,96 +95,121 @@ class CoderAgent(Agent):  # 同样继承自Agent类
                 f"Failed to complete task after {self.max_retries} attempts. Last error: {last_error_message}"
             )
 
-        # try:
         while (
             retry_count < self.max_retries
             and self.current_chat_turns < self.max_chat_turns
         ):
             self.current_chat_turns += 1
-            retry_count += 1 
             logger.info(f"当前对话轮次: {self.current_chat_turns}")
             response = await self.model.chat(
                 history=self.chat_history,
                 tools=coder_tools,
                 tool_choice="auto",
                 agent_name=self.__class__.__name__,
+                sub_title=subtask_title,
             )
+            message = response.choices[0].message
 
-            # 如果有工具调用
-            if (
-                hasattr(response.choices[0].message, "tool_calls")
-                and response.choices[0].message.tool_calls
-            ):
-                logger.info("检测到工具调用")
-                tool_call = response.choices[0].message.tool_calls[0]
-                tool_id = tool_call.id
-                # TODO: json JSON解析时遇到了无效的转义字符
-            # TODO: 处理JSON解析时遇到的无效转义字符
-            if tool_call.function.name == "execute_code":
-                logger.info(f"调用工具: {tool_call.function.name}")
-                try:
-                    # 处理可能的转义字符问题
-                    decoder = json.JSONDecoder(strict=False)
-                    args = decoder.decode(tool_call.function.arguments)
-                    code = args.get("code", "")
-                    logger.info("代码解析成功")
-                    if not code:
-                        raise ValueError("工具调用参数缺少code字段")
-                except JSONDecodeError as e:
-                    logger.error(f"JSON解析错误: {str(e)}，原始参数: {tool_call.function.arguments}")
-                    # 尝试手动修复常见转义问题（如单引号转双引号）
-                    fixed_arguments = tool_call.function.arguments.replace("'", '"')
-                    try:
-                        args = decoder.decode(fixed_arguments)
-                        code = args.get("code", "")
-                    except JSONDecodeError:
-                        raise RuntimeError(f"工具调用参数JSON格式错误，无法修复: {str(e)}")
-                    
-                    code = args.get("code", "") 
-                    logger.info("代码解析成功")
-
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON解析失败: {str(e)}")
-                    logger.error(f"错误位置: 行 {e.lineno}, 列 {e.colno}")
-                    logger.error(f"处理后的参数字符串: {arguments_str}")
-                    raise ValueError(f"工具调用参数格式错误（无效转义字符可能导致）: {e}")
-                except KeyError as e:
-                    logger.error(f"JSON结构错误: {str(e)}")
-                    raise ValueError(f"工具调用参数缺少必要字段: {e}")
-                except Exception as e:
-                    logger.error(f"解析工具参数时发生未知错误: {str(e)}")
-                    raise
-
-                await redis_manager.publish_message(
-                    self.task_id,
-                    InterpreterMessage(
-                        input={"code": code},
-                    ),
-                )
-
-            else:
-                # 没有工具调用，表示任务完成
+            # 没有工具调用，表示任务完成
+            if not getattr(message, "tool_calls", None):
                 logger.info("没有工具调用，任务完成")
+                await self.append_chat_history(
+                    {"role": "assistant", "content": message.content}
+                )
+                logger.info(f"{self.__class__.__name__}:完成:执行子任务: {subtask_title}")
                 return CoderToWriter(
-                    coder_response=response.choices[0].message.content,
+                    code_response=message.content,
                     created_images=await self.code_interpreter.get_created_images(
                         subtask_title
                     ),
                 )
 
-            if retry_count >= self.max_retries:
-                logger.error(f"超过最大尝试次数: {self.max_retries}")
-                return f"Failed to complete task after {self.max_retries} attempts. Last error: {last_error_message}"
+            logger.info("检测到工具调用")
+            tool_call = message.tool_calls[0]
+            # 更新对话历史 - 添加助手的响应，随后的 tool 消息必须紧跟其后
+            await self.append_chat_history(message.model_dump())
 
-            if self.current_chat_turns >= self.max_chat_turns:
-                logger.error(f"超过最大对话轮次: {self.max_chat_turns}")
-                return f"Reached maximum number of chat turns ({self.max_chat_turns}). Task incomplete."
+            code = ""
+            if tool_call.function.name != "execute_code":
+                error_occurred = True
+                error_message = f"未知的工具: {tool_call.function.name}"
+            else:
+                logger.info(f"调用工具: {tool_call.function.name}")
+                try:
+                    code = self._parse_code(tool_call.function.arguments)
+                except ValueError as e:
+                    error_occurred, error_message = True, str(e)
+                else:
+                    await redis_manager.publish_message(
+                        self.task_id,
+                        InterpreterMessage(
+                            input={"code": code},
+                        ),
+                    )
+                    text_to_gpt, error_occurred, error_message = (
+                        await self.code_interpreter.execute_code(code)
+                    )
+
+            if error_occurred:
+                # 执行出错，将错误反馈给模型修正
+                retry_count += 1
+                last_error_message = error_message
+                logger.warning(f"代码执行出错（第 {retry_count} 次）: {error_message[:300]}")
+                await self.append_chat_history(
+                    {
+                        "role": "tool",
+                        "content": error_message,
+                        "tool_call_id": tool_call.id,
+                        "name": tool_call.function.name,
+                    }
+                )
+                await self.append_chat_history(
+                    {"role": "user", "content": get_reflection_prompt(error_message, code)}
+                )
+            else:
+                await self.append_chat_history(
+                    {
+                        "role": "tool",
+                        "content": text_to_gpt,
+                        "tool_call_id": tool_call.id,
+                        "name": "execute_code",
+                    }
+                )
 
-        logger.info(f"{self.__class__.__name__}:完成:执行子任务: {subtask_title}")
+        if retry_count >= self.max_retries:
+            logger.error(f"超过最大尝试次数: {self.max_retries}")
+            await redis_manager.publish_message(
+                self.task_id,
+                SystemMessage(content="超过最大尝试次数", type="error"),
+            )
+            raise Exception(
+                f"Failed to complete task after {self.max_retries} attempts. Last error: {last_error_message}"
+            )
 
-        return CoderToWriter(
-            coder_response=response.choices[0].message.content,
-            created_images=await self.code_interpreter.get_created_images(
-                subtask_title
-            ),
+        logger.error(f"超过最大对话轮次: {self.max_chat_turns}")
+        await redis_manager.publish_message(
+            self.task_id,
+            SystemMessage(content="超过最大聊天次数", type="error"),
+        )
+        raise Exception(
+            f"Reached maximum number of chat turns ({self.max_chat_turns}). Task incomplete."
         )
+
+    @staticmethod
+    def _parse_code(arguments: str) -> str:
+        """解析 execute_code 的参数，允许字符串中出现未转义的控制字符"""
+        # 处理可能的转义字符问题
+        decoder = json.JSONDecoder(strict=False)
+        try:
+            args = decoder.decode(arguments)
+        except JSONDecodeError as e:
+            logger.error(f"JSON解析错误: {str(e)}，原始参数: {arguments}")
+            # 尝试手动修复常见转义问题（如单引号转双引号）
+            try:
+                args = decoder.decode(arguments.replace("'", '"'))
+            except JSONDecodeError:
+                raise ValueError(f"工具调用参数JSON格式错误，无法修复: {str(e)}")
+        code = args.get("code", "") if isinstance(args, dict) else ""
+        if not code:
+            raise ValueError("工具调用参数缺少code字段")
+        return code
@@ -3,37 +3,13 @@ from app.core.llm.llm import LLM
 from app.core.prompts import MODELER_PROMPT
 from app.schemas.A2A import CoordinatorToModeler, ModelerToCoder
 from app.utils.log_util import logger
+from app.utils.debug_trace import TRACE, trace
 import json
-from icecream import ic
+import re
 
 # TODO: 提问工具tool
 
 
-import re  # 新增：导入re模块
-import json
-from typing import Any
-
-
-# 假设以下是已定义的基础类和常量
-class Agent:
-    def __init__(self, task_id: str, model: Any, max_chat_turns: int):
-        self.task_id = task_id
-        self.model = model
-        self.max_chat_turns = max_chat_turns
-        self.chat_history = []
-    
-    async def append_chat_history(self, message: dict):
-        self.chat_history.append(message)
-
-class LLM:
-    async def chat(self, history: list, agent_name: str) -> Any:
-        # 模拟LLM聊天返回
-        return type('obj', (object,), {'choices': [type('obj', (object,), {'message': {'content': '{}'}})]})
-
-MODELER_PROMPT = "建模提示词"
-CoordinatorToModeler = type('CoordinatorToModeler', (object,), {'questions': {}})
-ModelerToCoder = type('ModelerToCoder', (object,), {'__init__': lambda self, questions_solution: setattr(self, 'questions_solution', questions_solution)})
-
 class ModelerAgent(Agent):  # 继承自Agent类
     def __init__(
         self,
@@ -74,7 +50,8 @@ class ModelerAgent(Agent):  # 继承自Agent类
             raise ValueError("返回的 JSON 字符串为空，请检查输入内容。")
         try:
             questions_solution = json.loads(json_str)
-            ic(questions_solution)
+            if TRACE:
+                trace(f"questions_solution: {questions_solution}")
             return ModelerToCoder(questions_solution=questions_solution)
         except json.JSONDecodeError as e:
             raise ValueError(f"JSON 解析错误: {e}")
@@ -10,7 +10,7 @@ from app.services.redis_manager import redis_manager
 from app.schemas.response import SystemMessage, WriterMessage
 import json
 from app.core.functions import writer_tools
-from icecream import ic
+from app.utils.debug_trace import TRACE, trace
 from app.schemas.A2A import WriterResponse
 
 
@@ -57,6 +57,15 @@ class WriterAgent(Agent):  # 同样继承自Agent类
             await self.append_chat_history(
                 {"role": "system", "content": self.system_prompt}
             )
+            # 任务开始时预取的文献，减少一次检索工具调用
+            if self.scholar and self.scholar.prefetched:
+                await self.append_chat_history(
+                    {
+                        "role": "user",
+                        "content": "以下是预先检索到的与题目相关的文献，写作时可直接引用：\n"
+                        + self.scholar.papers_to_str(self.scholar.prefetched),
+                    }
+                )
 
         if available_images:
             self.available_images = available_images
@@ -107,7 +116,8 @@ class WriterAgent(Agent):  # 同样继承自Agent类
 
                 # 更新对话历史 - 添加助手的响应
                 await self.append_chat_history(response.choices[0].message.model_dump())
-                ic(response.choices[0].message.model_dump())
+                if TRACE:
+                    trace(f"assistant message: {response.choices[0].message.model_dump()}")
 
                 try:
                     papers = await self.scholar.search_papers(query)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+from typing import Any
+from app.services.redis_manager import redis_manager
+from app.utils.log_util import logger
+
+# 断点文件名，保存在任务工作目录中
+CHECKPOINT_NAME = "checkpoint.json"
+# Redis 中断点的过期时间，与 task_id 一致
+CHECKPOINT_TTL = 36000
+
+
+def _to_jsonable(obj: Any):
+    # 对话历史中可能包含 litellm 的 Message 等对象
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+class WorkflowCheckpoint:
+    """工作流断点
+
+    每个阶段完成后保存一次，同时写入工作目录和 Redis:
+    - problem: 任务输入
+    - coordinator / modeler: CoordinatorToModeler / ModelerToCoder
+    - coder / writer: {key: CoderToWriter} / {key: WriterResponse}（即 UserOutput.res）
+    - agents: {agent 名称: chat_history}
+    - interpreter: 各 section 的代码输出、已生成图片与执行成功的代码单元
+    - feedback / rerun_code: 重新生成章节时用户的修改意见与需要重新运行代码的章节
+    """
+
+    def __init__(self, task_id: str, work_dir: str):
+        self.task_id = task_id
+        self.path = os.path.join(work_dir, CHECKPOINT_NAME)
+        self.resumed = False
+        self.data: dict[str, Any] = {
+            "problem": None,
+            "coordinator": None,
+            "modeler": None,
+            "coder": {},
+            "writer": {},
+            "agents": {},
+            "interpreter": {},
+            "feedback": {},
+            "rerun_code": [],
+            "done": False,
+        }
+
+    @property
+    def redis_key(self) -> str:
+        return f"task_checkpoint:{self.task_id}"
+
+    async def load(self) -> bool:
+        """读取断点，优先读取工作目录，不存在时读取 Redis"""
+        saved = None
+        if os.path.exists(self.path):
+            saved = await asyncio.to_thread(self._read)
+        else:
+            try:
+                client = await redis_manager.get_client()
+                raw = await client.get(self.redis_key)
+                saved = json.loads(raw) if raw else None
+            except Exception as e:
+                logger.error(f"[{self.task_id}] 从 Redis 读取断点失败: {str(e)}")
+        if not saved:
+            return False
+        self.data.update(saved)
+        self.resumed = True
+        return True
+
+    def _read(self) -> dict:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, stage: str, key: str | None = None) -> Any:
+        value = self.data.get(stage)
+        if key is None or not isinstance(value, dict):
+            return value
+        return value.get(key)
+
+    def completed(self) -> list[str]:
+        """已完成的阶段，用于日志"""
+        stages = [s for s in ("coordinator", "modeler") if self.data.get(s)]
+        stages += [f"coder:{k}" for k in self.data["coder"]]
+        stages += [f"writer:{k}" for k in self.data["writer"]]
+        return stages
+
+    def restore_agent(self, name: str, agent) -> None:
+        """恢复 agent 的对话历史"""
+        history = self.data["agents"].get(name)
+        if not history:
+            return
+        agent.chat_history = history
+        if hasattr(agent, "is_first_run"):
+            agent.is_first_run = False
+
+    async def save(
+        self,
+        stage: str,
+        value: Any,
+        key: str | None = None,
+        agents: dict[str, Any] | None = None,
+        interpreter=None,
+    ) -> None:
+        """记录阶段结果并持久化
+
+        Args:
+            stage: 阶段名称
+            value: 阶段结果（可 JSON 序列化）
+            key: coder / writer 阶段的子任务名称
+            agents: 需要保存对话历史的 {名称: agent}
+            interpreter: 需要保存状态的代码解释器
+        """
+        if key is None:
+            self.data[stage] = value
+        else:
+            self.data[stage][key] = value
+        for name, agent in (agents or {}).items():
+            self.data["agents"][name] = agent.chat_history
+        if interpreter is not None:
+            self.data["interpreter"] = interpreter.get_state()
+        await self.persist()
+        logger.info(f"[{self.task_id}] 保存断点: {stage}" + (f":{key}" if key else ""))
+
+    def discard(self, stage: str, key: str) -> None:
+        """删除 coder / writer 阶段中某个子任务的结果，恢复时重新执行"""
+        self.data[stage].pop(key, None)
+
+    async def persist(self) -> None:
+        payload = json.dumps(self.data, ensure_ascii=False, default=_to_jsonable)
+        await asyncio.to_thread(self._write, payload)
+        try:
+            client = await redis_manager.get_client()
+            await client.set(self.redis_key, payload, ex=CHECKPOINT_TTL)
+        except Exception as e:
+            # 工作目录中的断点已保存，Redis 失败不影响任务
+            logger.error(f"[{self.task_id}] 断点写入 Redis 失败: {str(e)}")
+
+    def _write(self, payload: str) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
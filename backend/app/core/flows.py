@@ -1,10 +1,24 @@
 from app.models.user_output import UserOutput
-from app.tools.base_interpreter import BaseCodeInterpreter
-from app.core.agents.modeler_agent import ModelerToCoder
-from typing import Dict, List, Union
+from app.schemas.A2A import ModelerToCoder
+from app.utils.data_profile import summarize_data_files
+from typing import TYPE_CHECKING, Dict, List, Union
+
+if TYPE_CHECKING:
+    # 解释器依赖 nbformat 等，路由只用到 Flows 的静态方法，不在导入时加载
+    from app.tools.base_interpreter import BaseCodeInterpreter
 
 
 class Flows:
+    # 写作流程中依赖模型求解结果（get_model_build_solve，即各 ques 章节）的部分
+    SOLVE_DEPENDENT_SECTIONS = [
+        "firstPage",
+        "RepeatQues",
+        "analysisQues",
+        "modelAssumption",
+        "symbol",
+        "judge",
+    ]
+
     def __init__(self, questions: Dict[str, Union[str, int]]):
         self.flows: Dict[str, Dict] = {}
         self.questions: Dict[str, Union[str, int]] = questions  # 保持原始类型定义
@@ -29,7 +43,8 @@ class Flows:
         self, 
         questions: Dict[str, Union[str, int]], 
         modeler_response: ModelerToCoder,
-        code_interpreter: BaseCodeInterpreter  # 新增：用于获取数据集列表，解决TODO问题
+        code_interpreter: "BaseCodeInterpreter",  # 新增：用于获取数据集列表，解决TODO问题
+        data_profile: Dict | None = None,  # 预先统计的数据概况
     ) -> Dict[str, Dict[str, str]]:
         """修正：补充数据集获取逻辑，修复参数依赖问题"""
         # 筛选ques相关配置（保持原始筛选逻辑）
@@ -52,8 +67,14 @@ class Flows:
         }
 
         # 修正EDA流程：替换TODO，通过code_interpreter获取实际数据集
-        eda_files = code_interpreter.list_files()  # 获取当前目录所有文件
-        eda_data_info = ", ".join([f"'{f}'" for f in eda_files if f.endswith(('.csv', '.xlsx', '.txt'))])  # 筛选数据文件
+        if data_profile:
+            # 数据概况已在代码手上下文中给出，这里只列出文件与规模
+            eda_data_info = summarize_data_files(data_profile)
+            eda_profile_note = "不需要复杂模型，仅需数据预处理与可视化代码；数据概况（形状、类型、缺失值、描述统计、相关系数）已预先给出，不要重复编写获取这些信息的代码"
+        else:
+            eda_files = code_interpreter.list_files()  # 获取当前目录所有文件
+            eda_data_info = ", ".join([f"'{f}'" for f in eda_files if f.endswith(('.csv', '.xlsx', '.txt'))])  # 筛选数据文件
+            eda_profile_note = "不需要复杂模型，仅需数据预处理与可视化代码"
 
         flows = {
             "eda": {
@@ -64,7 +85,7 @@ class Flows:
                     2. 描述性统计：计算均值、方差、极值、相关性系数并输出
                     3. 可视化：绘制变量分布直方图、相关性热力图
                     4. 结果保存：清洗后的数据保存为'cleaned_data.csv'到当前目录
-                    注意：不需要复杂模型，仅需数据预处理与可视化代码
+                    注意：{eda_profile_note}
                 """,
             },
             **ques_flow,
@@ -126,7 +147,7 @@ class Flows:
         self,
         key: str,
         coder_response: str,
-        code_interpreter: BaseCodeInterpreter,
+        code_interpreter: "BaseCodeInterpreter",
         config_template: Dict[str, str],
     ) -> str:
         """修正：处理代码输出为空的情况，优化参数传递逻辑"""
@@ -174,6 +195,13 @@ class Flows:
             return writer_prompt[key]
         raise ValueError(f"未知的任务类型: {key}，请检查流程配置")
 
+    @classmethod
+    def get_dependents(cls, key: str) -> List[str]:
+        """重新生成某一章节时需要一并重写的章节"""
+        if key.startswith("ques"):
+            return list(cls.SOLVE_DEPENDENT_SECTIONS)
+        return []
+
     def get_questions_quesx_keys(self) -> List[str]:
         """修正：明确返回类型，保持筛选逻辑不变"""
         return list(self.get_questions_quesx().keys())
@@ -1,7 +1,7 @@
 import json
 from app.utils.common_utils import transform_link, split_footnotes
-from app.utils.log_util import logger
-import time
+from app.utils.log_util import log_payload, logger
+import asyncio
 from jsonschema import validate  # 需导入
 from app.schemas.response import (
     CoderMessage,
@@ -10,7 +10,11 @@ from app.schemas.response import (
     SystemMessage,
     CoordinatorMessage,
 )
+from app.services.metrics import LLM_LATENCY, LLM_RETRIES
 from app.services.redis_manager import redis_manager
+from app.services.tracing import tracer
+from app.core.llm.replay import llm_fixtures
+from app.config.setting import settings
 from litellm import acompletion
 import litellm
 from litellm.exceptions import (
@@ -22,7 +26,7 @@ from litellm.exceptions import (
 )
 from app.schemas.enums import AgentType
 from app.utils.track import agent_metrics
-from icecream import ic
+from app.utils.debug_trace import TRACE, trace
 
 litellm.callbacks = [agent_metrics]
 
@@ -52,6 +56,31 @@ class LLM:
         top_p: float | None = None,
         agent_name: AgentType = AgentType.SYSTEM,
         sub_title: str | None = None,
+    ):
+        # 一次 chat 即 agent 的一个轮次，其中每次请求（含重试）为子 span
+        name = getattr(agent_name, "value", agent_name)
+        with tracer.span(f"{name} turn", "agent", agent=name, stage=sub_title):
+            return await self._chat(
+                history,
+                tools,
+                tool_choice,
+                max_retries,
+                retry_delay,
+                top_p,
+                agent_name,
+                sub_title,
+            )
+
+    async def _chat(
+        self,
+        history: list,
+        tools: list,
+        tool_choice: str,
+        max_retries: int,
+        retry_delay: float,
+        top_p: float | None,
+        agent_name: AgentType,
+        sub_title: str | None,
     ):
         logger.info(f"subtitle是:{sub_title}")
 
@@ -65,7 +94,13 @@ class LLM:
             "messages": history,
             "stream": False,
             "top_p": top_p,
-            "metadata": {"agent_name": agent_name},
+            # 供 litellm 回调写入任务的用量台账
+            "metadata": {
+                "task_id": self.task_id,
+                "agent_name": getattr(agent_name, "value", agent_name),
+                "stage": sub_title,
+                "attempt": 0,
+            },
         }
 
         if tools:
@@ -78,10 +113,15 @@ class LLM:
         if self.base_url:
             kwargs["base_url"] = self.base_url
 
+        metric_labels = {"agent": kwargs["metadata"]["agent_name"], "model": self.model}
         for attempt in range(max_retries):
+            kwargs["metadata"]["attempt"] = attempt
             try:
-                response = await acompletion(**kwargs)
-                logger.info(f"API返回: {response}")
+                with LLM_LATENCY.time(**metric_labels), tracer.span(
+                    "llm", "llm", model=self.model, attempt=attempt
+                ):
+                    response = await self._completion(kwargs)
+                log_payload("llm.response", "API返回:", response)
                 if not response or not hasattr(response, "choices"):
                     raise ValueError("无效的API响应")
                 self.chat_count += 1
@@ -137,17 +177,32 @@ class LLM:
                 )
 
             if attempt < max_retries - 1:
-                time.sleep(retry_delay * (attempt + 1))
+                LLM_RETRIES.inc(**metric_labels)
+                await asyncio.sleep(retry_delay * (attempt + 1))
                 continue
             logger.debug(f"请求参数: {kwargs}")
             raise
 
+    async def _completion(self, kwargs: dict):
+        """按 LLM_BACKEND 调用模型、录制或回放响应"""
+        if settings.LLM_BACKEND == "replay":
+            response = await llm_fixtures.replay(self.task_id, kwargs)
+            # 经 mock_response 返回录制的响应，litellm 回调照常记录用量
+            return await acompletion(
+                **kwargs, mock_response=response, custom_llm_provider="openai"
+            )
+        response = await acompletion(**kwargs)
+        if settings.LLM_BACKEND == "record":
+            await llm_fixtures.record(self.task_id, kwargs, response)
+        return response
+
     def _validate_and_fix_tool_calls(self, history: list) -> list:
         """验证并修复工具调用完整性"""
         if not history:
             return history
 
-        ic(f"🔍 开始验证工具调用，历史消息数量: {len(history)}")
+        if TRACE:
+            trace(f"🔍 开始验证工具调用，历史消息数量: {len(history)}")
 
         fixed_history = []
         i = 0
@@ -156,14 +211,16 @@ class LLM:
             msg = history[i]
 
             if isinstance(msg, dict) and "tool_calls" in msg and msg["tool_calls"]:
-                ic(f"📞 发现tool_calls消息在位置 {i}")
+                if TRACE:
+                    trace(f"📞 发现tool_calls消息在位置 {i}")
 
                 valid_tool_calls = []
                 invalid_tool_calls = []
 
                 for tool_call in msg["tool_calls"]:
                     tool_call_id = tool_call.get("id")
-                    ic(f"  检查tool_call_id: {tool_call_id}")
+                    if TRACE:
+                        trace(f"  检查tool_call_id: {tool_call_id}")
 
                     if tool_call_id:
                         found_response = False
@@ -172,34 +229,40 @@ class LLM:
                                 history[j].get("role") == "tool"
                                 and history[j].get("tool_call_id") == tool_call_id
                             ):
-                                ic(f"  ✅ 找到匹配响应在位置 {j}")
+                                if TRACE:
+                                    trace(f"  ✅ 找到匹配响应在位置 {j}")
                                 found_response = True
                                 break
 
                         if found_response:
                             valid_tool_calls.append(tool_call)
                         else:
-                            ic(f"  ❌ 未找到匹配响应: {tool_call_id}")
+                            if TRACE:
+                                trace(f"  ❌ 未找到匹配响应: {tool_call_id}")
                             invalid_tool_calls.append(tool_call)
 
                 if valid_tool_calls:
                     fixed_msg = msg.copy()
                     fixed_msg["tool_calls"] = valid_tool_calls
                     fixed_history.append(fixed_msg)
-                    ic(
-                        f"  🔧 保留 {len(valid_tool_calls)} 个有效tool_calls，移除 {len(invalid_tool_calls)} 个无效的"
-                    )
+                    if TRACE:
+                        trace(
+                            f"  🔧 保留 {len(valid_tool_calls)} 个有效tool_calls，移除 {len(invalid_tool_calls)} 个无效的"
+                        )
                 else:
                     cleaned_msg = {k: v for k, v in msg.items() if k != "tool_calls"}
                     if cleaned_msg.get("content"):
                         fixed_history.append(cleaned_msg)
-                        ic(f"  🔧 移除所有tool_calls，保留消息内容")
+                        if TRACE:
+                            trace(f"  🔧 移除所有tool_calls，保留消息内容")
                     else:
-                        ic(f"  🗑️ 完全移除空的tool_calls消息")
+                        if TRACE:
+                            trace(f"  🗑️ 完全移除空的tool_calls消息")
 
             elif isinstance(msg, dict) and msg.get("role") == "tool":
                 tool_call_id = msg.get("tool_call_id")
-                ic(f"🔧 检查tool响应消息: {tool_call_id}")
+                if TRACE:
+                    trace(f"🔧 检查tool响应消息: {tool_call_id}")
 
                 found_call = False
                 for j in range(len(fixed_history)):
@@ -212,9 +275,11 @@ class LLM:
 
                 if found_call:
                     fixed_history.append(msg)
-                    ic(f"  ✅ 保留有效的tool响应")
+                    if TRACE:
+                        trace(f"  ✅ 保留有效的tool响应")
                 else:
-                    ic(f"  🗑️ 移除孤立的tool响应: {tool_call_id}")
+                    if TRACE:
+                        trace(f"  🗑️ 移除孤立的tool响应: {tool_call_id}")
 
             else:
                 fixed_history.append(msg)
@@ -222,9 +287,11 @@ class LLM:
             i += 1
 
         if len(fixed_history) != len(history):
-            ic(f"🔧 修复完成: {len(history)} -> {len(fixed_history)} 条消息")
+            if TRACE:
+                trace(f"🔧 修复完成: {len(history)} -> {len(fixed_history)} 条消息")
         else:
-            ic(f"✅ 验证通过，无需修复")
+            if TRACE:
+                trace(f"✅ 验证通过，无需修复")
 
         return fixed_history
 
@@ -272,12 +339,18 @@ async def simple_chat(model: LLM, history: list) -> str:
         "model": model.model,
         "messages": history,
         "stream": False,
+        "metadata": {
+            "task_id": model.task_id,
+            "agent_name": "memory",
+            "stage": None,
+            "attempt": 0,
+        },
     }
 
     if model.base_url:
         kwargs["base_url"] = model.base_url
 
-    response = await acompletion(**kwargs)
+    response = await model._completion(kwargs)
     return response.choices[0].message.content
     
     tool_schemas = {
@@ -292,6 +365,7 @@ async def simple_chat(model: LLM, history: list) -> str:
                 args = json.loads(tool_call["function"]["arguments"])
                 validate(instance=args, schema=tool_schemas[func_name])
             except Exception as e:
-                ic(f"  ❌ 参数无效: {e}")
+                if TRACE:
+                    trace(f"  ❌ 参数无效: {e}")
                 invalid_tool_calls.append(tool_call)
                 continue
\ No newline at end of file
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+from app.config.setting import settings
+from app.utils.log_util import logger
+
+
+class ReplayExhausted(LookupError):
+    """回放时录制的响应已用完"""
+
+
+def request_hash(messages: list | None) -> str:
+    """最后一条消息的哈希，仅用于回放时提示请求与录制时不一致"""
+    if not messages:
+        return ""
+    last = messages[-1]
+    if hasattr(last, "model_dump"):
+        last = last.model_dump()
+    payload = json.dumps(last, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class LLMFixtureStore:
+    """LLM 响应的录制与确定性回放
+
+    录制（LLM_BACKEND=record）：每次成功的 acompletion 响应（含 tool_calls 与 usage）
+    按任务追加到 {fixture_dir}/{task_id}.jsonl，每行记录 agent、stage 及其在该
+    (agent, stage) 下的序号。
+    回放（LLM_BACKEND=replay）：按 (agent, stage) 依次取出录制的响应，经 litellm 的
+    mock_response 返回，用量回调、指标与追踪照常记录；可配置固定延迟与按输出 token
+    计算的生成速度模拟真实耗时。多个任务可同时回放同一份录制，各自维护进度。
+    """
+
+    def __init__(
+        self,
+        fixture_dir: str,
+        fixture: str | None = None,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+    ):
+        self.fixture_dir = fixture_dir
+        self.fixture = fixture
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        # 已加载的录制 {名称: {(agent, stage): [记录, ...]}}
+        self._fixtures: dict[str, dict[tuple[str, str], list[dict]]] = {}
+        # 录制与回放进度 {task_id: {(agent, stage): 序号}}
+        self._cursors: dict[str, dict[tuple[str, str], int]] = {}
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # celery worker 中每个任务使用新的事件循环
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.fixture_dir, f"{name}.jsonl")
+
+    @staticmethod
+    def _read_entries(path: str) -> list[dict]:
+        """读取录制文件，跳过进程在写出途中退出时留下的半行"""
+        entries = []
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"录制文件 {path} 中有无法解析的行，已跳过")
+        return entries
+
+    def _recorded_cursors(self, task_id: str) -> dict[tuple[str, str], int]:
+        """已有录制中每个 (agent, stage) 的下一个序号，恢复的任务接着录制时不会重复"""
+        path = self.path(task_id)
+        cursors: dict[tuple[str, str], int] = {}
+        if not os.path.exists(path):
+            return cursors
+        # 结束上次留下的半行，新记录从新的一行开始
+        with open(path, "rb+") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        for entry in self._read_entries(path):
+            key = (entry["agent"], entry["stage"])
+            cursors[key] = max(cursors.get(key, 0), entry["seq"] + 1)
+        return cursors
+
+    def _next_seq(self, task_id: str, key: tuple[str, str]) -> int:
+        cursors = self._cursors.setdefault(task_id, {})
+        seq = cursors.get(key, 0)
+        cursors[key] = seq + 1
+        return seq
+
+    async def record(self, task_id: str, kwargs: dict, response) -> None:
+        metadata = kwargs.get("metadata") or {}
+        key = (metadata.get("agent_name") or "unknown", metadata.get("stage") or "-")
+        async with self._get_lock():
+            if task_id not in self._cursors:
+                self._cursors[task_id] = await asyncio.to_thread(
+                    self._recorded_cursors, task_id
+                )
+            entry = {
+                "agent": key[0],
+                "stage": key[1],
+                "seq": self._next_seq(task_id, key),
+                "model": kwargs.get("model"),
+                "request_hash": request_hash(kwargs.get("messages")),
+                "response": response.model_dump(),
+            }
+            line = json.dumps(entry, ensure_ascii=False, default=str)
+            await asyncio.to_thread(self._append, self.path(task_id), line)
+
+    @staticmethod
+    def _append(path: str, line: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def load(self, name: str) -> dict[tuple[str, str], list[dict]]:
+        if name not in self._fixtures:
+            entries: dict[tuple[str, str], list[dict]] = {}
+            for entry in self._read_entries(self.path(name)):
+                entries.setdefault((entry["agent"], entry["stage"]), []).append(entry)
+            for items in entries.values():
+                items.sort(key=lambda e: e["seq"])
+            self._fixtures[name] = entries
+        return self._fixtures[name]
+
+    async def replay(self, task_id: str, kwargs: dict) -> dict:
+        """取出下一条录制的响应，并按配置等待模拟的耗时"""
+        metadata = kwargs.get("metadata") or {}
+        key = (metadata.get("agent_name") or "unknown", metadata.get("stage") or "-")
+        name = self.fixture or task_id
+        entries = await asyncio.to_thread(self.load, name)
+        # 重试不会被录制，同一次调用的重试沿用同一条记录
+        cursors = self._cursors.get(task_id, {})
+        if metadata.get("attempt") and cursors.get(key):
+            cursors[key] -= 1
+        seq = self._next_seq(task_id, key)
+        items = entries.get(key, [])
+        if seq >= len(items):
+            raise ReplayExhausted(f"录制 {name} 中 {key[0]}/{key[1]} 只有 {len(items)} 条响应")
+        entry = items[seq]
+        if entry.get("request_hash") != request_hash(kwargs.get("messages")):
+            logger.debug(f"[{task_id}] 回放 {key[0]}/{key[1]}#{seq} 的请求与录制时不同")
+
+        response = entry["response"]
+        completion_tokens = (response.get("usage") or {}).get("completion_tokens") or 0
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += completion_tokens / self.tokens_per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return response
+
+    def release(self, task_id: str) -> None:
+        self._cursors.pop(task_id, None)
+        # 未指定共享录制时按任务加载的录制，任务结束后不再需要
+        if task_id != self.fixture:
+            self._fixtures.pop(task_id, None)
+
+
+llm_fixtures = LLMFixtureStore(
+    fixture_dir=settings.LLM_FIXTURE_DIR,
+    fixture=settings.LLM_FIXTURE,
+    latency=settings.LLM_REPLAY_LATENCY,
+    tokens_per_second=settings.LLM_REPLAY_TOKENS_PER_SECOND,
+)
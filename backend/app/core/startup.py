@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Coroutine
+from app.utils.log_util import logger
+
+
+class StartupStages:
+    """任务启动阶段
+
+    沙箱/内核启动、文献预取等与 LLM 调用无关的准备工作在任务开始时
+    以后台任务并行启动，首次用到时再等待结果；记录每个阶段的耗时
+    以及主流程为等待它而阻塞的时间。
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._optional: set[str] = set()
+        self._cleanups: dict[str, Callable[[Any], Awaitable[None]]] = {}
+        self.timings: dict[str, dict[str, float]] = {}
+
+    def launch(
+        self,
+        name: str,
+        coro: Coroutine,
+        optional: bool = False,
+        cleanup: Callable[[Any], Awaitable[None]] | None = None,
+    ) -> None:
+        """启动一个阶段
+
+        Args:
+            name: 阶段名称
+            coro: 阶段协程
+            optional: 可选阶段失败时 get 返回默认值而不是抛出异常
+            cleanup: 任务提前结束时用于释放阶段结果（如关闭内核）
+        """
+        self.timings[name] = {"duration": 0.0, "wait": 0.0}
+        if optional:
+            self._optional.add(name)
+        if cleanup:
+            self._cleanups[name] = cleanup
+        self._tasks[name] = asyncio.create_task(self._run(name, coro))
+
+    async def _run(self, name: str, coro: Coroutine) -> Any:
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            duration = time.perf_counter() - start
+            self.timings[name]["duration"] = duration
+            logger.info(f"[{self.task_id}] 启动阶段 {name} 结束，耗时 {duration:.2f}s")
+
+    async def get(self, name: str, default: Any = None) -> Any:
+        """等待阶段完成并返回结果，未启动的阶段返回默认值"""
+        task = self._tasks.get(name)
+        if task is None:
+            return default
+        start = time.perf_counter()
+        try:
+            return await task
+        except Exception as e:
+            if name not in self._optional:
+                raise
+            logger.warning(f"[{self.task_id}] 可选阶段 {name} 失败: {str(e)}")
+            return default
+        finally:
+            wait = time.perf_counter() - start
+            self.timings[name]["wait"] += wait
+            if wait > 0.01:
+                logger.info(f"[{self.task_id}] 等待启动阶段 {name} {wait:.2f}s")
+
+    async def discard(self) -> None:
+        """任务失败时取消未完成的阶段，并清理已完成阶段的结果"""
+        for name, task in self._tasks.items():
+            if not task.done():
+                task.cancel()
+                continue
+            if task.cancelled() or task.exception() or name not in self._cleanups:
+                continue
+            try:
+                await self._cleanups[name](task.result())
+            except Exception as e:
+                logger.error(f"[{self.task_id}] 清理启动阶段 {name} 失败: {str(e)}")
@@ -1,16 +1,31 @@
+import asyncio
 from app.core.agents import WriterAgent, CoderAgent, CoordinatorAgent, ModelerAgent
 from app.schemas.request import Problem
 from app.schemas.response import SystemMessage
 from app.tools.openalex_scholar import OpenAlexScholar
 from app.utils.log_util import logger
 from app.utils.common_utils import create_work_dir, get_config_template
+from app.utils.data_profile import load_data_profile, format_data_profile
 from app.models.user_output import UserOutput
 from app.config.setting import settings
 from app.tools.interpreter_factory import create_interpreter
 from app.services.redis_manager import redis_manager
 from app.tools.notebook_serializer import NotebookSerializer
 from app.core.flows import Flows
+from app.core.startup import StartupStages
+from app.core.checkpoint import WorkflowCheckpoint
+from app.schemas.A2A import CoderToWriter, CoordinatorToModeler, ModelerToCoder, WriterResponse
 from app.core.llm.llm_factory import LLMFactory
+from app.services.metrics import WORKFLOW_STAGE
+from app.services.tracing import tracer
+from app.utils.track import agent_metrics
+
+def with_feedback(prompt: str, feedback: str | None) -> str:
+    """重新生成章节时附加用户的修改意见"""
+    if not feedback:
+        return prompt
+    return f"{prompt}\n\n该部分之前已生成过一版，用户的修改意见如下，请据此重新完成：\n{feedback}"
+
 
 class WorkFlow:
     def __init__(self):
@@ -28,28 +43,103 @@ class MathModelWorkFlow(WorkFlow):
     ques_count: int = 0  # 问题数量
     questions: dict[str, str | int] = {}  # 问题
 
-    async def execute(self, problem: Problem):
+    @staticmethod
+    def _needs_kernel(checkpoint: WorkflowCheckpoint, rerun_code: set[str]) -> bool:
+        """是否有代码手阶段需要执行；断点中缺少题目拆解时无法判断，按需要处理"""
+        if rerun_code or not checkpoint.get("coordinator"):
+            return True
+        questions = CoordinatorToModeler(**checkpoint.get("coordinator")).questions
+        sections = ["eda", *Flows(questions).get_questions_quesx_keys(), "sensitivity_analysis"]
+        return not all(
+            checkpoint.get("writer", key) or checkpoint.get("coder", key)
+            for key in sections
+        )
+
+    async def execute(self, problem: Problem, resume: bool = False):
+        """执行建模任务
+
+        Args:
+            problem: 任务输入
+            resume: 从工作目录中的断点恢复，跳过已完成的阶段
+        """
         self.task_id = problem.task_id
         self.work_dir = create_work_dir(self.task_id)
+        # litellm 回调将每次调用的用量记录到该任务的台账
+        data_recorder = agent_metrics.recorder(self.task_id, self.work_dir)
+
+        checkpoint = WorkflowCheckpoint(self.task_id, self.work_dir)
+        if resume and await checkpoint.load():
+            logger.info(f"[{self.task_id}] 从断点恢复，已完成: {checkpoint.completed()}")
+            await redis_manager.publish_message(
+                self.task_id,
+                SystemMessage(content="从断点恢复任务，跳过已完成的阶段"),
+            )
+        else:
+            await checkpoint.save("problem", problem.model_dump())
 
         llm_factory = LLMFactory(self.task_id)
         coordinator_llm, modeler_llm, coder_llm, writer_llm = llm_factory.get_all_llms()
 
         coordinator_agent = CoordinatorAgent(self.task_id, coordinator_llm)
 
+        # 与 LLM 调用无关的准备工作在任务开始时并行启动，首次用到时再等待
+        stages = StartupStages(self.task_id)
+        notebook_serializer = NotebookSerializer(work_dir=self.work_dir)
+        if checkpoint.resumed:
+            notebook_serializer.load()
+        # 重新生成章节时的修改意见与需要重新运行代码的章节
+        feedback: dict[str, str] = checkpoint.get("feedback") or {}
+        rerun_code = set(checkpoint.get("rerun_code") or [])
+        # 所有代码手阶段都已完成（只重写论文章节）时不启动内核
+        if self._needs_kernel(checkpoint, rerun_code):
+            stages.launch(
+                "interpreter",
+                create_interpreter(
+                    task_id=self.task_id,
+                    work_dir=self.work_dir,
+                    notebook_serializer=notebook_serializer,
+                    timeout=3000,
+                ),
+                cleanup=lambda interpreter: interpreter.cleanup(),
+            )
+        # 上传时已统计的数据概况，缺失时现场统计
+        stages.launch(
+            "data_profile",
+            asyncio.to_thread(load_data_profile, self.work_dir),
+            optional=True,
+        )
+        scholar = OpenAlexScholar(task_id=self.task_id, email=settings.OPENALEX_EMAIL)
+
         await redis_manager.publish_message(
             self.task_id,
             SystemMessage(content="识别用户意图和拆解问题ing..."),
         )
 
-        try:
-            coordinator_response = await coordinator_agent.run(problem.ques_all)
-            self.questions = coordinator_response.questions
-            self.ques_count = coordinator_response.ques_count
-        except Exception as e:
-            #  非数学建模问题
-            logger.error(f"CoordinatorAgent 执行失败: {e}")
-            raise e
+        if checkpoint.get("coordinator"):
+            coordinator_response = CoordinatorToModeler(**checkpoint.get("coordinator"))
+        else:
+            try:
+                with WORKFLOW_STAGE.time(stage="coordinator"), tracer.span(
+                    "coordinator", "stage"
+                ):
+                    coordinator_response = await coordinator_agent.run(problem.ques_all)
+            except Exception as e:
+                #  非数学建模问题
+                logger.error(f"CoordinatorAgent 执行失败: {e}")
+                await stages.discard()
+                raise e
+            await checkpoint.save(
+                "coordinator",
+                coordinator_response.model_dump(),
+                agents={"CoordinatorAgent": coordinator_agent},
+            )
+        self.questions = coordinator_response.questions
+        self.ques_count = coordinator_response.ques_count
+
+        # 根据题目标题预取文献，与建模手并行
+        title = str(self.questions.get("title") or "")
+        if title and settings.OPENALEX_EMAIL:
+            stages.launch("literature", scholar.prefetch(title), optional=True)
 
         await redis_manager.publish_message(
             self.task_id,
@@ -63,25 +153,50 @@ class MathModelWorkFlow(WorkFlow):
 
         modeler_agent = ModelerAgent(self.task_id, modeler_llm)
 
-        modeler_response = await modeler_agent.run(coordinator_response)
+        if checkpoint.get("modeler"):
+            modeler_response = ModelerToCoder(**checkpoint.get("modeler"))
+        else:
+            try:
+                with WORKFLOW_STAGE.time(stage="modeler"), tracer.span(
+                    "modeler", "stage"
+                ):
+                    modeler_response = await modeler_agent.run(coordinator_response)
+            except Exception:
+                await stages.discard()
+                raise
+            await checkpoint.save(
+                "modeler",
+                modeler_response.model_dump(),
+                agents={"ModelerAgent": modeler_agent},
+            )
 
-        user_output = UserOutput(work_dir=self.work_dir, ques_count=self.ques_count)
+        user_output = UserOutput(
+            work_dir=self.work_dir,
+            ques_count=self.ques_count,
+            data_recorder=data_recorder,
+        )
 
         await redis_manager.publish_message(
             self.task_id,
             SystemMessage(content="正在创建代码沙盒环境"),
         )
 
-        notebook_serializer = NotebookSerializer(work_dir=self.work_dir)
-        code_interpreter = await create_interpreter(
-            kind="local",
-            task_id=self.task_id,
-            work_dir=self.work_dir,
-            notebook_serializer=notebook_serializer,
-            timeout=3000,
-        )
-        
-        scholar = OpenAlexScholar(task_id=self.task_id, email=settings.OPENALEX_EMAIL)
+        code_interpreter = await stages.get("interpreter")
+        if code_interpreter is None:
+            from app.tools.local_interpreter import LocalCodeInterpreter
+
+            # 未启动内核，只用于提供断点中的代码输出
+            code_interpreter = LocalCodeInterpreter(
+                self.task_id, self.work_dir, notebook_serializer
+            )
+        data_profile = await stages.get("data_profile", default={})
+        # 恢复 section 输出；内核变量在第一个需要重新执行的代码手阶段前重放
+        if checkpoint.get("interpreter"):
+            code_interpreter.restore_state(checkpoint.get("interpreter"))
+        # 重新运行的章节只重放其之前的代码，旧版本的代码单元丢弃
+        for key in rerun_code:
+            code_interpreter.rewind_to_section(key)
+        need_replay = bool(code_interpreter.executed_cells)
 
         await redis_manager.publish_message(
             self.task_id,
@@ -101,6 +216,7 @@ class MathModelWorkFlow(WorkFlow):
             max_chat_turns=settings.MAX_CHAT_TURNS,
             max_retries=settings.MAX_RETRIES,
             code_interpreter=code_interpreter,
+            data_profile=format_data_profile(data_profile),
         )
 
         writer_agent = WriterAgent(
@@ -110,27 +226,68 @@ class MathModelWorkFlow(WorkFlow):
             format_output=problem.format_output,
             scholar=scholar,
         )
+        checkpoint.restore_agent("CoderAgent", coder_agent)
+        checkpoint.restore_agent("WriterAgent", writer_agent)
+        agents = {"CoderAgent": coder_agent, "WriterAgent": writer_agent}
 
         flows = Flows(self.questions)
 
         ################################################ solution steps
-        solution_flows = flows.get_solution_flows(self.questions, modeler_response, code_interpreter)
+        solution_flows = flows.get_solution_flows(
+            self.questions, modeler_response, code_interpreter, data_profile
+        )
         config_template = get_config_template(problem.comp_template)
 
         for key, value in solution_flows.items():
-            await redis_manager.publish_message(
-                self.task_id,
-                SystemMessage(content=f"代码手开始求解{key}"),
-            )
-
-            coder_response = await coder_agent.run(
-                prompt=value["coder_prompt"], subtask_title=key
-            )
-
-            await redis_manager.publish_message(
-                self.task_id,
-                SystemMessage(content=f"代码手求解成功{key}", type="success"),
-            )
+            if checkpoint.get("writer", key):
+                user_output.set_res(key, WriterResponse(**checkpoint.get("writer", key)))
+                continue
+
+            previous_coder = checkpoint.get("coder", key)
+            if previous_coder and key not in rerun_code:
+                coder_response = CoderToWriter(**previous_coder)
+            else:
+                if need_replay:
+                    need_replay = False
+                    await redis_manager.publish_message(
+                        self.task_id,
+                        SystemMessage(content="重放已执行的代码，恢复内核状态"),
+                    )
+                    await code_interpreter.replay_cells()
+
+                await redis_manager.publish_message(
+                    self.task_id,
+                    SystemMessage(content=f"代码手开始求解{key}"),
+                )
+
+                # 重新运行时丢弃该 section 之前的代码输出
+                code_interpreter.section_output.pop(key, None)
+                code_interpreter.begin_section(key)
+                with WORKFLOW_STAGE.time(stage="coder"), tracer.span(
+                    f"coder:{key}", "stage"
+                ):
+                    coder_response = await coder_agent.run(
+                        prompt=with_feedback(value["coder_prompt"], feedback.get(key)),
+                        subtask_title=key,
+                    )
+                # 覆盖同名图片时不会被识别为新图片，沿用之前的图片列表
+                if previous_coder and not coder_response.created_images:
+                    coder_response.created_images = previous_coder.get("created_images")
+                # EDA 的数据加载与清洗结果保存为快照，恢复任务时不必重放这些代码
+                if key == "eda" and settings.KERNEL_SNAPSHOT:
+                    await code_interpreter.snapshot("eda")
+
+                await redis_manager.publish_message(
+                    self.task_id,
+                    SystemMessage(content=f"代码手求解成功{key}", type="success"),
+                )
+                await checkpoint.save(
+                    "coder",
+                    coder_response.model_dump(),
+                    key,
+                    agents=agents,
+                    interpreter=code_interpreter,
+                )
 
             writer_prompt = flows.get_writer_prompt(
                 key, coder_response.code_response, code_interpreter, config_template
@@ -141,24 +298,33 @@ class MathModelWorkFlow(WorkFlow):
                 SystemMessage(content=f"论文手开始写{key}部分"),
             )
 
+            # 写作前确保预取的文献已就绪
+            await stages.get("literature")
+
             ## TODO: 图片引用错误
             formatted_images = [f"./{img}" for img in coder_response.created_images]  # 假设图片在工作目录
-            writer_response = await writer_agent.run(
-                writer_prompt,
-                available_images=formatted_images,
-                sub_title=key,
-            )
+            with WORKFLOW_STAGE.time(stage="writer"), tracer.span(
+                f"writer:{key}", "stage"
+            ):
+                writer_response = await writer_agent.run(
+                    with_feedback(writer_prompt, feedback.get(key)),
+                    available_images=formatted_images,
+                    sub_title=key,
+                )
             await redis_manager.publish_message(
                 self.task_id,
                 SystemMessage(content=f"论文手完成{key}部分"),
             )
 
             user_output.set_res(key, writer_response)
+            await checkpoint.save("writer", user_output.res[key], key, agents=agents)
+            await user_output.persist()
 
         # 关闭沙盒
 
         await code_interpreter.cleanup()
         logger.info(user_output.get_res())
+        logger.info(f"启动阶段耗时: {stages.timings}")
 
         ################################################ write steps
 
@@ -166,15 +332,29 @@ class MathModelWorkFlow(WorkFlow):
             user_output, config_template, problem.ques_all
         )
         for key, value in write_flows.items():
+            if checkpoint.get("writer", key):
+                user_output.set_res(key, WriterResponse(**checkpoint.get("writer", key)))
+                continue
+
             await redis_manager.publish_message(
                 self.task_id,
                 SystemMessage(content=f"论文手开始写{key}部分"),
             )
 
-            writer_response = await writer_agent.run(prompt=value, sub_title=key)
+            with WORKFLOW_STAGE.time(stage="writer"), tracer.span(
+                f"writer:{key}", "stage"
+            ):
+                writer_response = await writer_agent.run(
+                    prompt=with_feedback(value, feedback.get(key)), sub_title=key
+                )
 
             user_output.set_res(key, writer_response)
+            await checkpoint.save("writer", user_output.res[key], key, agents=agents)
+            await user_output.persist()
 
         logger.info(user_output.get_res())
 
-        user_output.save_result()
+        await user_output.persist()
+        checkpoint.data["feedback"] = {}
+        checkpoint.data["rerun_code"] = []
+        await checkpoint.save("done", True)
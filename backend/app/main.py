@@ -2,9 +2,19 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from app.routers import modeling_router, ws_router, common_router, files_router
+from app.routers import (
+    admin_router,
+    modeling_router,
+    ws_router,
+    common_router,
+    files_router,
+)
 from app.utils.log_util import logger
+from app.utils.upload_utils import UploadLimitMiddleware
 from app.config.setting import settings
+from app.services.sandbox_pool import sandbox_pool
+from app.services.export_service import export_service
+from app.services.loop_monitor import loop_monitor
 from fastapi.staticfiles import StaticFiles
 from app.utils.cli import get_ascii_banner, center_cli_str
 
@@ -18,7 +28,17 @@ async def lifespan(app: FastAPI):
     PROJECT_FOLDER = "./project"
     os.makedirs(PROJECT_FOLDER, exist_ok=True)
 
+    # 配置了 E2B 时预热沙箱池
+    if settings.E2B_API_KEY:
+        await sandbox_pool.start()
+
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
     yield
+    await loop_monitor.stop()
+    await sandbox_pool.close()
+    export_service.close()
     logger.info("Stopping MathModelAgent")
 
 
@@ -33,6 +53,17 @@ app.include_router(modeling_router.router)
 app.include_router(ws_router.router)
 app.include_router(common_router.router)
 app.include_router(files_router.router)
+app.include_router(admin_router.router)
+
+
+# 在 multipart 解析并暂存之前限制 /modeling 的请求体大小，
+# 额外预留 1MB 给表单字段和 multipart 边界
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths={"/modeling"},
+    max_bytes=(settings.MAX_TASK_UPLOAD_MB + 1) * 1024 * 1024,
+    detail=f"上传数据超过单任务限制 {settings.MAX_TASK_UPLOAD_MB}MB",
+)
 
 
 # 跨域 CORS
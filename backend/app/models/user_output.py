@@ -1,9 +1,12 @@
+import asyncio
 import os
 import re
 from app.utils.data_recorder import DataRecorder
 from app.schemas.A2A import WriterResponse
 import json
-import uuid
+
+# 论文手输出的引用格式 {[^数字]: 引用内容}
+REFERENCE_PATTERN = re.compile(r"\{\[\^(\d+)\]:\s*(.*?)\}", re.DOTALL)
 
 
 class UserOutput:
@@ -25,7 +28,11 @@ class UserOutput:
         self.cost_time = 0.0
         self.initialized = True
         self.ques_count: int = ques_count
-        self.footnotes = {}
+        # 引用内容 -> 编号
+        self.footnotes: dict[str, int] = {}
+        # 已拆分的章节缓存 {key: (正文片段, 引用内容)}，以及内容变化后需要重新拆分的章节
+        self._sections: dict[str, tuple[list[str], list[str]]] = {}
+        self._dirty: set[str] = set()
         self._init_seq()
 
     def _init_seq(self):
@@ -50,6 +57,7 @@ class UserOutput:
             "response_content": writer_response.response_content,
             "footnotes": writer_response.footnotes,
         }
+        self._dirty.add(key)
 
     def get_res(self):
         return self.res
@@ -64,97 +72,76 @@ class UserOutput:
 
         return model_build_solve
 
-    def replace_references_with_uuid(self, text: str) -> str:
-        # 匹配引用内容，格式为 {[^数字]: 引用内容}
-        # 修改正则表达式，匹配大括号包裹的引用格式
-        references = re.findall(r"\{\[\^(\d+)\]:\s*(.*?)\}", text, re.DOTALL)
-
-        for ref_num, ref_content in references:
+    @staticmethod
+    def _tokenize(text: str) -> tuple[list[str], list[str]]:
+        """一次遍历章节，拆分为正文片段与引用内容
+
+        parts[0] refs[0] parts[1] refs[1] ... parts[n]，编号时只需按顺序拼接，不必再次匹配。
+        """
+        parts: list[str] = []
+        refs: list[str] = []
+        pos = 0
+        for match in REFERENCE_PATTERN.finditer(text):
+            parts.append(text[pos : match.start()])
             # 清理引用内容，去除末尾的空格和点号
-            ref_content = ref_content.strip().rstrip(".")
-
-            # 检查当前引用内容是否已经存在于footnotes中
-            existing_uuid = None
-            for uuid_key, footnote_data in self.footnotes.items():
-                if footnote_data["content"] == ref_content:
-                    existing_uuid = uuid_key
-                    break
-
-            if existing_uuid:
-                # 如果已存在，使用现有的UUID
-                text = re.sub(
-                    rf"\{{\[\^{ref_num}\]:.*?\}}",
-                    f"[{existing_uuid}]",
-                    text,
-                    flags=re.DOTALL,
-                )
-            else:
-                # 如果不存在，创建新的UUID和footnote条目
-                new_uuid = str(uuid.uuid4())
-                self.footnotes[new_uuid] = {
-                    "content": ref_content,
-                }
-                text = re.sub(
-                    rf"\{{\[\^{ref_num}\]:.*?\}}",
-                    f"[{new_uuid}]",
-                    text,
-                    flags=re.DOTALL,
-                )
-
-        return text
-
-    def sort_text_with_footnotes(self, replace_res: dict) -> dict:
-        sort_res = {}
-        ref_index = 1
-
-        for seq_key in self.seq:
-            text = replace_res[seq_key]["response_content"]
-            # 找到[uuid]
-            uuid_list = re.findall(r"\[([a-f0-9-]{36})\]", text)
-            for uid in uuid_list:
-                text = text.replace(f"[{uid}]", f"[^{ref_index}]")
-                if self.footnotes[uid].get("number") is None:
-                    self.footnotes[uid]["number"] = ref_index
-
-                ref_index += 1
-            sort_res[seq_key] = {
-                "response_content": text,
-            }
-
-        return sort_res
+            refs.append(match.group(2).strip().rstrip("."))
+            pos = match.end()
+        parts.append(text[pos:])
+        return parts, refs
+
+    def _render_section(self, parts: list[str], refs: list[str]) -> str:
+        """将引用替换为编号
+
+        引用内容通过 footnotes（引用内容 -> 编号）查找，相同文献重复引用时使用相同编号，
+        新的文献按出现顺序编号。
+        """
+        out = [parts[0]]
+        for content, part in zip(refs, parts[1:]):
+            number = self.footnotes.get(content)
+            if number is None:
+                number = self.footnotes[content] = len(self.footnotes) + 1
+            out.append(f"[^{number}]")
+            out.append(part)
+        return "".join(out)
 
     def append_footnotes_to_text(self, text: str) -> str:
-        text += "\n\n ## 参考文献"
-        # 将脚注转换为列表并按 number 排序
-        sorted_footnotes = sorted(self.footnotes.items(), key=lambda x: x[1]["number"])
-        for _, footnote in sorted_footnotes:
-            text += f"\n\n[^{footnote['number']}]: {footnote['content']}"
-        return text
+        # footnotes 按编号顺序插入，直接按顺序输出
+        parts = [text, "\n\n ## 参考文献"]
+        parts += [
+            f"\n\n[^{number}]: {content}" for content, number in self.footnotes.items()
+        ]
+        return "".join(parts)
 
     def get_result_to_save(self) -> str:
-        replace_res = {}
-
-        for key, value in self.res.items():
-            new_text = self.replace_references_with_uuid(value["response_content"])
-            replace_res[key] = {
-                "response_content": new_text,
-            }
+        """拼接论文，尚未完成的章节跳过
 
-        sort_res = self.sort_text_with_footnotes(replace_res)
+        只重新拆分变化过的章节，其余使用缓存；编号在每次拼接时按章节顺序中首次出现的位置重新计算。
+        """
+        for key in self._dirty:
+            if key in self.res:
+                self._sections[key] = self._tokenize(self.res[key]["response_content"])
+        self._dirty.clear()
 
-        full_res_1 = "\n\n".join(
-            [sort_res[key]["response_content"] for key in self.seq]
+        self.footnotes = {}
+        full_res = "\n\n".join(
+            self._render_section(*self._sections[key])
+            for key in self.seq
+            if key in self._sections
         )
-
-        full_res = self.append_footnotes_to_text(full_res_1)
-        return full_res
-
-    def save_result(
-        self,
-    ):
-        with open(os.path.join(self.work_dir, "res.json"), "w", encoding="utf-8") as f:
-            json.dump(self.res, f, ensure_ascii=False, indent=4)
-
-        res_path = os.path.join(self.work_dir, "res.md")
-        with open(res_path, "w", encoding="utf-8") as f:
-            f.write(self.get_result_to_save())
+        return self.append_footnotes_to_text(full_res)
+
+    def save_result(self):
+        """写入 res.json 与 res.md，先写临时文件再替换，任何时候都能读到完整的文件"""
+        self._write("res.json", json.dumps(self.res, ensure_ascii=False, indent=4))
+        self._write("res.md", self.get_result_to_save())
+
+    async def persist(self):
+        """每完成一个章节保存一次，任务中断时已完成的部分仍可下载"""
+        await asyncio.to_thread(self.save_result)
+
+    def _write(self, name: str, content: str):
+        path = os.path.join(self.work_dir, name)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
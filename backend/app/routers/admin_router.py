@@ -0,0 +1,49 @@
+import secrets
+import time
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.config.setting import settings
+from app.services.profiler import ProfilerError, profiler
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="管理接口未启用")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="管理令牌无效")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    task_id: str | None = None,
+    target: Literal["api", "kernel"] = "api",
+):
+    """按需采样 seconds 秒，返回 folded 格式的调用栈，可直接生成火焰图
+
+    target=api 采样 API 进程，指定 task_id 时只保留该任务协程的样本；
+    target=kernel 通过 py-spy 采样 task_id 对应的 Jupyter 内核进程。
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400, detail=f"采样时间不能超过 {settings.PROFILE_MAX_SECONDS} 秒"
+        )
+    try:
+        if target == "kernel":
+            if not task_id:
+                raise HTTPException(status_code=400, detail="采样内核需要指定 task_id")
+            folded = await profiler.profile_kernel(task_id, seconds, interval_ms / 1000)
+        else:
+            folded = await profiler.profile(seconds, interval_ms / 1000, task_id)
+    except ProfilerError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    filename = f"profile-{target}-{task_id or 'all'}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    return PlainTextResponse(
+        folded, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
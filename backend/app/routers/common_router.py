@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Response
 from app.config.setting import settings
 from app.utils.common_utils import get_config_template
 from app.schemas.enums import CompTemplate
+from app.services.metrics import CONTENT_TYPE, metrics
+from app.utils.data_recorder import get_task_usage
+from app.utils.log_util import logger
 
 router = APIRouter()
 
@@ -32,6 +35,17 @@ async def get_writer_seque():
 
 @router.get("/track")
 async def track(task_id: str):
-    # 获取任务的token使用情况
-
-    pass
+    # 获取任务的token使用情况：按 agent、阶段汇总的 token、耗时、费用、缓存命中与重试次数
+    try:
+        return await get_task_usage(task_id)
+    except Exception as e:
+        logger.error(f"读取任务 {task_id} 的用量失败: {str(e)}")
+        raise HTTPException(status_code=503, detail="读取用量失败")
+
+
+@router.get("/metrics")
+async def get_metrics():
+    # Prometheus 文本格式的进程内指标
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="指标未启用")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
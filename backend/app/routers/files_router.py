@@ -1,8 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from app.config.setting import settings
+from app.schemas.enums import ExportFormat
+from app.services.export_service import export_service
 from app.utils.common_utils import get_current_files, get_work_dir
 import os
 import subprocess
-from icecream import ic
+from app.utils.debug_trace import TRACE, trace
 from fastapi import HTTPException
 
 router = APIRouter()
@@ -18,7 +21,8 @@ async def get_files(task_id: str):
 
 @router.get("/open_folder")
 async def open_folder(task_id: str):
-    ic(task_id)
+    if TRACE:
+        trace(f"task_id: {task_id}")
     # 打开工作目录
     work_dir = get_work_dir(task_id)
 
@@ -31,3 +35,26 @@ async def open_folder(task_id: str):
         raise HTTPException(status_code=500, detail=f"不支持的操作系统: {os.name}")
 
     return {"message": "打开工作目录成功", "work_dir": work_dir}
+
+
+@router.get("/export")
+async def export_files(
+    task_id: str, formats: list[ExportFormat] = Query([ExportFormat.DOCX])
+):
+    """按需导出论文，多个格式并行生成，内容未变化时直接返回缓存"""
+    try:
+        get_work_dir(task_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+
+    results = await export_service.export_many(task_id, formats)
+    files, errors = {}, {}
+    for fmt, result in results.items():
+        if isinstance(result, Exception):
+            errors[fmt.value] = str(result)
+        else:
+            name = os.path.basename(result)
+            files[fmt.value] = f"{settings.SERVER_HOST}/static/{task_id}/{name}"
+    if not files:
+        raise HTTPException(status_code=500, detail=errors)
+    return {"files": files, "errors": errors}
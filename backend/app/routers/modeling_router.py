@@ -1,29 +1,40 @@
-from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile
-from app.core.workflow import MathModelWorkFlow
-from app.schemas.enums import CompTemplate, FormatOutPut
+from fastapi import APIRouter, BackgroundTasks, File, Form, Request, UploadFile
+from app.schemas.enums import CompTemplate, FormatOutPut, TaskPriority
 from app.utils.log_util import logger
 from app.services.redis_manager import redis_manager
-from app.schemas.request import Problem
-from app.schemas.response import SystemMessage
+from app.services.task_queue import claim_task, is_task_active, submit_modeling_task
+from app.services.tracing import build_timeline, load_spans
+from app.core.checkpoint import WorkflowCheckpoint
+from app.services.data_ingest import import_data_files, ingest_data_files
+from app.utils.upload_utils import UploadQuotaExceeded, save_upload_file
 from app.utils.common_utils import (
     create_task_id,
     create_work_dir,
     get_current_files,
-    md_2_docx,
+    get_work_dir,
 )
 import os
+import shutil
 import asyncio
 from fastapi import HTTPException
-from icecream import ic
-from app.schemas.request import ExampleRequest
+from app.utils.debug_trace import TRACE, trace
+from app.schemas.request import ExampleRequest, RegenerateRequest
+from app.core.flows import Flows
 from pydantic import BaseModel
-import litellm
 from app.config.setting import settings
 
 
 router = APIRouter()
 
 
+def get_user_key(request: Request) -> str:
+    """用于公平调度的用户标识：优先使用 X-User-Id 请求头，缺省为客户端 IP"""
+    user_id = request.headers.get("x-user-id")
+    if user_id:
+        return user_id
+    return request.client.host if request.client else "anonymous"
+
+
 # 移除API配置相关的Pydantic模型，因为不再需要接收前端配置
 # 移除ValidateApiKeyRequest、ValidateApiKeyResponse和SaveApiConfigRequest
 
@@ -38,6 +49,8 @@ async def validate_api_key():
     """
     验证 .env.dev 中配置的API Key有效性
     """
+    import litellm
+
     try:
         # 使用.env.dev中的配置进行验证
         await litellm.acompletion(
@@ -87,11 +100,13 @@ async def validate_api_key():
 async def exampleModeling(
     example_request: ExampleRequest,
     background_tasks: BackgroundTasks,
+    request: Request,
 ):
     task_id = create_task_id()
     work_dir = create_work_dir(task_id)
     example_dir = os.path.join("app", "example", example_request.source)
-    ic(example_dir)
+    if TRACE:
+        trace(f"example_dir: {example_dir}")
     
     # 检查示例问题文件是否存在
     question_path = os.path.join(example_dir, "questions.txt")
@@ -101,25 +116,23 @@ async def exampleModeling(
     with open(question_path, "r", encoding="utf-8") as f:
         ques_all = f.read()
 
-    # 复制示例数据文件
+    # 示例数据文件从内容寻址仓库链接到工作目录，不再逐字节复制
     current_files = get_current_files(example_dir, "data")
-    for file in current_files:
-        src_file = os.path.join(example_dir, file)
-        dst_file = os.path.join(work_dir, file)
-        with open(src_file, "rb") as src, open(dst_file, "wb") as dst:
-            dst.write(src.read())
-    
+    src_files = [os.path.join(example_dir, file) for file in current_files]
+    hashes = await asyncio.to_thread(import_data_files, src_files, work_dir)
+    await asyncio.to_thread(ingest_data_files, work_dir, hashes)
+
     # 存储任务ID
     await redis_manager.set(f"task_id:{task_id}", task_id)
 
-    logger.info(f"Adding background task for task_id: {task_id}")
-    # 将任务添加到后台执行
-    background_tasks.add_task(
-        run_modeling_task_async,
+    await submit_modeling_task(
+        background_tasks,
         task_id,
         ques_all,
         CompTemplate.CHINA,
         FormatOutPut.Markdown,
+        user=get_user_key(request),
+        priority=example_request.priority,
     )
     return {"task_id": task_id, "status": "processing"}
 
@@ -127,13 +140,16 @@ async def exampleModeling(
 @router.post("/modeling")
 async def modeling(
     background_tasks: BackgroundTasks,
+    request: Request,
     ques_all: str = Form(...),  # 从表单获取
     comp_template: CompTemplate = Form(...),  # 从表单获取
     format_output: FormatOutPut = Form(...),  # 从表单获取
     files: list[UploadFile] = File(default=None),
+    priority: TaskPriority = Form(TaskPriority.NORMAL),
 ):
-    # 验证.env.dev中的配置是否存在
-    if not all([settings.COORDINATOR_API_KEY, settings.COORDINATOR_MODEL]):
+    # 验证.env.dev中的配置是否存在，回放录制时不需要 API Key
+    api_key_ok = settings.COORDINATOR_API_KEY or settings.LLM_BACKEND == "replay"
+    if not all([api_key_ok, settings.COORDINATOR_MODEL]):
         raise HTTPException(
             status_code=500, 
             detail="请先在.env.dev中配置API密钥和模型信息"
@@ -142,86 +158,178 @@ async def modeling(
     task_id = create_task_id()
     work_dir = create_work_dir(task_id)
 
-    # 保存上传的文件
+    # 保存上传的文件：分块写入磁盘并计算哈希，不在内存中保留整个文件
+    hashes: dict[str, str] = {}
     if files:
         logger.info(f"开始处理上传的文件，工作目录: {work_dir}")
+        max_file_bytes = settings.MAX_UPLOAD_FILE_MB * 1024 * 1024
+        remaining_bytes = settings.MAX_TASK_UPLOAD_MB * 1024 * 1024
         for file in files:
-            try:
-                data_file_path = os.path.join(work_dir, file.filename)
-                logger.info(f"保存文件: {file.filename} -> {data_file_path}")
-
-                if not file.filename:
-                    logger.warning("跳过空文件名")
-                    continue
-
-                content = await file.read()
-                if not content:
-                    logger.warning(f"文件 {file.filename} 内容为空")
-                    continue
-
-                with open(data_file_path, "wb") as f:
-                    f.write(content)
-                logger.info(f"成功保存文件: {data_file_path}")
+            if not file.filename:
+                logger.warning("跳过空文件名")
+                continue
 
+            # 只保留文件名，防止路径穿越
+            filename = os.path.basename(file.filename)
+            data_file_path = os.path.join(work_dir, filename)
+            logger.info(f"保存文件: {filename} -> {data_file_path}")
+            try:
+                size, sha256 = await save_upload_file(
+                    file,
+                    data_file_path,
+                    min(max_file_bytes, remaining_bytes),
+                    task_quota=remaining_bytes < max_file_bytes,
+                )
+            except UploadQuotaExceeded as e:
+                logger.warning(f"上传文件超过大小限制: {str(e)}")
+                shutil.rmtree(work_dir, ignore_errors=True)
+                raise HTTPException(status_code=413, detail=str(e))
             except Exception as e:
-                logger.error(f"保存文件 {file.filename} 失败: {str(e)}")
+                logger.error(f"保存文件 {filename} 失败: {str(e)}")
                 raise HTTPException(
-                    status_code=500, detail=f"保存文件 {file.filename} 失败: {str(e)}"
+                    status_code=500, detail=f"保存文件 {filename} 失败: {str(e)}"
                 )
+
+            if not size:
+                logger.warning(f"文件 {filename} 内容为空")
+                os.remove(data_file_path)
+                continue
+
+            remaining_bytes -= size
+            hashes[filename] = sha256
+            logger.info(f"成功保存文件: {data_file_path} ({size} bytes, sha256={sha256})")
+
+        # 相同内容的数据集只保存一份，Parquet 副本与数据概况直接复用
+        await asyncio.to_thread(ingest_data_files, work_dir, hashes)
     else:
         logger.warning("没有上传文件")
 
     # 存储任务ID
     await redis_manager.set(f"task_id:{task_id}", task_id)
 
-    logger.info(f"Adding background task for task_id: {task_id}")
-    # 将任务添加到后台执行
-    background_tasks.add_task(
-        run_modeling_task_async, task_id, ques_all, comp_template, format_output
+    await submit_modeling_task(
+        background_tasks,
+        task_id,
+        ques_all,
+        comp_template,
+        format_output,
+        user=get_user_key(request),
+        priority=priority,
     )
     return {"task_id": task_id, "status": "processing"}
 
 
-async def run_modeling_task_async(
+@router.post("/resume/{task_id}")
+async def resume_modeling(
     task_id: str,
-    ques_all: str,
-    comp_template: CompTemplate,
-    format_output: FormatOutPut,
+    background_tasks: BackgroundTasks,
+    request: Request,
+    priority: TaskPriority = TaskPriority.NORMAL,
 ):
-    logger.info(f"run modeling task for task_id: {task_id}")
+    """从断点恢复中断（进程退出、超时、出错）的任务，跳过已完成的阶段"""
+    try:
+        work_dir = get_work_dir(task_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
 
-    problem = Problem(
-        task_id=task_id,
-        ques_all=ques_all,
-        comp_template=comp_template,
-        format_output=format_output,
-    )
+    checkpoint = WorkflowCheckpoint(task_id, work_dir)
+    if not await checkpoint.load() or not checkpoint.get("problem"):
+        raise HTTPException(status_code=404, detail=f"任务 {task_id} 没有可恢复的断点")
+    if checkpoint.get("done"):
+        raise HTTPException(status_code=400, detail=f"任务 {task_id} 已完成")
+    # 原任务仍在排队或执行时再次启动，会有两个工作流同时写同一个工作目录与断点
+    if not await claim_task(task_id):
+        raise HTTPException(status_code=409, detail=f"任务 {task_id} 正在排队或执行中")
 
-    # 发送任务开始状态
-    await redis_manager.publish_message(
+    problem = checkpoint.get("problem")
+    await redis_manager.set(f"task_id:{task_id}", task_id)
+    logger.info(f"恢复任务 {task_id}，已完成: {checkpoint.completed()}")
+    await submit_modeling_task(
+        background_tasks,
         task_id,
-        SystemMessage(content="任务开始处理"),
+        problem["ques_all"],
+        CompTemplate(problem["comp_template"]),
+        FormatOutPut(problem["format_output"]),
+        user=get_user_key(request),
+        priority=priority,
+        resume=True,
     )
+    return {
+        "task_id": task_id,
+        "status": "processing",
+        "completed": checkpoint.completed(),
+    }
+
 
-    # 短暂延迟确保WebSocket连接
-    await asyncio.sleep(1)
+@router.post("/regenerate/{task_id}")
+async def regenerate_section(
+    task_id: str,
+    regenerate_request: RegenerateRequest,
+    background_tasks: BackgroundTasks,
+    request: Request,
+):
+    """重新生成已完成任务中的某一章节
 
-    # 创建任务并等待完成
-    task = asyncio.create_task(MathModelWorkFlow().execute(problem))
-    # 设置超时时间（60分钟）
+    复用断点中的上游结果，只重新调用该章节（及依赖它的章节）的代码手/论文手，
+    完成后重新拼接 res.md / res.docx。
+    """
     try:
-        await asyncio.wait_for(task, timeout=3600)
-    except asyncio.TimeoutError:
-        await redis_manager.publish_message(
-            task_id,
-            SystemMessage(content="任务处理超时", type="error"),
+        work_dir = get_work_dir(task_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+
+    checkpoint = WorkflowCheckpoint(task_id, work_dir)
+    if not await checkpoint.load() or not checkpoint.get("problem"):
+        raise HTTPException(status_code=404, detail=f"任务 {task_id} 没有可用的断点")
+    if not checkpoint.get("done"):
+        if await is_task_active(task_id):
+            raise HTTPException(
+                status_code=409, detail=f"任务 {task_id} 正在排队或执行中，请等待完成"
+            )
+        raise HTTPException(
+            status_code=409, detail=f"任务 {task_id} 尚未完成，请使用恢复接口"
         )
-        return
 
-    # 发送任务完成状态
-    await redis_manager.publish_message(
+    section = regenerate_request.section
+    if not checkpoint.get("writer", section):
+        raise HTTPException(status_code=400, detail=f"章节不存在: {section}")
+
+    sections = [section]
+    if regenerate_request.with_dependents:
+        sections += [s for s in Flows.get_dependents(section) if s != section]
+    if not await claim_task(task_id):
+        raise HTTPException(status_code=409, detail=f"任务 {task_id} 正在排队或执行中")
+    for key in sections:
+        checkpoint.discard("writer", key)
+    if regenerate_request.rerun_code and checkpoint.get("coder", section):
+        checkpoint.data["rerun_code"] = [section]
+    if regenerate_request.feedback:
+        checkpoint.data["feedback"] = {section: regenerate_request.feedback}
+    checkpoint.data["done"] = False
+    await checkpoint.persist()
+
+    problem = checkpoint.get("problem")
+    await redis_manager.set(f"task_id:{task_id}", task_id)
+    logger.info(f"重新生成任务 {task_id} 的章节: {sections}")
+    await submit_modeling_task(
+        background_tasks,
         task_id,
-        SystemMessage(content="任务处理完成", type="success"),
+        problem["ques_all"],
+        CompTemplate(problem["comp_template"]),
+        FormatOutPut(problem["format_output"]),
+        user=get_user_key(request),
+        priority=regenerate_request.priority,
+        resume=True,
     )
-    # 转换md为docx
-    md_2_docx(task_id)
+    return {"task_id": task_id, "status": "processing", "sections": sections}
+
+
+@router.get("/tasks/{task_id}/timeline")
+async def get_task_timeline(task_id: str):
+    """任务的 span 时间线，按开始时间排序，可直接绘制甘特图"""
+    try:
+        get_work_dir(task_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+    spans = await asyncio.to_thread(load_spans, task_id)
+    return {"task_id": task_id, **build_timeline(spans)}
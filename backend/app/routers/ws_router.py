@@ -3,11 +3,26 @@ from app.services.redis_manager import redis_manager
 from app.schemas.response import SystemMessage
 import asyncio
 from app.services.ws_manager import ws_manager
+from app.services.metrics import WS_QUEUE_DEPTH, WS_SEND
 import json
 
 router = APIRouter()
 
 
+async def read_pending(pubsub) -> list[dict]:
+    """取出订阅频道中已到达的全部消息
+
+    积压的消息在一次轮询中全部发出，而不是每 100ms 只发一条；积压数在发送前记录，
+    空轮询不计入。
+    """
+    messages = []
+    while msg := await pubsub.get_message(ignore_subscribe_messages=True):
+        messages.append(msg)
+    if messages:
+        WS_QUEUE_DEPTH.observe(len(messages))
+    return messages
+
+
 @router.websocket("/task/{task_id}")
 async def websocket_endpoint(websocket: WebSocket, task_id: str):
     print(f"WebSocket 尝试连接 task_id: {task_id}")
@@ -36,12 +51,14 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
     try:
         while True:
             try:
-                msg = await pubsub.get_message(ignore_subscribe_messages=True)
-                if msg:
+                for msg in await read_pending(pubsub):
                     print(f"Received message: {msg}")
                     try:
                         msg_dict = json.loads(msg["data"])
-                        await ws_manager.send_personal_message_json(msg_dict, websocket)
+                        with WS_SEND.time():
+                            await ws_manager.send_personal_message_json(
+                                msg_dict, websocket
+                            )
                         print(f"Sent message to WebSocket: {msg_dict}")
                     except Exception as e:
                         print(f"Error parsing message: {e}")
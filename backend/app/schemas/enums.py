@@ -11,6 +11,18 @@ class FormatOutPut(str, Enum):
     LaTeX: str = "LaTeX"
 
 
+class ExportFormat(str, Enum):
+    DOCX = "docx"
+    PDF = "pdf"
+    HTML = "html"
+
+
+class TaskPriority(str, Enum):
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
 class AgentType(str, Enum):
     COORDINATOR = "CoordinatorAgent"
     MODELER = "ModelerAgent"
@@ -1,10 +1,19 @@
 from pydantic import BaseModel
-from app.schemas.enums import CompTemplate, FormatOutPut
+from app.schemas.enums import CompTemplate, FormatOutPut, TaskPriority
 
 
 class ExampleRequest(BaseModel):
     example_id: str
     source: str
+    priority: TaskPriority = TaskPriority.NORMAL
+
+
+class RegenerateRequest(BaseModel):
+    section: str  # 需要重新生成的章节，如 ques2、judge
+    feedback: str | None = None  # 用户的修改意见
+    rerun_code: bool = False  # 是否重新运行该章节的代码（仅 eda/ques/sensitivity_analysis）
+    with_dependents: bool = True  # 是否一并重写依赖该章节的部分
+    priority: TaskPriority = TaskPriority.NORMAL
 
 
 class Problem(BaseModel):
@@ -24,6 +24,12 @@ class SystemMessage(Message):
     type: Literal["info", "warning", "success", "error"] = "info"
 
 
+class QueueMessage(SystemMessage):
+    """任务排队状态，position 为前面等待的任务数"""
+
+    position: int
+
+
 class UserMessage(Message):
     msg_type: str = "user"
 
@@ -107,6 +113,7 @@ class WriterMessage(AgentMessage):
 # 所有可能的消息类型
 MessageType = Union[
     SystemMessage,
+    QueueMessage,
     UserMessage,
     ModelerMessage,
     CoderMessage,
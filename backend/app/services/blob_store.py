@@ -0,0 +1,152 @@
+import os
+import shutil
+import stat
+import uuid
+from typing import Callable
+from app.config.setting import settings
+from app.tools.file_sync import file_sha256
+from app.utils.log_util import logger
+
+# Linux FICLONE ioctl，用于在支持写时复制的文件系统（btrfs/xfs）上创建 reflink
+FICLONE = 0x40049409
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def _reflink(src: str, dst: str) -> None:
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+class BlobStore:
+    """按内容寻址的数据文件存储
+
+    每份内容按 sha256 只保存一次（objects/ab/abcdef...，只读），
+    工作目录中的文件优先使用 reflink（写时复制），不支持时复制，任务代码原地改写
+    数据文件不会影响仓库；硬链接只在仓库内部使用（上传文件入库、生成派生产物）；
+    由内容派生的产物（Parquet 副本、数据概况）保存在 derived/ 下，
+    同一份数据在所有任务间只计算一次。
+    """
+
+    def __init__(self, root: str, hardlink: bool = True):
+        self.root = root
+        self.hardlink = hardlink
+        self.objects_dir = os.path.join(root, "objects")
+        self.derived_dir = os.path.join(root, "derived")
+        # 源文件哈希缓存 {路径: (size, mtime_ns, sha256)}，示例数据不必每次重新计算
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def hash_file(self, path: str) -> str:
+        """计算文件哈希，文件大小与修改时间未变时使用缓存"""
+        st = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        sha256 = file_sha256(path)
+        self._hashes[path] = (st.st_size, st.st_mtime_ns, sha256)
+        return sha256
+
+    def put(self, src: str, sha256: str | None = None, link: bool = False) -> str:
+        """将文件存入仓库，已存在相同内容时直接返回哈希
+
+        Args:
+            src: 源文件路径
+            sha256: 已知的内容哈希（如上传时边写边计算的结果）
+            link: 源文件可以与仓库共享（如工作目录中刚上传、随后会被 link_to
+                替换的文件），为 False 时总是复制，避免修改源文件的权限
+        """
+        sha256 = sha256 or self.hash_file(src)
+        dst = self.path(sha256)
+        if os.path.exists(dst):
+            return sha256
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        try:
+            if link:
+                self._materialize(src, tmp, self.hardlink)
+            else:
+                shutil.copyfile(src, tmp)
+            os.chmod(tmp, READ_ONLY)
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        logger.info(f"数据文件存入仓库: {os.path.basename(src)} -> {sha256[:12]}")
+        return sha256
+
+    def link_to(self, sha256: str, dst: str) -> None:
+        """将仓库中的内容放到工作目录"""
+        self.link_file(self.path(sha256), dst)
+
+    def link_file(self, src: str, dst: str, shared: bool = False) -> None:
+        """reflink -> 复制，目标已存在时替换
+
+        Args:
+            shared: 目标只读且仅在仓库内部使用（如生成派生产物的临时输入），
+                允许使用硬链接；交给任务的文件不能共享 inode，否则原地改写会破坏仓库
+        """
+        if os.path.lexists(dst):
+            os.remove(dst)
+        self._materialize(src, dst, shared and self.hardlink)
+
+    def _materialize(self, src: str, dst: str, hardlink: bool) -> None:
+        try:
+            _reflink(src, dst)
+            return
+        except (OSError, ImportError):
+            pass
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+
+    def derive(self, key: str, build: Callable[[str], None]) -> str | None:
+        """获取由内容派生的产物目录，不存在时调用 build 生成
+
+        build 接收一个临时目录并在其中写入产物，完成后原子地重命名为正式目录；
+        多个任务同时生成同一份产物时保留先完成的一份。
+
+        Returns:
+            产物目录，生成失败时为 None
+        """
+        final = os.path.join(self.derived_dir, key)
+        if os.path.isdir(final):
+            return final
+
+        os.makedirs(self.derived_dir, exist_ok=True)
+        tmp = f"{final}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp)
+        try:
+            build(tmp)
+            for name in os.listdir(tmp):
+                os.chmod(os.path.join(tmp, name), READ_ONLY)
+            os.rename(tmp, final)
+        except Exception as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if os.path.isdir(final):
+                return final
+            logger.warning(f"生成派生数据 {key} 失败: {str(e)}")
+            return None
+        return final
+
+
+blob_store = BlobStore(
+    os.path.join("project", "blobs"), hardlink=settings.BLOB_HARDLINK
+)
@@ -0,0 +1,93 @@
+import json
+import os
+from app.services.blob_store import blob_store
+from app.utils.data_cache import convert_data_file, parquet_available
+from app.utils.data_profile import profile_data_file, save_data_profile
+from app.utils.log_util import logger
+
+# 派生产物格式变化时递增，旧版本的缓存自动失效
+DERIVED_VERSION = 1
+DATA_SUFFIXES = (".csv", ".xlsx")
+
+
+def _build_derived(blob_path: str, ext: str, out_dir: str) -> None:
+    """在 out_dir 中生成 data{ext}.*.parquet 与 profile.json"""
+    source = os.path.join(out_dir, f"data{ext}")
+    blob_store.link_file(blob_path, source, shared=True)
+    try:
+        convert_data_file(source)
+        profile = profile_data_file(source)
+    finally:
+        os.remove(source)
+    with open(os.path.join(out_dir, "profile.json"), "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False)
+
+
+def import_data_files(paths: list[str], work_dir: str) -> dict[str, str]:
+    """将外部数据文件（如示例数据）存入仓库并链接到工作目录
+
+    Returns:
+        {文件名: sha256}
+    """
+    hashes = {}
+    for path in paths:
+        file = os.path.basename(path)
+        sha256 = blob_store.put(path)
+        blob_store.link_to(sha256, os.path.join(work_dir, file))
+        hashes[file] = sha256
+    return hashes
+
+
+def ingest_data_files(work_dir: str, hashes: dict[str, str] | None = None) -> dict:
+    """数据文件入库
+
+    工作目录中的文件存入内容寻址仓库并替换为 reflink 或副本；CSV/XLSX 的 Parquet
+    副本与数据概况按内容哈希缓存，首次出现时生成，之后的任务直接复用。
+
+    Args:
+        work_dir: 任务工作目录
+        hashes: 已知的 {文件名: sha256}，未给出的文件现场计算
+
+    Returns:
+        数据概况 {文件名: {sheet: 概况}}，同时保存为 data_profile.json
+    """
+    hashes = dict(hashes or {})
+    profile: dict[str, dict] = {}
+    derive = parquet_available()
+    if not derive:
+        logger.warning("未安装 pyarrow，跳过数据文件 Parquet 转换与概况统计")
+
+    for file in sorted(os.listdir(work_dir)):
+        path = os.path.join(work_dir, file)
+        is_data = file.endswith(DATA_SUFFIXES)
+        if not os.path.isfile(path) or not (is_data or file in hashes):
+            continue
+
+        sha256 = blob_store.put(path, hashes.get(file), link=True)
+        blob_store.link_to(sha256, path)
+        if not (is_data and derive):
+            continue
+
+        ext = os.path.splitext(file)[1]
+        key = f"v{DERIVED_VERSION}/{sha256}{ext}"
+        derived = blob_store.derive(
+            key, lambda out: _build_derived(blob_store.path(sha256), ext, out)
+        )
+        if derived is None:
+            # 内核中 load_data 会回退到原始文件
+            continue
+
+        # data.xlsx.Sheet1.parquet -> 附件1.xlsx.Sheet1.parquet
+        prefix = f"data{ext}"
+        for name in sorted(os.listdir(derived)):
+            if name.startswith(prefix) and name.endswith(".parquet"):
+                blob_store.link_file(
+                    os.path.join(derived, name),
+                    os.path.join(work_dir, file + name[len(prefix) :]),
+                )
+        with open(os.path.join(derived, "profile.json"), "r", encoding="utf-8") as f:
+            profile[file] = json.load(f)
+        logger.info(f"数据文件入库完成: {file} ({sha256[:12]})")
+
+    save_data_profile(work_dir, profile)
+    return profile
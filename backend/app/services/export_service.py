@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from app.config.setting import settings
+from app.schemas.enums import ExportFormat
+from app.services.blob_store import READ_ONLY, blob_store
+from app.services.metrics import EXPORT_DURATION, TIMEOUTS
+from app.services.tracing import tracer
+from app.tools.file_sync import file_sha256
+from app.utils.common_utils import get_work_dir
+from app.utils.log_util import logger
+
+# 转换参数变化时递增，使旧的缓存失效
+EXPORT_VERSION = 1
+SOURCE_NAME = "res.md"
+SOURCE_FORMAT = "markdown+tex_math_dollars"
+# 超时后等待子进程结束 pandoc 的额外时间
+KILL_GRACE = 10
+
+FORMAT_ARGS: dict[ExportFormat, list[str]] = {
+    ExportFormat.DOCX: [
+        "--mathml",
+        "--standalone",
+        "-V", "mainfont=SimHei",  # 确保中文公式周围文字正常显示
+    ],
+    ExportFormat.PDF: [
+        "--standalone",
+        "--pdf-engine=xelatex",  # 支持 LaTeX 公式
+        "-V", "mainfont=SimHei",
+        "-V", "CJKmainfont=SimHei",
+    ],
+    ExportFormat.HTML: [
+        "--mathml",
+        "--standalone",
+        "--self-contained",  # 图片内嵌，单个文件即可分享
+    ],
+}
+
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\(([^)\s]+)")
+
+
+class ExportError(Exception):
+    """论文导出失败"""
+
+
+def _run_pandoc(
+    work_dir: str, output: str, extra_args: list[str], timeout: int
+) -> None:
+    """在子进程池中执行，超时后结束 pandoc 进程"""
+    import pypandoc
+
+    cmd = [
+        pypandoc.get_pandoc_path(),
+        SOURCE_NAME,
+        "--from", SOURCE_FORMAT,
+        "--output", output,
+        "--resource-path", ".",
+        *extra_args,
+    ]
+    try:
+        result = subprocess.run(
+            cmd, cwd=work_dir, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise ExportError(f"pandoc 转换超时（{timeout}s）")
+    if result.returncode != 0:
+        raise ExportError(result.stderr.strip() or f"pandoc 退出码 {result.returncode}")
+
+
+def referenced_images(task_id: str, work_dir: str, markdown: str) -> list[str]:
+    """res.md 中引用的本地图片（相对路径或本任务的 /static 链接）"""
+    prefix = f"/static/{task_id}/"
+    images = set()
+    for ref in IMAGE_PATTERN.findall(markdown):
+        if prefix in ref:
+            ref = ref.split(prefix, 1)[1]
+        elif "://" in ref:
+            continue
+        path = os.path.normpath(os.path.join(work_dir, ref))
+        if os.path.isfile(path):
+            images.add(os.path.relpath(path, work_dir))
+    return sorted(images)
+
+
+def export_key(task_id: str, work_dir: str) -> str:
+    """由 res.md 与其引用的图片内容计算缓存键，内容不变时复用已有的导出结果"""
+    with open(os.path.join(work_dir, SOURCE_NAME), "rb") as f:
+        source = f.read()
+    sha = hashlib.sha256()
+    sha.update(f"v{EXPORT_VERSION}\n".encode())
+    sha.update(source)
+    for image in referenced_images(task_id, work_dir, source.decode("utf-8", "replace")):
+        sha.update(f"\n{image}:{file_sha256(os.path.join(work_dir, image))}".encode())
+    return sha.hexdigest()
+
+
+class ExportService:
+    """论文导出服务
+
+    pandoc 在独立的进程池中执行，不阻塞事件循环；同时执行的转换数不超过进程池大小，
+    单次转换超过 timeout 秒时结束。导出结果按内容哈希缓存在 blobs/derived/export 下，
+    同一份内容的同一格式只转换一次；多个格式按需并行生成。
+    """
+
+    def __init__(self, max_workers: int, timeout: int):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_dir = os.path.join(blob_store.derived_dir, "export")
+        self._executor: ProcessPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # 正在进行的转换 {(缓存键, 格式): Future}，相同请求共享一次转换
+        self._inflight: dict[tuple[str, ExportFormat], asyncio.Future] = {}
+
+    def cache_path(self, key: str, fmt: ExportFormat) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{fmt.value}")
+
+    async def export(self, task_id: str, fmt: ExportFormat = ExportFormat.DOCX) -> str:
+        """导出任务论文，返回工作目录中的文件路径（res.docx / res.pdf / res.html）"""
+        work_dir = get_work_dir(task_id)
+        if not os.path.exists(os.path.join(work_dir, SOURCE_NAME)):
+            raise ExportError(f"任务 {task_id} 尚未生成 {SOURCE_NAME}")
+
+        key = await asyncio.to_thread(export_key, task_id, work_dir)
+        cached = self.cache_path(key, fmt)
+        if not os.path.exists(cached):
+            inflight = self._inflight.get((key, fmt))
+            if inflight is None:
+                inflight = asyncio.ensure_future(self._build(work_dir, key, fmt))
+                self._inflight[(key, fmt)] = inflight
+                inflight.add_done_callback(
+                    lambda _: self._inflight.pop((key, fmt), None)
+                )
+            await asyncio.shield(inflight)
+        else:
+            logger.info(f"[{task_id}] 使用已缓存的 {fmt.value} 导出结果")
+
+        output = os.path.join(work_dir, f"res.{fmt.value}")
+        await asyncio.to_thread(blob_store.link_file, cached, output)
+        return output
+
+    async def export_many(
+        self, task_id: str, formats: list[ExportFormat]
+    ) -> dict[ExportFormat, str | Exception]:
+        """并行导出多个格式，单个格式失败不影响其他格式"""
+        results = await asyncio.gather(
+            *(self.export(task_id, fmt) for fmt in formats), return_exceptions=True
+        )
+        return dict(zip(formats, results))
+
+    async def _build(self, work_dir: str, key: str, fmt: ExportFormat) -> None:
+        cached = self.cache_path(key, fmt)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        # 输出到工作目录中的临时文件，pandoc 以工作目录为资源目录
+        tmp_name = f".export.{uuid.uuid4().hex}.{fmt.value}"
+        tmp = os.path.join(work_dir, tmp_name)
+
+        async with self._get_semaphore():
+            logger.info(f"开始转换 {fmt.value}: {work_dir}")
+            loop = asyncio.get_running_loop()
+            try:
+                with EXPORT_DURATION.time(format=fmt.value), tracer.span(
+                    f"export:{fmt.value}", "export"
+                ):
+                    await asyncio.wait_for(
+                        loop.run_in_executor(
+                            self._get_executor(),
+                            _run_pandoc,
+                            work_dir,
+                            tmp_name,
+                            FORMAT_ARGS[fmt],
+                            self.timeout,
+                        ),
+                        timeout=self.timeout + KILL_GRACE,
+                    )
+                await asyncio.to_thread(self._store, tmp, cached)
+            except asyncio.TimeoutError:
+                TIMEOUTS.inc(kind="export")
+                raise ExportError(f"{fmt.value} 转换超时（{self.timeout}s）")
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        logger.info(f"转换完成: {fmt.value} -> {key[:12]}")
+
+    @staticmethod
+    def _store(src: str, dst: str) -> None:
+        part = f"{dst}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(src, part)
+        os.chmod(part, READ_ONLY)
+        os.replace(part, dst)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # celery worker 中每个任务使用新的事件循环
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._semaphore
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+export_service = ExportService(
+    max_workers=settings.EXPORT_WORKERS, timeout=settings.EXPORT_TIMEOUT
+)
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from app.config.setting import settings
+from app.services.metrics import LOOP_LAG, LOOP_STALLS
+from app.utils.log_util import logger
+
+# 日志中保留的调用栈层数（最内层）
+STACK_LIMIT = 30
+# 内存中保留的最近阻塞记录数
+MAX_STALLS = 50
+
+
+def collapse_stack(frame) -> str:
+    """将调用栈折叠为一行（外层在前，以 ; 分隔），即火焰图工具使用的 folded 格式"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopMonitor:
+    """事件循环延迟监控与阻塞调用检测
+
+    心跳协程每 interval 秒休眠一次，以实际唤醒时间与预期的差值作为循环延迟写入指标；
+    看门狗线程发现心跳超过 threshold 秒未更新时，抓取事件循环线程当前的调用栈，
+    即正在阻塞循环的同步调用（time.sleep、同步 I/O 等）。开启 profile 后在阻塞期间
+    持续采样调用栈，阻塞结束时写出 folded 格式的火焰图数据。
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.5,
+        profile: bool = False,
+        profile_interval: float = 0.005,
+        stall_dir: str = os.path.join("logs", "stalls"),
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.stall_dir = stall_dir
+        self.stalls: deque[dict] = deque(maxlen=MAX_STALLS)
+        self._beat = 0.0
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """在要监控的事件循环中调用"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._thread.join, 1)
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._beat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+    def _watch(self) -> None:
+        stall: dict | None = None
+        while not self._stop.is_set():
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if stall is not None and beat != stall["beat"]:
+                # 心跳已恢复，阻塞时长为两次心跳的间隔减去休眠时间
+                self._finish(stall, beat - stall["beat"] - self.interval)
+                stall = None
+            elif stall is None and blocked >= self.threshold:
+                stall = self._begin(beat)
+
+            if stall is not None and self.profile:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    stall["samples"][collapse_stack(frame)] += 1
+                self._stop.wait(self.profile_interval)
+            else:
+                self._stop.wait(min(self.interval, self.threshold) / 2)
+
+    def _begin(self, beat: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame)[-STACK_LIMIT:] if frame else []
+        return {
+            "beat": beat,
+            "at": time.time(),
+            "stack": "".join(stack),
+            "samples": Counter(),
+        }
+
+    def _finish(self, stall: dict, duration: float) -> None:
+        LOOP_STALLS.inc()
+        record = {
+            "at": stall["at"],
+            "duration": round(duration, 3),
+            "stack": stall["stack"],
+            "profile": None,
+        }
+        if stall["samples"]:
+            record["profile"] = self._dump(stall["at"], stall["samples"])
+        self.stalls.append(record)
+        logger.warning(
+            f"事件循环阻塞 {duration:.3f}s，阻塞时的调用栈:\n{stall['stack']}"
+            + (f"采样数据: {record['profile']}" if record["profile"] else "")
+        )
+
+    def _dump(self, at: float, samples: Counter) -> str | None:
+        try:
+            os.makedirs(self.stall_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(at))
+            path = os.path.join(self.stall_dir, f"stall-{stamp}-{int(at * 1000) % 1000:03d}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path
+        except Exception as e:
+            logger.error(f"写出阻塞采样数据失败: {str(e)}")
+            return None
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_LAG_INTERVAL,
+    threshold=settings.LOOP_STALL_THRESHOLD,
+    profile=settings.LOOP_STALL_PROFILE,
+)
@@ -0,0 +1,227 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from app.config.setting import settings
+
+# 耗时直方图的默认分桶（秒），覆盖 Redis 发布到长时间的 LLM 调用与内核执行
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+    ):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...], extra: dict | None = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key, value) -> list[str]:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        # 每个分桶只计数落在其中的样本，输出时再累加
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """计时上下文管理器，同步与异步代码中均可使用 with；未启用时不计时"""
+        if not self.registry.enabled:
+            return nullcontext()
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, value) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            labels = self._labels(key, {"le": _format_value(bound)})
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表，以 Prometheus 文本格式输出
+
+    指标在模块导入时注册，热路径上只做一次字典更新；未启用时各方法直接返回。
+    celery worker 中的指标只保存在 worker 进程内，/metrics 只包含 API 进程的数据。
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = "mathmodel"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics: list[_Metric] = []
+
+    def _register(self, cls, name: str, documentation: str, labelnames, **kwargs):
+        metric = cls(
+            self, f"{self.prefix}_{name}", documentation, tuple(labelnames), **kwargs
+        )
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+LLM_LATENCY = metrics.histogram(
+    "llm_request_seconds", "LLM 调用耗时", ("agent", "model")
+)
+LLM_RETRIES = metrics.counter(
+    "llm_retries_total", "LLM 调用失败后的重试次数", ("agent", "model")
+)
+KERNEL_EXECUTION = metrics.histogram(
+    "kernel_execution_seconds", "代码解释器执行一段代码的耗时", ("interpreter",)
+)
+REDIS_PUBLISH = metrics.histogram(
+    "redis_publish_seconds", "向任务频道发布消息的耗时"
+)
+WS_SEND = metrics.histogram(
+    "websocket_send_seconds", "向 WebSocket 发送一条消息的耗时"
+)
+WS_QUEUE_DEPTH = metrics.histogram(
+    "websocket_queue_depth",
+    "每次轮询时订阅频道中积压的消息数（不含没有消息的轮询）",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+WS_CONNECTIONS = metrics.gauge("websocket_connections", "当前 WebSocket 连接数")
+MEMORY_COMPRESSION = metrics.histogram(
+    "memory_compression_seconds", "agent 对话历史压缩（总结）的耗时", ("agent",)
+)
+SCHOLAR_QUERY = metrics.histogram(
+    "scholar_query_seconds", "文献检索请求耗时", ("source",)
+)
+EXPORT_DURATION = metrics.histogram(
+    "export_seconds", "论文导出（pandoc）耗时", ("format",)
+)
+WORKFLOW_STAGE = metrics.histogram(
+    "workflow_stage_seconds", "工作流各阶段耗时", ("stage",)
+)
+TIMEOUTS = metrics.counter("timeouts_total", "超时次数", ("kind",))
+LOOP_LAG = metrics.histogram(
+    "event_loop_lag_seconds",
+    "事件循环延迟（心跳实际唤醒时间与预期的差值）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_STALLS = metrics.counter(
+    "event_loop_stalls_total", "事件循环被阻塞超过阈值的次数"
+)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from app.services.loop_monitor import collapse_stack
+from app.utils.log_util import logger
+from app.utils.task_context import current_task_id
+
+
+class ProfilerError(Exception):
+    """无法执行采样（已有采样在进行、未安装 py-spy、任务没有内核等）"""
+
+    def __init__(self, message: str, status_code: int = 409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _task_tag(loop: asyncio.AbstractEventLoop) -> str | None:
+    """事件循环线程上正在执行的协程所属的建模任务"""
+    task = asyncio.current_task(loop)
+    # Task.get_context 需要 Python 3.12
+    get_context = getattr(task, "get_context", None)
+    if get_context is None:
+        return None
+    return get_context().get(current_task_id)
+
+
+class SamplingProfiler:
+    """按需的栈采样分析器
+
+    API 进程：后台线程每隔 interval 秒抓取所有线程的调用栈，事件循环线程上的样本
+    按正在执行的协程所属任务（current_task_id）打上 task:{task_id} 标签，其余线程
+    标记为 thread:{线程名}；结果为火焰图工具使用的 folded 格式，每行「调用栈 次数」。
+    任务的 Jupyter 内核是独立进程，通过 py-spy 采样。同一时间只允许一次采样。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    async def profile(
+        self, seconds: float, interval: float = 0.01, task_id: str | None = None
+    ) -> str:
+        """采样当前进程，指定 task_id 时只保留该任务的样本"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerError("已有采样正在进行")
+        try:
+            loop = asyncio.get_running_loop()
+            samples = await asyncio.to_thread(
+                self._sample, loop, threading.get_ident(), seconds, interval, task_id
+            )
+        finally:
+            self._lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+    def _sample(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        loop_thread_id: int,
+        seconds: float,
+        interval: float,
+        task_id: str | None,
+    ) -> Counter:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        samples: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id == loop_thread_id:
+                    tag = _task_tag(loop)
+                    tag = f"task:{tag}" if tag else "loop"
+                else:
+                    tag = f"thread:{names.get(thread_id) or thread_id}"
+                if task_id and tag != f"task:{task_id}":
+                    continue
+                samples[f"{tag};{collapse_stack(frame)}"] += 1
+            time.sleep(interval)
+        return samples
+
+    async def profile_kernel(self, task_id: str, seconds: float, interval: float = 0.01) -> str:
+        """通过 py-spy 采样任务的 Jupyter 内核进程"""
+        from app.tools.local_interpreter import kernel_pids
+
+        py_spy = shutil.which("py-spy")
+        if py_spy is None:
+            raise ProfilerError("未安装 py-spy，无法采样内核进程", 501)
+        pids = kernel_pids(task_id)
+        if not pids:
+            raise ProfilerError(f"任务 {task_id} 没有运行中的内核", 404)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerError("已有采样正在进行")
+        try:
+            results = await asyncio.gather(
+                *[self._py_spy(py_spy, pid, seconds, interval) for pid in pids]
+            )
+        finally:
+            self._lock.release()
+        return "".join(results)
+
+    @staticmethod
+    async def _py_spy(py_spy: str, pid: int, seconds: float, interval: float) -> str:
+        fd, output = tempfile.mkstemp(suffix=".folded")
+        os.close(fd)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                py_spy, "record",
+                "--pid", str(pid),
+                "--duration", str(max(1, round(seconds))),
+                "--rate", str(max(1, round(1 / interval))),
+                "--format", "raw",
+                "--output", output,
+                "--nonblocking",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                logger.error(f"py-spy 采样内核 {pid} 失败: {stderr.decode(errors='replace')}")
+                raise ProfilerError(f"py-spy 采样内核 {pid} 失败", 500)
+            with open(output, "r", encoding="utf-8") as f:
+                return "".join(f"kernel:{pid};{line}" for line in f if line.strip())
+        finally:
+            os.remove(output)
+
+
+profiler = SamplingProfiler()
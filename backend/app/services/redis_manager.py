@@ -3,8 +3,10 @@ from typing import Optional
 import json
 from pathlib import Path
 from app.config.setting import settings
+from app.services.metrics import REDIS_PUBLISH
+from app.services.tracing import tracer
 from app.schemas.response import Message
-from app.utils.log_util import logger
+from app.utils.log_util import log_payload, logger
 
 
 class RedisManager:
@@ -31,6 +33,25 @@ class RedisManager:
         await client.set(key, value)
         await client.expire(key, 36000)
 
+    async def mark_task_active(
+        self, task_id: str, status: str, ttl: int, only_new: bool = False
+    ) -> bool:
+        """标记任务正在排队或执行，到期未续期视为已结束（进程退出）
+
+        only_new 为 True 时只在标记不存在时设置，返回是否设置成功
+        """
+        client = await self.get_client()
+        return bool(await client.set(f"task_active:{task_id}", status, ex=ttl, nx=only_new))
+
+    async def task_active_status(self, task_id: str) -> str | None:
+        """任务的排队/执行标记（queued / running），不在排队或执行中时为 None"""
+        client = await self.get_client()
+        return await client.get(f"task_active:{task_id}")
+
+    async def clear_task_active(self, task_id: str):
+        client = await self.get_client()
+        await client.delete(f"task_active:{task_id}")
+
     async def _save_message_to_file(self, task_id: str, message: Message):
         """将消息保存到文件中，同一任务的消息保存在同一个文件中"""
         try:
@@ -65,9 +86,12 @@ class RedisManager:
         channel = f"task:{task_id}:messages"
         try:
             message_json = message.model_dump_json()
-            await client.publish(channel, message_json)
-            logger.debug(
-                f"消息已发布到频道 {channel}:mes_type:{message.msg_type}:msg_content:{message.content}"
+            with REDIS_PUBLISH.time(), tracer.span("publish", "redis"):
+                await client.publish(channel, message_json)
+            log_payload(
+                "publish",
+                f"消息已发布到频道 {channel}:mes_type:{message.msg_type}:msg_content:",
+                message.content,
             )
             # 保存消息到文件
             await self._save_message_to_file(task_id, message)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+from app.config.setting import settings
+from app.utils.log_util import logger
+from app.utils.data_cache import DATA_LOADER_CODE
+
+if TYPE_CHECKING:
+    from e2b_code_interpreter import AsyncSandbox
+
+# 沙箱启动后预先执行的初始化代码
+E2B_INIT_CODE = (
+    "import matplotlib.pyplot as plt\n"
+    "import matplotlib as mpl\n"
+    "plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei', 'PingFang SC']\n"
+    "plt.rcParams['axes.unicode_minus'] = False\n"
+    "plt.rcParams['font.family'] = 'sans-serif'\n"
+    "mpl.rcParams['font.size'] = 12\n"
+) + DATA_LOADER_CODE
+
+
+class SandboxPool:
+    """E2B 沙箱池
+
+    预先创建并执行初始化代码的沙箱放在池中，任务开始时直接取用；
+    超过 TTL 的空闲沙箱会被关闭并补充新的沙箱。
+    """
+
+    def __init__(self, size: int, ttl: int, maintain_interval: int = 30):
+        self.size = size
+        self.ttl = ttl
+        self.maintain_interval = maintain_interval
+        self._idle: deque[tuple[float, "AsyncSandbox"]] = deque()
+        self._pending = 0
+        self._closed = False
+        self._lock = asyncio.Lock()
+        self._maintain_task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+
+    async def start(self):
+        """启动后台维护任务，预热沙箱"""
+        if self.size <= 0 or self._maintain_task:
+            return
+        self._closed = False
+        logger.info(f"启动沙箱池，大小: {self.size}，TTL: {self.ttl}s")
+        self._maintain_task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        """停止维护任务并关闭所有空闲沙箱，关闭后完成预热的沙箱直接销毁"""
+        self._closed = True
+        if self._maintain_task:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+        while self._idle:
+            _, sbx = self._idle.popleft()
+            await self._kill(sbx)
+
+    async def acquire(self, timeout: int = 3000) -> "AsyncSandbox":
+        """取出一个已预热的沙箱，池为空时现场创建"""
+        sbx = None
+        async with self._lock:
+            self._expire()
+            if self._idle:
+                _, sbx = self._idle.popleft()
+                logger.info(f"从沙箱池取出沙箱，剩余: {len(self._idle)}")
+
+        if sbx is None:
+            logger.info("沙箱池为空，创建新沙箱")
+            sbx = await self._create_warm()
+
+        # 交付给任务后按任务超时时间续期
+        await sbx.set_timeout(timeout)
+
+        if self._maintain_task:
+            self._spawn(self._refill())
+        return sbx
+
+    def _spawn(self, coro):
+        # 保留后台任务引用，避免被垃圾回收
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _create_warm(self) -> "AsyncSandbox":
+        # 未配置 E2B 时不导入 SDK
+        from e2b_code_interpreter import AsyncSandbox
+
+        # 沙箱自身的超时略长于 TTL，进程异常退出时由 E2B 回收
+        sbx = await AsyncSandbox.create(
+            api_key=settings.E2B_API_KEY, timeout=self.ttl + 60
+        )
+        try:
+            await sbx.run_code(E2B_INIT_CODE)
+        except Exception:
+            await self._kill(sbx)
+            raise
+        return sbx
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][0] > self.ttl:
+            _, sbx = self._idle.popleft()
+            logger.info("空闲沙箱超过 TTL，关闭")
+            self._spawn(self._kill(sbx))
+
+    async def _refill(self):
+        async with self._lock:
+            self._expire()
+            missing = self.size - len(self._idle) - self._pending
+            if missing <= 0:
+                return
+            self._pending += missing
+
+        async def create_one():
+            try:
+                sbx = await self._create_warm()
+                if self._closed:
+                    # 池已关闭，不再放回，避免沙箱无人回收继续计费
+                    await self._kill(sbx)
+                    return
+                self._idle.append((time.monotonic(), sbx))
+                logger.info(f"沙箱预热完成，池中空闲: {len(self._idle)}")
+            except Exception as e:
+                logger.error(f"沙箱预热失败: {str(e)}")
+            finally:
+                self._pending -= 1
+
+        await asyncio.gather(*(create_one() for _ in range(missing)))
+
+    async def _maintain(self):
+        while True:
+            try:
+                await self._refill()
+            except Exception as e:
+                logger.error(f"沙箱池维护失败: {str(e)}")
+            await asyncio.sleep(self.maintain_interval)
+
+    async def _kill(self, sbx: "AsyncSandbox"):
+        try:
+            await sbx.kill()
+        except Exception as e:
+            logger.error(f"关闭沙箱失败: {str(e)}")
+
+
+sandbox_pool = SandboxPool(
+    size=settings.E2B_POOL_SIZE,
+    ttl=settings.E2B_POOL_TTL,
+)
@@ -0,0 +1,178 @@
+import asyncio
+from fastapi import BackgroundTasks
+from app.config.setting import settings
+from app.core.llm.replay import llm_fixtures
+from app.schemas.enums import CompTemplate, ExportFormat, FormatOutPut, TaskPriority
+from app.schemas.request import Problem
+from app.schemas.response import SystemMessage
+from app.services.export_service import export_service
+from app.services.metrics import TIMEOUTS
+from app.services.redis_manager import redis_manager
+from app.services.task_scheduler import PRIORITY_ORDER, task_scheduler
+from app.services.tracing import tracer
+from app.utils.log_util import logger
+from app.utils.task_context import bind_task_id
+
+# 执行中标记的续期间隔与有效期：进程退出后标记在有效期内自动失效，任务即可恢复
+ACTIVE_HEARTBEAT = 30
+ACTIVE_TTL = 90
+
+
+async def is_task_active(task_id: str) -> bool:
+    """任务是否在排队或执行中（本进程的调度器，或任意进程/worker 的标记）"""
+    if task_scheduler.is_active(task_id):
+        return True
+    return await redis_manager.task_active_status(task_id) is not None
+
+
+async def claim_task(task_id: str) -> bool:
+    """再次提交已有任务（恢复、重新生成）前标记为排队中
+
+    任务仍在本进程的调度器中，或任意进程/worker 的标记未过期时返回 False，
+    避免两个工作流同时写同一个工作目录与断点
+    """
+    if task_scheduler.is_active(task_id):
+        return False
+    # worker 取到任务前无法续期，标记保留到队列可见性超时
+    ttl = settings.TASK_VISIBILITY_TIMEOUT if settings.TASK_QUEUE == "celery" else ACTIVE_TTL
+    return await redis_manager.mark_task_active(task_id, "queued", ttl, only_new=True)
+
+
+async def _keep_active(task_id: str):
+    while True:
+        try:
+            await redis_manager.mark_task_active(task_id, "running", ACTIVE_TTL)
+        except Exception as e:
+            logger.error(f"[{task_id}] 更新执行中标记失败: {str(e)}")
+        await asyncio.sleep(ACTIVE_HEARTBEAT)
+
+
+async def run_modeling_task_async(
+    task_id: str,
+    ques_all: str,
+    comp_template: CompTemplate,
+    format_output: FormatOutPut,
+    resume: bool = False,
+):
+    heartbeat = asyncio.create_task(_keep_active(task_id))
+    try:
+        # 任务内的所有 span（包括工作流创建的子任务）都挂在该根 span 下
+        with bind_task_id(task_id), tracer.trace(task_id, resume=resume):
+            await _run_modeling_task(task_id, ques_all, comp_template, format_output, resume)
+    except Exception as e:
+        # 本地与 celery 两种方式都通知前端任务已结束，否则页面一直等待完成消息
+        logger.error(f"任务 {task_id} 执行失败: {str(e)}")
+        await redis_manager.publish_message(
+            task_id,
+            SystemMessage(content=f"任务执行失败: {str(e)}", type="error"),
+        )
+        raise
+    finally:
+        heartbeat.cancel()
+        try:
+            await redis_manager.clear_task_active(task_id)
+        except Exception as e:
+            logger.error(f"[{task_id}] 清除执行中标记失败: {str(e)}")
+
+
+async def _run_modeling_task(
+    task_id: str,
+    ques_all: str,
+    comp_template: CompTemplate,
+    format_output: FormatOutPut,
+    resume: bool,
+):
+    # 工作流依赖 litellm 等较重的库，执行首个任务时才导入，加快 API 进程启动
+    from app.core.workflow import MathModelWorkFlow
+    from app.utils.track import agent_metrics
+
+    logger.info(f"run modeling task for task_id: {task_id}")
+
+    problem = Problem(
+        task_id=task_id,
+        ques_all=ques_all,
+        comp_template=comp_template,
+        format_output=format_output,
+    )
+
+    # 发送任务开始状态
+    await redis_manager.publish_message(
+        task_id,
+        SystemMessage(content="任务开始处理"),
+    )
+
+    # 短暂延迟确保WebSocket连接
+    await asyncio.sleep(1)
+
+    # 创建任务并等待完成
+    task = asyncio.create_task(MathModelWorkFlow().execute(problem, resume=resume))
+    # 设置超时时间
+    try:
+        await asyncio.wait_for(task, timeout=settings.TASK_TIMEOUT)
+    except asyncio.TimeoutError:
+        TIMEOUTS.inc(kind="task")
+        await redis_manager.publish_message(
+            task_id,
+            SystemMessage(content="任务处理超时，可从断点恢复继续执行", type="error"),
+        )
+        return
+    finally:
+        agent_metrics.release(task_id)
+        llm_fixtures.release(task_id)
+
+    # 发送任务完成状态
+    await redis_manager.publish_message(
+        task_id,
+        SystemMessage(content="任务处理完成", type="success"),
+    )
+    # 转换md为docx，PDF/HTML 由 /export 接口按需生成
+    try:
+        await export_service.export(task_id, ExportFormat.DOCX)
+    except Exception as e:
+        logger.error(f"[{task_id}] 导出 docx 失败: {str(e)}")
+        await redis_manager.publish_message(
+            task_id,
+            SystemMessage(content=f"导出 docx 失败: {str(e)}", type="error"),
+        )
+
+
+async def submit_modeling_task(
+    background_tasks: BackgroundTasks,
+    task_id: str,
+    ques_all: str,
+    comp_template: CompTemplate,
+    format_output: FormatOutPut,
+    user: str = "anonymous",
+    priority: TaskPriority = TaskPriority.NORMAL,
+    resume: bool = False,
+):
+    """提交建模任务，resume 为 True 时从断点恢复
+
+    TASK_QUEUE=celery 时投递到 Redis 队列，由独立的 worker 进程按优先级执行，
+    API 进程只负责接收请求；否则在当前进程内后台执行，由调度器控制并发与排队。
+    """
+    if settings.TASK_QUEUE == "celery":
+        from app.worker import run_modeling_task
+
+        await asyncio.to_thread(
+            run_modeling_task.apply_async,
+            args=(task_id, ques_all, comp_template.value, format_output.value),
+            priority=PRIORITY_ORDER[priority] * 3,
+        )
+        logger.info(f"任务已投递到队列: {task_id}")
+        await redis_manager.publish_message(
+            task_id,
+            SystemMessage(content="任务已进入队列，等待执行"),
+        )
+        return
+
+    logger.info(f"Adding background task for task_id: {task_id}")
+    background_tasks.add_task(
+        task_scheduler.run,
+        task_id,
+        user,
+        priority,
+        lambda: run_modeling_task_async(
+            task_id, ques_all, comp_template, format_output, resume
+        ),
+    )
@@ -0,0 +1,158 @@
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from app.config.setting import settings
+from app.schemas.enums import TaskPriority
+from app.schemas.response import QueueMessage
+from app.services.redis_manager import redis_manager
+from app.utils.log_util import logger
+
+# 优先级从高到低，数值同时用作 Celery 队列优先级的档位（0 最高）
+PRIORITY_ORDER = {
+    TaskPriority.HIGH: 0,
+    TaskPriority.NORMAL: 1,
+    TaskPriority.LOW: 2,
+}
+
+
+@dataclass
+class _Entry:
+    task_id: str
+    user: str
+    priority: TaskPriority
+    seq: int
+    admitted: asyncio.Future = field(repr=False)
+    position: int = -1
+
+
+class TaskScheduler:
+    """建模任务准入控制与公平调度
+
+    - 同时执行的任务不超过 max_concurrent，超出的任务排队等待
+    - 单个用户同时执行的任务不超过 max_per_user（0 表示不限制）
+    - 出队顺序: 优先级 > 该用户上次获得名额的先后（轮转，久未执行或新来的用户优先）
+      > 提交顺序，某个用户突发提交时其他用户的任务不必等其全部执行完
+    - 排队位置变化时通过任务频道推送 QueueMessage
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int = 0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max_per_user
+        self._waiting: list[_Entry] = []
+        self._running: dict[str, int] = {}
+        self._active = 0
+        self._seq = itertools.count()
+        # 用户最近一次获得名额的轮次，用户没有排队或执行中的任务时清除
+        self._last_admitted: dict[str, int] = {}
+        self._turn = itertools.count()
+        # 排队或执行中的任务
+        self._tasks: set[str] = set()
+
+    def is_active(self, task_id: str) -> bool:
+        """任务是否在排队或执行中"""
+        return task_id in self._tasks
+
+    def status(self) -> dict:
+        return {
+            "running": self._active,
+            "waiting": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+        }
+
+    async def run(
+        self,
+        task_id: str,
+        user: str,
+        priority: TaskPriority,
+        job: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """等待准入后执行任务，结束后释放名额"""
+        entry = _Entry(
+            task_id=task_id,
+            user=user,
+            priority=priority,
+            seq=next(self._seq),
+            admitted=asyncio.get_running_loop().create_future(),
+        )
+        self._waiting.append(entry)
+        self._tasks.add(task_id)
+        self._admit()
+
+        if not entry.admitted.done():
+            logger.info(f"任务 {task_id} 进入排队，用户: {user}，优先级: {priority.value}")
+            await self._publish_positions()
+            try:
+                await entry.admitted
+            except asyncio.CancelledError:
+                self._tasks.discard(task_id)
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    await self._publish_positions()
+                else:
+                    # 准入与取消同时发生，归还名额
+                    await self._release(user)
+                raise
+            logger.info(f"任务 {task_id} 结束排队，开始执行")
+
+        try:
+            return await job()
+        finally:
+            self._tasks.discard(task_id)
+            await self._release(user)
+
+    def _sort_key(self, entry: _Entry):
+        return (
+            PRIORITY_ORDER[entry.priority],
+            self._last_admitted.get(entry.user, -1),
+            entry.seq,
+        )
+
+    def _admit(self):
+        while self._active < self.max_concurrent:
+            candidates = [
+                e
+                for e in self._waiting
+                if not self.max_per_user
+                or self._running.get(e.user, 0) < self.max_per_user
+            ]
+            if not candidates:
+                return
+            entry = min(candidates, key=self._sort_key)
+            self._waiting.remove(entry)
+            self._active += 1
+            self._running[entry.user] = self._running.get(entry.user, 0) + 1
+            self._last_admitted[entry.user] = next(self._turn)
+            entry.admitted.set_result(None)
+
+    async def _release(self, user: str):
+        self._active -= 1
+        self._running[user] -= 1
+        if not self._running[user]:
+            del self._running[user]
+            if not any(e.user == user for e in self._waiting):
+                self._last_admitted.pop(user, None)
+        self._admit()
+        await self._publish_positions()
+
+    async def _publish_positions(self):
+        for position, entry in enumerate(sorted(self._waiting, key=self._sort_key)):
+            if entry.position == position:
+                continue
+            entry.position = position
+            try:
+                await redis_manager.publish_message(
+                    entry.task_id,
+                    QueueMessage(
+                        content=f"任务排队中，前面还有 {position} 个任务",
+                        position=position,
+                    ),
+                )
+            except Exception as e:
+                logger.error(f"推送排队位置失败: {str(e)}")
+
+
+task_scheduler = TaskScheduler(
+    max_concurrent=settings.MAX_CONCURRENT_TASKS,
+    max_per_user=settings.MAX_TASKS_PER_USER,
+)
@@ -0,0 +1,275 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any
+from app.config.setting import settings
+from app.utils.log_util import logger
+
+# 每个任务的 span 写入工作目录下的 trace.jsonl，恢复、重新生成的执行追加到同一文件
+TRACE_FILE = "trace.jsonl"
+# 后台线程每批最多写出的 span 数
+EXPORT_BATCH_SIZE = 200
+
+# 当前协程（及其创建的子任务、to_thread 线程）所在的 span，并发任务之间互不影响
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    trace_id: str  # 即 task_id
+    span_id: str
+    parent_id: str | None
+    name: str
+    kind: str  # task / stage / agent / llm / tool / kernel / redis / export
+    start: float
+    end: float | None = None
+    status: str = "ok"
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+def trace_path(task_id: str) -> str:
+    return os.path.join("project", "work_dir", task_id, TRACE_FILE)
+
+
+class SpanExporter:
+    """在后台线程中批量导出 span，结束 span 时只需入队，不阻塞事件循环"""
+
+    def __init__(self, otlp_endpoint: str | None = None):
+        self.otlp_endpoint = otlp_endpoint
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="span-exporter", daemon=True
+                    )
+                    self._thread.start()
+        self._queue.put(span)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """等待已入队的 span 写出"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [item for item in batch if isinstance(item, Span)]
+            try:
+                if spans:
+                    self._write_jsonl(spans)
+                    if self.otlp_endpoint:
+                        self._send_otlp(spans)
+            except Exception as e:
+                logger.error(f"导出 span 失败: {str(e)}")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write_jsonl(self, spans: list[Span]) -> None:
+        by_task: dict[str, list[str]] = {}
+        for span in spans:
+            line = json.dumps(asdict(span), ensure_ascii=False, default=str)
+            by_task.setdefault(span.trace_id, []).append(line)
+        for task_id, lines in by_task.items():
+            path = trace_path(task_id)
+            if not os.path.isdir(os.path.dirname(path)):
+                continue
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def _send_otlp(self, spans: list[Span]) -> None:
+        """以 OTLP/HTTP JSON 格式发送到 collector"""
+        import httpx
+
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": "mathmodelagent"},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.services.tracing"},
+                            "spans": [_to_otlp(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        httpx.post(self.otlp_endpoint, json=payload, timeout=5).raise_for_status()
+
+
+def _to_otlp(span: Span) -> dict:
+    attributes = {"task_id": span.trace_id, "kind": span.kind, **span.attributes}
+    if span.error:
+        attributes["error"] = span.error
+    return {
+        # OTLP 要求 32 位十六进制的 trace id，由 task_id 派生
+        "traceId": hashlib.md5(span.trace_id.encode()).hexdigest(),
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id or "",
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(int(span.start * 1e9)),
+        "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+        "attributes": [
+            {"key": k, "value": {"stringValue": str(v)}} for k, v in attributes.items()
+        ],
+        "status": {"code": 2 if span.status == "error" else 1},
+    }
+
+
+class Tracer:
+    """按任务的轻量级 span 追踪
+
+    trace() 为任务创建根 span，之后任务内（包括其创建的子任务）调用 span()
+    创建嵌套的子 span：工作流阶段 -> agent 轮次 -> LLM 调用 / 工具调用 -> 内核执行。
+    不在任务内或未启用时 span() 返回空的上下文管理器。
+    """
+
+    def __init__(self, exporter: SpanExporter, enabled: bool = True):
+        self.exporter = exporter
+        self.enabled = enabled
+
+    def trace(self, task_id: str, name: str = "task", **attributes):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(task_id, None, name, "task", attributes)
+
+    def span(self, name: str, kind: str = "internal", **attributes):
+        parent = _current_span.get()
+        if parent is None or not self.enabled:
+            return nullcontext()
+        return self._span(parent.trace_id, parent.span_id, name, kind, attributes)
+
+    @staticmethod
+    def current() -> Span | None:
+        return _current_span.get()
+
+    @contextmanager
+    def _span(self, trace_id, parent_id, name, kind, attributes):
+        span = Span(
+            trace_id=trace_id,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent_id,
+            name=name,
+            kind=kind,
+            start=time.time(),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {str(e)[:200]}"
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(token)
+            self.exporter.export(span)
+
+
+def load_spans(task_id: str) -> list[dict]:
+    """读取任务的 span，跳过无法解析的行（进程在写出途中退出时留下的半行）"""
+    path = trace_path(task_id)
+    if not os.path.exists(path):
+        return []
+    spans = []
+    skipped = 0
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if isinstance(span, dict) and "span_id" in span and "start" in span:
+                spans.append(span)
+            else:
+                skipped += 1
+    if skipped:
+        logger.warning(f"任务 {task_id} 的追踪文件中有 {skipped} 行无法解析，已跳过")
+    return spans
+
+
+def build_timeline(spans: list[dict]) -> dict:
+    """生成甘特图所需的数据：每个 span 相对任务开始的偏移、耗时与层级，以及按类型汇总的耗时"""
+    if not spans:
+        return {"start": None, "duration_ms": 0, "spans": [], "by_kind": {}}
+
+    spans = sorted(spans, key=lambda s: s["start"])
+    parents = {s["span_id"]: s.get("parent_id") for s in spans}
+
+    def depth(span_id: str) -> int:
+        level = 0
+        while parents.get(span_id):
+            span_id = parents[span_id]
+            level += 1
+        return level
+
+    t0 = spans[0]["start"]
+    t1 = max(s.get("end") or s["start"] for s in spans)
+    items = []
+    by_kind: dict[str, dict] = {}
+    for s in spans:
+        duration = ((s.get("end") or s["start"]) - s["start"]) * 1000
+        items.append(
+            {
+                "id": s["span_id"],
+                "parent_id": s.get("parent_id"),
+                "name": s["name"],
+                "kind": s["kind"],
+                "depth": depth(s["span_id"]),
+                "offset_ms": round((s["start"] - t0) * 1000, 3),
+                "duration_ms": round(duration, 3),
+                "status": s.get("status", "ok"),
+                "error": s.get("error"),
+                "attributes": s.get("attributes", {}),
+            }
+        )
+        kind = by_kind.setdefault(s["kind"], {"count": 0, "total_ms": 0.0})
+        kind["count"] += 1
+        kind["total_ms"] = round(kind["total_ms"] + duration, 3)
+    return {
+        "start": t0,
+        "duration_ms": round((t1 - t0) * 1000, 3),
+        "spans": items,
+        "by_kind": by_kind,
+    }
+
+
+tracer = Tracer(
+    SpanExporter(otlp_endpoint=settings.TRACE_OTLP_ENDPOINT),
+    enabled=settings.TRACE_ENABLED,
+)
+atexit.register(tracer.exporter.flush)
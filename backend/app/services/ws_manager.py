@@ -1,4 +1,5 @@
 from fastapi import WebSocket
+from app.services.metrics import WS_CONNECTIONS
 
 
 class WebSocketManager:
@@ -8,9 +9,11 @@ class WebSocketManager:
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        WS_CONNECTIONS.set(len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
+        WS_CONNECTIONS.set(len(self.active_connections))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.services import data_ingest
+from app.services.blob_store import BlobStore
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BlobStore(os.path.join(self.tmp.name, "blobs"))
+        self.src = os.path.join(self.tmp.name, "data.csv")
+        with open(self.src, "w") as f:
+            f.write("a,b\n1,2\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_deduplicates_and_links(self):
+        sha1 = self.store.put(self.src)
+        sha2 = self.store.put(self.src)
+        self.assertEqual(sha1, sha2)
+        self.assertTrue(self.store.has(sha1))
+
+        dst = os.path.join(self.tmp.name, "work", "data.csv")
+        os.makedirs(os.path.dirname(dst))
+        self.store.link_to(sha1, dst)
+        with open(dst) as f:
+            self.assertEqual(f.read(), "a,b\n1,2\n")
+        # 源文件不与仓库共享
+        self.assertEqual(os.stat(self.src).st_nlink, 1)
+
+    def test_derive_builds_once(self):
+        calls = []
+
+        def build(out_dir):
+            calls.append(out_dir)
+            with open(os.path.join(out_dir, "profile.json"), "w") as f:
+                f.write("{}")
+
+        first = self.store.derive("v1/key", build)
+        second = self.store.derive("v1/key", build)
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(os.path.exists(os.path.join(first, "profile.json")))
+
+    def test_derive_failure_returns_none(self):
+        def build(out_dir):
+            raise ValueError("bad data")
+
+        self.assertIsNone(self.store.derive("v1/bad", build))
+        self.assertFalse(os.path.exists(os.path.join(self.store.derived_dir, "v1", "bad")))
+
+    def test_work_dir_writes_do_not_touch_blob(self):
+        work_dir = os.path.join(self.tmp.name, "work")
+        os.makedirs(work_dir)
+        data = os.path.join(work_dir, "附件1.csv")
+        with open(data, "w") as f:
+            f.write("a,b\n1,2\n")
+        sha256 = self.store.hash_file(data)
+
+        with mock.patch.object(data_ingest, "blob_store", self.store):
+            data_ingest.ingest_data_files(work_dir)
+        parquet = f"{data}.parquet"
+
+        # 任务代码直接覆盖数据文件与 Parquet 副本（如 df.to_csv('附件1.csv')）
+        for path in (data, parquet):
+            self.assertEqual(os.stat(path).st_nlink, 1)
+            with open(path, "w") as f:
+                f.write("overwritten\n")
+
+        with open(self.store.path(sha256)) as f:
+            self.assertEqual(f.read(), "a,b\n1,2\n")
+        derived = os.path.join(self.store.derived_dir, f"v{data_ingest.DERIVED_VERSION}")
+        for name in os.listdir(os.path.join(derived, f"{sha256}.csv")):
+            with open(os.path.join(derived, f"{sha256}.csv", name), "rb") as f:
+                self.assertNotEqual(f.read(), b"overwritten\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from app.core.checkpoint import CHECKPOINT_NAME, WorkflowCheckpoint
+from app.core.workflow import MathModelWorkFlow
+from app.schemas.A2A import WriterResponse
+from app.tools.local_interpreter import LocalCodeInterpreter
+from app.tools.notebook_serializer import NotebookSerializer
+
+
+class FakeAgent:
+    def __init__(self):
+        self.chat_history = []
+        self.is_first_run = True
+
+
+class TestWorkflowCheckpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # Redis 不可用时断点仍保存在工作目录
+        patcher = patch(
+            "app.core.checkpoint.redis_manager.get_client",
+            new=AsyncMock(side_effect=ConnectionError("redis down")),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_save_and_load(self):
+        checkpoint = WorkflowCheckpoint("task", self.tmp.name)
+        agent = FakeAgent()
+        agent.chat_history = [{"role": "user", "content": "hi"}]
+        await checkpoint.save("modeler", {"questions_solution": {"eda": "x"}})
+        response = WriterResponse(response_content="正文", footnotes=[("1", "ref")])
+        await checkpoint.save(
+            "writer", response.model_dump(), "eda", agents={"WriterAgent": agent}
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, CHECKPOINT_NAME)))
+
+        restored = WorkflowCheckpoint("task", self.tmp.name)
+        self.assertTrue(await restored.load())
+        self.assertEqual(restored.completed(), ["modeler", "writer:eda"])
+        self.assertEqual(
+            WriterResponse(**restored.get("writer", "eda")).response_content, "正文"
+        )
+        new_agent = FakeAgent()
+        restored.restore_agent("WriterAgent", new_agent)
+        self.assertEqual(new_agent.chat_history, agent.chat_history)
+        self.assertFalse(new_agent.is_first_run)
+
+    async def test_load_without_checkpoint(self):
+        checkpoint = WorkflowCheckpoint("task", self.tmp.name)
+        self.assertFalse(await checkpoint.load())
+        self.assertFalse(checkpoint.resumed)
+
+
+class TestReplayCells(unittest.IsolatedAsyncioTestCase):
+    async def test_replay_restores_kernel_state(self):
+        with tempfile.TemporaryDirectory() as work_dir, patch(
+            "app.tools.local_interpreter.redis_manager.publish_message", new=AsyncMock()
+        ), patch(
+            "app.tools.base_interpreter.redis_manager.publish_message", new=AsyncMock()
+        ):
+            first = LocalCodeInterpreter("task", work_dir, NotebookSerializer(work_dir))
+            await first.initialize()
+            try:
+                await first.execute_code("x = 41")
+                await first.execute_code("raise ValueError('bad')")
+                await first.execute_code("x += 5")
+                # 修改后重新赋值，重放时必须同样执行，否则 x 停留在修改后的值
+                await first.execute_code("x = 41")
+                state = first.get_state()
+            finally:
+                await first.cleanup()
+            self.assertEqual(state["executed_cells"], ["x = 41", "x += 5", "x = 41"])
+
+            second = LocalCodeInterpreter("task", work_dir, NotebookSerializer(work_dir))
+            await second.initialize()
+            try:
+                second.restore_state(state)
+                await second.replay_cells()
+                output, error, _ = await second.execute_code("print(x + 1)")
+            finally:
+                await second.cleanup()
+            self.assertFalse(error)
+            self.assertIn("42", output)
+
+    def test_rewind_drops_cells_of_rerun_section(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            interpreter = LocalCodeInterpreter("task", work_dir, NotebookSerializer(work_dir))
+            interpreter.begin_section("eda")
+            interpreter._record_cell("df = load()")
+            interpreter.snapshot_info = {"name": "eda", "cells": 1}
+            interpreter.begin_section("ques1")
+            interpreter._record_cell("model_v1 = fit(df)")
+            interpreter.begin_section("ques2")
+            interpreter._record_cell("pred = model_v1.predict()")
+
+            state = interpreter.get_state()
+            resumed = LocalCodeInterpreter("task", work_dir, NotebookSerializer(work_dir))
+            resumed.restore_state(state)
+            resumed.rewind_to_section("ques1")
+            self.assertEqual(resumed.executed_cells, ["df = load()"])
+            self.assertEqual(resumed.snapshot_info, {"name": "eda", "cells": 1})
+
+            # 重新运行的代码接在截断位置之后
+            resumed.begin_section("ques1")
+            resumed._record_cell("model_v2 = fit(df)")
+            self.assertEqual(resumed.executed_cells, ["df = load()", "model_v2 = fit(df)"])
+
+            # 快照包含被丢弃的代码产生的变量时失效
+            resumed.rewind_to_section("eda")
+            self.assertEqual(resumed.executed_cells, [])
+            self.assertIsNone(resumed.snapshot_info)
+
+
+class TestNeedsKernel(unittest.TestCase):
+    def checkpoint(self, **data):
+        checkpoint = WorkflowCheckpoint("task", tempfile.gettempdir())
+        checkpoint.data.update(data)
+        return checkpoint
+
+    def test_writer_only_regeneration_skips_kernel(self):
+        questions = {"title": "t", "background": "b", "ques_count": 1, "ques1": "q"}
+        coordinator = {"questions": questions, "ques_count": 1}
+        coder = {key: {"code_response": "ok"} for key in ("eda", "ques1", "sensitivity_analysis")}
+        checkpoint = self.checkpoint(coordinator=coordinator, coder=coder)
+        self.assertFalse(MathModelWorkFlow._needs_kernel(checkpoint, set()))
+        self.assertTrue(MathModelWorkFlow._needs_kernel(checkpoint, {"ques1"}))
+
+        del coder["ques1"]
+        self.assertTrue(MathModelWorkFlow._needs_kernel(checkpoint, set()))
+        self.assertTrue(MathModelWorkFlow._needs_kernel(self.checkpoint(), set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from litellm import ModelResponse
+
+from app.core.agents.coder_agent import CoderAgent
+from app.schemas.A2A import CoderToWriter
+
+
+def make_response(content: str, code: str | None = None) -> ModelResponse:
+    message = {"role": "assistant", "content": content}
+    if code is not None:
+        message["tool_calls"] = [
+            {
+                "id": "call_1",
+                "type": "function",
+                "function": {"name": "execute_code", "arguments": json.dumps({"code": code})},
+            }
+        ]
+    return ModelResponse(
+        choices=[{"index": 0, "message": message, "finish_reason": "stop"}]
+    )
+
+
+class FakeLLM:
+    def __init__(self, responses: list[ModelResponse]):
+        self.responses = list(responses)
+        self.calls: list[dict] = []
+
+    async def chat(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+class FakeInterpreter:
+    def __init__(self, results: list[tuple[str, bool, str]]):
+        self.results = list(results)
+        self.executed: list[str] = []
+
+    def add_section(self, section: str) -> None:
+        pass
+
+    async def execute_code(self, code: str) -> tuple[str, bool, str]:
+        self.executed.append(code)
+        return self.results.pop(0)
+
+    async def get_created_images(self, section: str) -> list[str]:
+        return ["fig.png"]
+
+
+class TestCoderAgent(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher = patch(
+            "app.core.agents.coder_agent.redis_manager.publish_message", new=AsyncMock()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.work_dir = tmp.name
+
+    def make_agent(self, responses, results, max_retries: int = 5) -> CoderAgent:
+        self.llm = FakeLLM(responses)
+        self.interpreter = FakeInterpreter(results)
+        agent = CoderAgent(
+            "task", self.llm, self.work_dir, max_retries=max_retries,
+            code_interpreter=self.interpreter,
+        )
+        agent.max_memory = 1000
+        return agent
+
+    async def test_runs_tool_calls_until_plain_reply(self):
+        agent = self.make_agent(
+            [make_response("", "print(1)"), make_response("eda 完成")],
+            [("1", False, "")],
+        )
+        result = await agent.run("做 EDA", subtask_title="eda")
+
+        self.assertIsInstance(result, CoderToWriter)
+        self.assertEqual(result.code_response, "eda 完成")
+        self.assertEqual(result.created_images, ["fig.png"])
+        self.assertEqual(self.interpreter.executed, ["print(1)"])
+        # 每个子任务的调用按 stage 区分，录制回放时互不混淆
+        self.assertEqual({c["sub_title"] for c in self.llm.calls}, {"eda"})
+        tool = [m for m in agent.chat_history if m["role"] == "tool"]
+        self.assertEqual(tool[0]["content"], "1")
+        self.assertEqual(agent.chat_history[-1], {"role": "assistant", "content": "eda 完成"})
+
+    async def test_errors_are_fed_back_and_limited(self):
+        agent = self.make_agent(
+            [make_response("", "1/0"), make_response("", "x"), make_response("完成")],
+            [("", True, "ZeroDivisionError"), ("", True, "NameError")],
+            max_retries=2,
+        )
+        with self.assertRaises(Exception) as ctx:
+            await agent.run("求解", subtask_title="ques1")
+        self.assertIn("NameError", str(ctx.exception))
+        self.assertEqual(len(self.llm.calls), 2)
+        reflections = [
+            m for m in agent.chat_history
+            if m["role"] == "user" and "ZeroDivisionError" in m["content"]
+        ]
+        self.assertEqual(len(reflections), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
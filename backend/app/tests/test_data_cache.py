@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+
+from app.utils.data_cache import DATA_LOADER_CODE, convert_data_file, read_csv
+
+
+class TestDataLoader(unittest.TestCase):
+    """内核中注入的 load_data / save_data"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.namespace: dict = {}
+        exec(DATA_LOADER_CODE, self.namespace)
+        self.load_data = self.namespace["load_data"]
+        self.save_data = self.namespace["save_data"]
+        self.csv = os.path.join(self.tmp.name, "data.csv")
+        pd.DataFrame({"a": [1, 2], "b": [3, 4]}).to_csv(self.csv, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _set_mtime(self, path: str, offset: float):
+        now = time.time()
+        os.utime(path, (now + offset, now + offset))
+
+    def test_load_prefers_parquet_copy(self):
+        pd.DataFrame({"a": [9], "b": [9]}).to_parquet(f"{self.csv}.parquet", index=False)
+        self._set_mtime(self.csv, -10)
+        self.assertEqual(self.load_data(self.csv)["a"].tolist(), [9])
+        self.assertEqual(self.load_data(self.csv, columns=["b"]).columns.tolist(), ["b"])
+
+    def test_load_ignores_stale_parquet_copy(self):
+        pd.DataFrame({"a": [9], "b": [9]}).to_parquet(f"{self.csv}.parquet", index=False)
+        # 原始文件在副本生成后被改写
+        self._set_mtime(f"{self.csv}.parquet", -10)
+        self.assertEqual(self.load_data(self.csv)["a"].tolist(), [1, 2])
+
+    def test_load_falls_back_to_original(self):
+        self.assertEqual(self.load_data(self.csv)["b"].tolist(), [3, 4])
+
+    def test_save_writes_parquet_copy(self):
+        df = pd.DataFrame({"a": [5, 6], "b": [7, 8]})
+        self.save_data(df, self.csv)
+        self.assertTrue(os.path.exists(f"{self.csv}.parquet"))
+        pd.testing.assert_frame_equal(self.load_data(self.csv), df)
+        pd.testing.assert_frame_equal(pd.read_csv(self.csv), df)
+
+    def test_save_does_not_write_through_links(self):
+        shared = os.path.join(self.tmp.name, "shared.csv")
+        os.link(self.csv, shared)
+        self.save_data(pd.DataFrame({"a": [0], "b": [0]}), self.csv)
+        self.assertEqual(pd.read_csv(shared)["a"].tolist(), [1, 2])
+
+
+class TestConvertDataFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_csv_gbk_after_ascii_head(self):
+        # 编码检测只看开头 64KB，之后的 GBK 内容需要在读取时回退
+        path = os.path.join(self.tmp.name, "gbk.csv")
+        with open(path, "w", encoding="gbk") as f:
+            f.write("id,name\n" + "".join(f"{i},abc\n" for i in range(20000)) + "20000,数学建模\n")
+        df = read_csv(path)
+        self.assertEqual(len(df), 20001)
+        self.assertEqual(df["name"].iloc[-1], "数学建模")
+
+    def test_convert_csv(self):
+        path = os.path.join(self.tmp.name, "data.csv")
+        pd.DataFrame({"a": [1, 2]}).to_csv(path, index=False)
+        self.assertEqual(convert_data_file(path), [f"{path}.parquet"])
+        self.assertEqual(pd.read_parquet(f"{path}.parquet")["a"].tolist(), [1, 2])
+
+    def test_convert_xlsx_sheets_and_mixed_columns(self):
+        path = os.path.join(self.tmp.name, "data.xlsx")
+        with pd.ExcelWriter(path) as writer:
+            pd.DataFrame({"x": [1, None, "a"]}).to_excel(writer, sheet_name="s1", index=False)
+            pd.DataFrame({"y": [2.5]}).to_excel(writer, sheet_name="s2", index=False)
+        created = convert_data_file(path)
+        self.assertEqual(
+            created,
+            [f"{path}.s1.parquet", f"{path}.parquet", f"{path}.s2.parquet"],
+        )
+        # 混杂类型的列按字符串保存，空值保持为空
+        column = pd.read_parquet(f"{path}.parquet")["x"]
+        self.assertEqual(column.dropna().tolist(), ["1", "a"])
+        self.assertTrue(column.isna()[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.utils import data_profile
+from app.utils.data_profile import profile_data_file
+
+
+class TestDataProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, text: str, encoding: str = "utf-8"):
+        with open(self.path, "w", encoding=encoding) as f:
+            f.write(text)
+
+    def test_profile_small_csv(self):
+        self._write("a,b\n1,x\n2,x\n3,y\n")
+        profile = profile_data_file(self.path)[""]
+        self.assertEqual(profile["rows"], 3)
+        self.assertEqual(profile["columns"]["a"]["max"], 3.0)
+        self.assertEqual(profile["columns"]["b"]["top"][0], ["x", 2])
+
+    def test_chunked_profile_column_numeric_in_later_chunks(self):
+        # 首块中 b 为文本，后续分块才成为数值列
+        self._write("a,b\n1,x\n2,y\n3,5\n4,-7\n5,\n")
+        with mock.patch.object(data_profile, "CHUNKED_THRESHOLD", 0), mock.patch.object(
+            data_profile, "CHUNK_ROWS", 2
+        ):
+            profile = profile_data_file(self.path)[""]
+        self.assertTrue(profile["sampled"])
+        self.assertEqual(profile["rows"], 5)
+        self.assertEqual(profile["columns"]["a"]["min"], 1.0)
+        self.assertEqual(profile["columns"]["a"]["max"], 5.0)
+        self.assertEqual(profile["columns"]["b"]["min"], -7.0)
+        self.assertEqual(profile["columns"]["b"]["max"], 5.0)
+        self.assertEqual(profile["columns"]["b"]["missing"], 1)
+
+    def test_chunked_profile_gbk_after_ascii_head(self):
+        # 文件开头 64KB 全是 ASCII，之后才出现 GBK 编码的中文
+        rows = "".join(f"{i},abc\n" for i in range(20000))
+        self._write("id,name\n" + rows + "20000,数学建模\n", encoding="gbk")
+        with mock.patch.object(data_profile, "CHUNKED_THRESHOLD", 0):
+            profile = profile_data_file(self.path)[""]
+        self.assertEqual(profile["rows"], 20001)
+        self.assertIn(["数学建模", 1], profile["columns"]["name"]["top"])
+
+
+if __name__ == "__main__":
+    unittest.main()
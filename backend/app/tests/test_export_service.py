@@ -0,0 +1,82 @@
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.schemas.enums import ExportFormat
+from app.services.export_service import ExportService, export_key
+
+# 代替 pandoc：将输入复制到 --output，并记录调用次数
+FAKE_PANDOC = """#!{python}
+import shutil, sys
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("pandoc 3.1")
+    sys.exit(0)
+with open({calls!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+shutil.copyfile(args[0], args[args.index("--output") + 1])
+"""
+
+
+class TestExportService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.work_dir = os.path.join(tmp.name, "task")
+        os.makedirs(self.work_dir)
+        with open(os.path.join(self.work_dir, "res.md"), "w", encoding="utf-8") as f:
+            f.write("# 论文\n\n![图1](http://localhost:8000/static/task/fig.png)\n")
+        with open(os.path.join(self.work_dir, "fig.png"), "wb") as f:
+            f.write(b"png-1")
+
+        self.calls = os.path.join(tmp.name, "calls.log")
+        pandoc = os.path.join(tmp.name, "pandoc")
+        with open(pandoc, "w") as f:
+            f.write(FAKE_PANDOC.format(python=sys.executable, calls=self.calls))
+        os.chmod(pandoc, os.stat(pandoc).st_mode | stat.S_IEXEC)
+
+        for patcher in (
+            patch.dict(os.environ, {"PYPANDOC_PANDOC": pandoc}),
+            patch("app.services.export_service.get_work_dir", return_value=self.work_dir),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = ExportService(max_workers=2, timeout=30)
+        self.service.cache_dir = os.path.join(tmp.name, "cache")
+        self.addCleanup(self.service.close)
+
+    def call_count(self) -> int:
+        with open(self.calls) as f:
+            return len(f.readlines())
+
+    def test_key_covers_images(self):
+        key = export_key("task", self.work_dir)
+        self.assertEqual(key, export_key("task", self.work_dir))
+        with open(os.path.join(self.work_dir, "fig.png"), "wb") as f:
+            f.write(b"png-2")
+        self.assertNotEqual(key, export_key("task", self.work_dir))
+
+    async def test_export_is_cached(self):
+        results = await self.service.export_many(
+            "task", [ExportFormat.DOCX, ExportFormat.HTML]
+        )
+        self.assertEqual(
+            results[ExportFormat.DOCX], os.path.join(self.work_dir, "res.docx")
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.work_dir, "res.html")))
+        self.assertEqual(self.call_count(), 2)
+
+        # 内容未变化时不再调用 pandoc
+        await self.service.export("task", ExportFormat.DOCX)
+        self.assertEqual(self.call_count(), 2)
+        with open(os.path.join(self.work_dir, "res.md"), "a", encoding="utf-8") as f:
+            f.write("\n新增内容\n")
+        await self.service.export("task", ExportFormat.DOCX)
+        self.assertEqual(self.call_count(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
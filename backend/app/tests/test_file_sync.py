@@ -0,0 +1,107 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from app.tools.file_sync import SandboxFileSync
+
+
+class FakeCommands:
+    async def run(self, cmd: str):
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        return SimpleNamespace(stdout=result.stdout)
+
+
+class FakeFiles:
+    def __init__(self):
+        self.writes: list[str] = []
+        self.reads: list[str] = []
+
+    async def write(self, path: str, data):
+        self.writes.append(path)
+        with open(path, "wb") as f:
+            f.write(data.read())
+
+    async def read(self, path: str, format: str = "text"):
+        self.reads.append(path)
+
+        async def stream():
+            with open(path, "rb") as f:
+                while chunk := f.read(4):
+                    yield chunk
+
+        return stream()
+
+
+class FakeSandbox:
+    def __init__(self, sandbox_id: str = "sbx-1"):
+        self.sandbox_id = sandbox_id
+        self.commands = FakeCommands()
+        self.files = FakeFiles()
+
+
+class TestSandboxFileSync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.local_dir = tempfile.TemporaryDirectory()
+        self.remote_dir = tempfile.TemporaryDirectory()
+        self.sbx = FakeSandbox()
+        self.sync = SandboxFileSync(
+            self.sbx, self.local_dir.name, remote_dir=self.remote_dir.name
+        )
+
+    def tearDown(self):
+        self.local_dir.cleanup()
+        self.remote_dir.cleanup()
+
+    def _write(self, directory: str, name: str, content: bytes):
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(content)
+
+    async def test_upload_skips_unchanged(self):
+        self._write(self.local_dir.name, "data.csv", b"a,b\n1,2\n")
+        self.assertEqual(await self.sync.upload(["data.csv"]), ["data.csv"])
+        self.assertEqual(await self.sync.upload(["data.csv"]), [])
+        # 上传后的文件不应被再次下载
+        self.assertEqual(await self.sync.download(), [])
+
+    async def test_download_only_deltas(self):
+        self._write(self.remote_dir.name, "fig.png", b"image-bytes")
+        self._write(self.remote_dir.name, ".bashrc", b"ignored")
+        self.assertEqual(await self.sync.download(), ["fig.png"])
+        with open(os.path.join(self.local_dir.name, "fig.png"), "rb") as f:
+            self.assertEqual(f.read(), b"image-bytes")
+
+        self.assertEqual(await self.sync.download(), [])
+
+        # 内容相同但 mtime 变化：只比对哈希，不重新下载
+        os.utime(os.path.join(self.remote_dir.name, "fig.png"), (1, 1))
+        self.assertEqual(await self.sync.download(), [])
+        self.assertEqual(len(self.sbx.files.reads), 1)
+
+        self._write(self.remote_dir.name, "fig.png", b"new-image-bytes")
+        self.assertEqual(await self.sync.download(), ["fig.png"])
+
+    async def test_manifest_persists_across_instances(self):
+        self._write(self.remote_dir.name, "res.csv", b"x\n1\n")
+        await self.sync.download()
+        reloaded = SandboxFileSync(
+            self.sbx, self.local_dir.name, remote_dir=self.remote_dir.name
+        )
+        self.assertEqual(await reloaded.download(), [])
+
+    async def test_new_sandbox_resets_remote_manifest(self):
+        self._write(self.local_dir.name, "data.csv", b"a,b\n1,2\n")
+        self.assertEqual(await self.sync.upload(["data.csv"]), ["data.csv"])
+
+        # 恢复任务时从池中取到新沙箱，其中没有已上传的文件
+        with tempfile.TemporaryDirectory() as fresh_dir:
+            fresh = SandboxFileSync(
+                FakeSandbox("sbx-2"), self.local_dir.name, remote_dir=fresh_dir
+            )
+            self.assertEqual(await fresh.upload(["data.csv"]), ["data.csv"])
+            self.assertTrue(os.path.exists(os.path.join(fresh_dir, "data.csv")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from app.tools import kernel_snapshot
+from app.tools.local_interpreter import LocalCodeInterpreter, kernel_pids
+from app.tools.notebook_serializer import NotebookSerializer
+
+
+class TestKernelSnapshot(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        for target in (
+            "app.tools.local_interpreter.redis_manager.publish_message",
+            "app.tools.base_interpreter.redis_manager.publish_message",
+        ):
+            patcher = patch(target, new=AsyncMock())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.work_dir = tmp.name
+
+    async def new_interpreter(self) -> LocalCodeInterpreter:
+        interpreter = LocalCodeInterpreter(
+            "task", self.work_dir, NotebookSerializer(self.work_dir)
+        )
+        await interpreter.initialize()
+        self.addAsyncCleanup(interpreter.cleanup)
+        return interpreter
+
+    async def test_snapshot_and_restore(self):
+        parent = await self.new_interpreter()
+        await parent.execute_code(
+            "import numpy as np\n"
+            "import pandas as pd\n"
+            "df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})\n"
+            "params = {'alpha': 0.5}\n"
+            "def scale(v):\n    return v * params['alpha']\n"
+        )
+        manifest = await parent.snapshot("eda")
+        self.assertEqual(manifest["frames"], ["df"])
+        self.assertIn("params", manifest["objects"])
+        self.assertEqual(parent.snapshot_info, {"name": "eda", "cells": 1})
+
+        # 大 DataFrame 以内存映射的 Arrow 类型加载
+        restored = await self.new_interpreter()
+        with patch.object(kernel_snapshot, "MMAP_THRESHOLD", 0):
+            self.assertEqual(await restored.restore_snapshot("eda"), [])
+        output, error, _ = await restored.execute_code(
+            "print(int(df['a'].sum()), scale(4), np.pi > 3, str(df['a'].dtype))"
+        )
+        self.assertFalse(error, output)
+        self.assertIn("6 2.0 True int64[pyarrow]", output)
+
+    async def test_fork_children_share_snapshot(self):
+        parent = await self.new_interpreter()
+        await parent.execute_code(
+            "import pandas as pd\n"
+            "df = pd.DataFrame({'a': [1, 2, 3]})\n"
+            "alpha = 0.5\n"
+        )
+        await parent.snapshot("eda")
+        # 快照之后父内核的修改不影响子内核
+        await parent.execute_code("alpha = 9")
+
+        children = await parent.fork(2)
+        for child in children:
+            self.addAsyncCleanup(child.cleanup)
+        self.assertEqual(len(kernel_pids("task")), 3)
+
+        await children[0].execute_code("df['a'] *= 10")
+        for child, expected in zip(children, ("60 0.5", "6 0.5")):
+            output, error, _ = await child.execute_code("print(int(df['a'].sum()), alpha)")
+            self.assertFalse(error, output)
+            self.assertIn(expected, output)
+        self.assertEqual(
+            children[1].notebook_serializer.notebook_path,
+            os.path.join(self.work_dir, "notebook_eda_1.ipynb"),
+        )
+
+    async def test_resnapshot_keeps_mapped_files_of_restored_kernel(self):
+        parent = await self.new_interpreter()
+        await parent.execute_code(
+            "import pandas as pd\ndf = pd.DataFrame({'a': list(range(1000))})"
+        )
+        await parent.snapshot("eda")
+        restored = await self.new_interpreter()
+        with patch.object(kernel_snapshot, "MMAP_THRESHOLD", 0):
+            self.assertEqual(await restored.restore_snapshot("eda"), [])
+
+        # 重新执行 eda 后再次快照，不能截断恢复内核映射中的旧文件
+        await parent.execute_code("df = pd.DataFrame({'a': [1]})")
+        await parent.snapshot("eda")
+        output, error, _ = await restored.execute_code("print(int(df['a'].sum()))")
+        self.assertFalse(error, output)
+        self.assertIn("499500", output)
+        self.assertEqual(
+            os.listdir(os.path.join(self.work_dir, kernel_snapshot.SNAPSHOT_DIR)), ["eda"]
+        )
+
+    async def test_incomplete_snapshot_replays_all_cells(self):
+        parent = await self.new_interpreter()
+        await parent.execute_code(
+            "class Model:\n"
+            "    def __reduce__(self):\n"
+            "        return (_broken, ())\n"
+            "def _broken():\n"
+            "    raise RuntimeError('cannot restore')\n"
+            "model = Model()\n"
+            "total = 41\n"
+        )
+        await parent.snapshot("eda")
+        await parent.execute_code("total += 1")
+        state = parent.get_state()
+
+        resumed = await self.new_interpreter()
+        self.assertEqual(await resumed.restore_snapshot("eda"), ["model"])
+        resumed.restore_state(state)
+        await resumed.replay_cells()
+        output, error, _ = await resumed.execute_code("print(type(model).__name__, total)")
+        self.assertFalse(error, output)
+        self.assertIn("Model 42", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from litellm import ModelResponse
+
+from app.core.llm.llm import LLM
+from app.core.llm.replay import LLMFixtureStore, ReplayExhausted
+
+
+def make_response(content: str, tool_calls: list | None = None) -> ModelResponse:
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return ModelResponse(
+        model="deepseek-chat",
+        choices=[{"index": 0, "message": message, "finish_reason": "stop"}],
+        usage={"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+    )
+
+
+def make_kwargs(agent: str, stage: str | None, attempt: int = 0) -> dict:
+    return {
+        "model": "deepseek/deepseek-chat",
+        "messages": [{"role": "user", "content": "hi"}],
+        "metadata": {
+            "task_id": "task",
+            "agent_name": agent,
+            "stage": stage,
+            "attempt": attempt,
+        },
+    }
+
+
+class TestLLMReplay(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        tool_call = {
+            "id": "call_1",
+            "type": "function",
+            "function": {"name": "execute_code", "arguments": '{"code": "1+1"}'},
+        }
+        recorder = LLMFixtureStore(self.tmp.name)
+        await recorder.record(
+            "recorded", make_kwargs("CoderAgent", "eda"), make_response("", [tool_call])
+        )
+        await recorder.record("recorded", make_kwargs("CoderAgent", "eda"), make_response("done"))
+        await recorder.record("recorded", make_kwargs("WriterAgent", "eda"), make_response("text"))
+
+        self.store = LLMFixtureStore(
+            self.tmp.name, fixture="recorded", latency=0.5, tokens_per_second=40
+        )
+        for patcher in (
+            patch("app.core.llm.llm.llm_fixtures", self.store),
+            patch("app.core.llm.llm.settings.LLM_BACKEND", "replay"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.llm = LLM(api_key=None, model="deepseek/deepseek-chat", base_url=None, task_id="task")
+
+    async def test_replays_in_order_per_agent_and_stage(self):
+        with patch("app.core.llm.replay.asyncio.sleep", new=AsyncMock()) as sleep:
+            writer = await self.llm._completion(make_kwargs("WriterAgent", "eda"))
+            first = await self.llm._completion(make_kwargs("CoderAgent", "eda"))
+            # 重试沿用同一条录制
+            retry = await self.llm._completion(make_kwargs("CoderAgent", "eda", attempt=1))
+            second = await self.llm._completion(make_kwargs("CoderAgent", "eda"))
+
+        self.assertEqual(writer.choices[0].message.content, "text")
+        self.assertEqual(first.choices[0].message.tool_calls[0].function.name, "execute_code")
+        self.assertEqual(retry.choices[0].message.tool_calls[0].id, "call_1")
+        self.assertEqual(second.choices[0].message.content, "done")
+        self.assertEqual(second.usage.completion_tokens, 20)
+        sleep.assert_awaited_with(0.5 + 20 / 40)
+
+        with self.assertRaises(ReplayExhausted):
+            await self.store.replay("task", make_kwargs("CoderAgent", "eda"))
+
+        # 不同任务各自从头回放
+        self.store.latency = self.store.tokens_per_second = 0
+        other = await self.store.replay("other", make_kwargs("WriterAgent", "eda"))
+        self.assertEqual(other["choices"][0]["message"]["content"], "text")
+
+    async def test_resumed_recording_continues_seq(self):
+        # 进程在写出途中退出，恢复后由新进程接着录制同一任务
+        with open(self.store.path("recorded"), "a", encoding="utf-8") as f:
+            f.write('{"agent": "CoderAgent", "stage": "eda", "se')
+        recorder = LLMFixtureStore(self.tmp.name)
+        await recorder.record("recorded", make_kwargs("CoderAgent", "eda"), make_response("resumed"))
+        await recorder.record("recorded", make_kwargs("CoderAgent", "ques1"), make_response("q1"))
+
+        entries = self.store.load("recorded")
+        coder = entries[("CoderAgent", "eda")]
+        self.assertEqual([e["seq"] for e in coder], [0, 1, 2])
+        self.assertEqual(coder[2]["response"]["choices"][0]["message"]["content"], "resumed")
+        self.assertEqual([e["seq"] for e in entries[("CoderAgent", "ques1")]], [0])
+
+    def test_lock_follows_event_loop_and_release_drops_task_fixture(self):
+        # celery worker 中每个任务在新的事件循环中运行
+        store = LLMFixtureStore(self.tmp.name)
+
+        async def record_twice(task_id: str):
+            await asyncio.gather(
+                store.record(task_id, make_kwargs("CoderAgent", "eda"), make_response("a")),
+                store.record(task_id, make_kwargs("CoderAgent", "eda"), make_response("b")),
+            )
+
+        asyncio.run(record_twice("first"))
+        asyncio.run(record_twice("second"))
+
+        store.load("second")
+        store.release("second")
+        self.assertNotIn("second", store._fixtures)
+        self.assertEqual(len(store.load("second")[("CoderAgent", "eda")]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
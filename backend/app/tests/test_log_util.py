@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.utils.log_util import clip, log_payload, logger
+from app.utils.task_context import bind_task_id
+
+
+class TestLogPayload(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+        sink_id = logger.add(lambda m: self.records.append(m.record), level="DEBUG")
+        self.addCleanup(logger.remove, sink_id)
+
+    def test_clip(self):
+        self.assertEqual(clip("abc", 10), "abc")
+        self.assertEqual(clip("x" * 30, 10), "x" * 10 + "...(+20 chars)")
+        self.assertEqual(clip(lambda: "abcdef", 3), "abc...(+3 chars)")
+
+    def test_payload_is_clipped_and_tagged(self):
+        with bind_task_id("task"), patch("app.utils.log_util.settings.LOG_PAYLOAD_LIMIT", 5):
+            log_payload("code", "执行代码:", "print('hello world')")
+        record = self.records[-1]
+        self.assertEqual(record["message"], "执行代码: print...(+15 chars)")
+        self.assertEqual(record["extra"]["category"], "code")
+        self.assertEqual(record["extra"]["task_id"], "task")
+        self.assertEqual(record["function"], "test_payload_is_clipped_and_tagged")
+
+    def test_payload_not_formatted_when_disabled(self):
+        payload = MagicMock(return_value="x")
+        # 没有 sink 接收 TRACE 级别
+        log_payload("llm.response", "API返回:", payload, level="TRACE")
+        with patch("app.utils.log_util.settings.LOG_SAMPLE_RATES", {"llm.response": 0}):
+            log_payload("llm.response", "API返回:", payload)
+        payload.assert_not_called()
+        self.assertEqual(self.records, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
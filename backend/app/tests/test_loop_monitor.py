@@ -0,0 +1,36 @@
+import asyncio
+import tempfile
+import time
+import unittest
+
+from app.services.loop_monitor import LoopMonitor
+
+
+def blocking_call(seconds: float):
+    time.sleep(seconds)
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+    async def test_captures_stack_of_blocking_call(self):
+        with tempfile.TemporaryDirectory() as stall_dir:
+            monitor = LoopMonitor(
+                interval=0.02, threshold=0.1, profile=True, stall_dir=stall_dir
+            )
+            monitor.start()
+            await asyncio.sleep(0.1)
+            self.assertEqual(len(monitor.stalls), 0)
+
+            blocking_call(0.4)
+            await asyncio.sleep(0.1)
+            await monitor.stop()
+
+            self.assertEqual(len(monitor.stalls), 1)
+            stall = monitor.stalls[0]
+            self.assertGreaterEqual(stall["duration"], 0.3)
+            self.assertIn("blocking_call", stall["stack"])
+            with open(stall["profile"], encoding="utf-8") as f:
+                self.assertIn("blocking_call", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from app.services.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render_exposition_format(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram(
+            "llm_request_seconds", "LLM 调用耗时", ("agent",), buckets=(0.1, 1.0)
+        )
+        retries = registry.counter("llm_retries_total", "重试次数", ("agent",))
+        latency.observe(0.05, agent="CoderAgent")
+        latency.observe(0.5, agent="CoderAgent")
+        latency.observe(3, agent="CoderAgent")
+        retries.inc(agent='Writer"Agent')
+
+        text = registry.render()
+        self.assertIn("# TYPE mathmodel_llm_request_seconds histogram", text)
+        self.assertIn('mathmodel_llm_request_seconds_bucket{agent="CoderAgent",le="0.1"} 1', text)
+        self.assertIn('mathmodel_llm_request_seconds_bucket{agent="CoderAgent",le="1"} 2', text)
+        self.assertIn('mathmodel_llm_request_seconds_bucket{agent="CoderAgent",le="+Inf"} 3', text)
+        self.assertIn('mathmodel_llm_request_seconds_sum{agent="CoderAgent"} 3.55', text)
+        self.assertIn('mathmodel_llm_request_seconds_count{agent="CoderAgent"} 3', text)
+        self.assertIn('mathmodel_llm_retries_total{agent="Writer\\"Agent"} 1', text)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        latency = registry.histogram("kernel_execution_seconds", "耗时")
+        with latency.time():
+            pass
+        self.assertNotIn("kernel_execution_seconds_count", registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
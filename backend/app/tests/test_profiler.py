@@ -0,0 +1,48 @@
+import asyncio
+import sys
+import time
+import unittest
+
+from app.services.profiler import ProfilerError, SamplingProfiler
+from app.utils.task_context import bind_task_id
+
+
+def busy_work(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+async def task_body(task_id: str):
+    with bind_task_id(task_id):
+        for _ in range(20):
+            busy_work(0.01)
+            await asyncio.sleep(0)
+
+
+class TestSamplingProfiler(unittest.IsolatedAsyncioTestCase):
+    async def test_collapsed_stacks(self):
+        profiler = SamplingProfiler()
+        runner = asyncio.create_task(task_body("task-a"))
+        folded = await profiler.profile(0.3, interval=0.005)
+        await runner
+
+        lines = folded.splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn("busy_work", folded)
+        if sys.version_info >= (3, 12):
+            self.assertIn("task:task-a;", folded)
+
+    async def test_single_session(self):
+        profiler = SamplingProfiler()
+        first = asyncio.create_task(profiler.profile(0.2))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(ProfilerError):
+            await profiler.profile(0.1)
+        await first
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+
+from app.services.sandbox_pool import SandboxPool
+
+
+class FakeSandbox:
+    def __init__(self):
+        self.killed = False
+
+    async def kill(self):
+        self.killed = True
+
+
+class TestSandboxPool(unittest.IsolatedAsyncioTestCase):
+    async def test_sandbox_finished_after_close_is_killed(self):
+        pool = SandboxPool(size=1, ttl=60)
+        created: list[FakeSandbox] = []
+        release = asyncio.Event()
+
+        async def create_warm():
+            await release.wait()
+            sbx = FakeSandbox()
+            created.append(sbx)
+            return sbx
+
+        pool._create_warm = create_warm
+        refill = asyncio.create_task(pool._refill())
+        await asyncio.sleep(0)
+        # 预热尚未完成时关闭沙箱池
+        await pool.close()
+        release.set()
+        await refill
+
+        self.assertEqual(len(created), 1)
+        self.assertTrue(created[0].killed)
+        self.assertEqual(len(pool._idle), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from app.schemas.enums import TaskPriority
+from app.services import task_queue
+from app.services.task_scheduler import TaskScheduler
+
+
+class TestTaskScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher = patch(
+            "app.services.task_scheduler.redis_manager.publish_message",
+            new=AsyncMock(),
+        )
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.started: list[str] = []
+        self.gates: dict[str, asyncio.Event] = {}
+
+    def job(self, name: str):
+        async def run():
+            self.started.append(name)
+            self.gates[name] = asyncio.Event()
+            await self.gates[name].wait()
+
+        return run
+
+    async def test_limits_concurrency_and_shares_fairly(self):
+        scheduler = TaskScheduler(max_concurrent=1)
+        tasks = [
+            asyncio.create_task(scheduler.run(name, user, TaskPriority.NORMAL, self.job(name)))
+            for name, user in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")]
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(self.started, ["a1"])
+        self.assertEqual(scheduler.status()["waiting"], 3)
+        # 只在排队的用户不计入执行中的任务
+        self.assertEqual(scheduler._running, {"a": 1})
+
+        # 用户 a 突发提交的任务与 b 轮流执行，b1 不必等 a 的全部任务
+        for name in ("a1", "b1", "a2", "a3"):
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.started[-1], name)
+            self.gates[name].set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.started, ["a1", "b1", "a2", "a3"])
+        self.assertEqual(scheduler.status()["running"], 0)
+        self.assertEqual(scheduler._last_admitted, {})
+        # 排队的任务收到位置推送
+        self.assertTrue(self.publish.await_count > 0)
+
+    async def test_priority_and_per_user_limit(self):
+        scheduler = TaskScheduler(max_concurrent=2, max_per_user=1)
+        tasks = [
+            asyncio.create_task(scheduler.run(name, user, priority, self.job(name)))
+            for name, user, priority in [
+                ("a1", "a", TaskPriority.NORMAL),
+                ("a2", "a", TaskPriority.HIGH),
+                ("b1", "b", TaskPriority.LOW),
+                ("c1", "c", TaskPriority.HIGH),
+            ]
+        ]
+        await asyncio.sleep(0)
+        # 每个用户最多一个，a2 需等待 a1
+        self.assertEqual(self.started, ["a1", "b1"])
+
+        self.gates["b1"].set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.started, ["a1", "b1", "c1"])
+
+        for name in ("a1", "c1"):
+            self.gates[name].set()
+        await asyncio.sleep(0.01)
+        self.gates["a2"].set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.started, ["a1", "b1", "c1", "a2"])
+
+    async def test_is_active_while_waiting_or_running(self):
+        scheduler = TaskScheduler(max_concurrent=1)
+        first = asyncio.create_task(scheduler.run("t1", "a", TaskPriority.NORMAL, self.job("t1")))
+        second = asyncio.create_task(scheduler.run("t2", "a", TaskPriority.NORMAL, self.job("t2")))
+        await asyncio.sleep(0)
+        self.assertTrue(scheduler.is_active("t1"))
+        self.assertTrue(scheduler.is_active("t2"))
+
+        second.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(scheduler.is_active("t2"))
+        self.gates["t1"].set()
+        await first
+        self.assertFalse(scheduler.is_active("t1"))
+
+    async def test_claim_task_rejects_active_task(self):
+        scheduler = TaskScheduler(max_concurrent=1)
+        mark = AsyncMock(side_effect=[True, False])
+        with patch.object(task_queue, "task_scheduler", scheduler), patch.object(
+            task_queue.redis_manager, "mark_task_active", new=mark
+        ):
+            running = asyncio.create_task(
+                scheduler.run("t1", "a", TaskPriority.NORMAL, self.job("t1"))
+            )
+            await asyncio.sleep(0)
+            # 本进程调度器中的任务不查询 Redis
+            self.assertFalse(await task_queue.claim_task("t1"))
+            mark.assert_not_awaited()
+            # 其他进程或 worker 的标记仍有效
+            self.assertTrue(await task_queue.claim_task("t2"))
+            self.assertFalse(await task_queue.claim_task("t2"))
+            self.gates["t1"].set()
+            await running
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.services.tracing import SpanExporter, Tracer, build_timeline, load_spans
+
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        patcher = patch(
+            "app.services.tracing.trace_path",
+            side_effect=lambda task_id: os.path.join(self.root, task_id, "trace.jsonl"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for task_id in ("a", "b"):
+            os.makedirs(os.path.join(self.root, task_id))
+        self.tracer = Tracer(SpanExporter())
+
+    async def run_task(self, task_id: str):
+        with self.tracer.trace(task_id):
+            with self.tracer.span("coder:eda", "stage"):
+                # 子任务继承当前 span
+                await asyncio.gather(self.llm_call(), self.llm_call())
+                await asyncio.sleep(0.01)
+
+    async def llm_call(self):
+        with self.tracer.span("llm", "llm"):
+            await asyncio.sleep(0.01)
+
+    async def test_concurrent_tasks_do_not_mix(self):
+        # 不在任务内时不记录
+        with self.tracer.span("publish", "redis") as span:
+            self.assertIsNone(span)
+
+        await asyncio.gather(self.run_task("a"), self.run_task("b"))
+        self.tracer.exporter.flush()
+
+        for task_id in ("a", "b"):
+            spans = load_spans(task_id)
+            self.assertEqual(len(spans), 4)
+            self.assertEqual({s["trace_id"] for s in spans}, {task_id})
+            timeline = build_timeline(spans)
+            by_name = {}
+            for item in timeline["spans"]:
+                by_name.setdefault(item["name"], []).append(item)
+            stage = by_name["coder:eda"][0]
+            self.assertEqual(stage["depth"], 1)
+            self.assertEqual(
+                {item["parent_id"] for item in by_name["llm"]}, {stage["id"]}
+            )
+            self.assertEqual(timeline["spans"][0]["kind"], "task")
+            self.assertEqual(timeline["by_kind"]["llm"]["count"], 2)
+
+    async def test_truncated_lines_are_skipped(self):
+        await self.run_task("a")
+        self.tracer.exporter.flush()
+        path = os.path.join(self.root, "a", "trace.jsonl")
+        with open(path, "r", encoding="utf-8") as f:
+            complete = f.read()
+        # 进程在写出途中退出留下半行，恢复后的执行继续追加到同一文件
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(complete.splitlines()[0][:40])
+            f.write("\n" + complete)
+
+        spans = load_spans("a")
+        self.assertEqual(len(spans), 8)
+        self.assertEqual(len(build_timeline(spans)["spans"]), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.utils.upload_utils import UploadLimitMiddleware, UploadQuotaExceeded
+
+
+def create_app(max_bytes: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        UploadLimitMiddleware, paths={"/upload"}, max_bytes=max_bytes, detail="too large"
+    )
+
+    @app.post("/upload")
+    async def upload(files: list[UploadFile] = File(...)):
+        return {"files": [file.filename for file in files]}
+
+    return app
+
+
+class TestUploadLimitMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(create_app(max_bytes=1024))
+
+    def test_small_upload_passes(self):
+        response = self.client.post("/upload", files=[("files", ("a.csv", b"a,b\n1,2\n"))])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"files": ["a.csv"]})
+
+    def test_rejects_by_content_length(self):
+        response = self.client.post("/upload", files=[("files", ("a.csv", b"x" * 4096))])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()["detail"], "too large")
+
+    def test_rejects_chunked_body_without_content_length(self):
+        boundary = "limit-test"
+        head = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="files"; filename="a.csv"\r\n'
+            "Content-Type: text/csv\r\n\r\n"
+        ).encode()
+
+        def body():
+            # 分块传输，没有 Content-Length
+            yield head
+            for _ in range(100):
+                yield b"x" * 512
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        response = self.client.post(
+            "/upload",
+            content=body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        self.assertEqual(response.status_code, 413)
+
+
+class TestUploadQuotaExceeded(unittest.TestCase):
+    def test_message_names_the_limit(self):
+        self.assertIn("单文件大小限制", str(UploadQuotaExceeded("a.csv", 500 * 1024 * 1024)))
+        self.assertIn(
+            "单任务限制", str(UploadQuotaExceeded("a.csv", 10 * 1024 * 1024, task_quota=True))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.utils.data_recorder import DataRecorder, get_task_usage
+from app.utils.track import AgentMetrics
+
+
+class FakePipeline:
+    def __init__(self, store: dict):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def hincrby(self, key, field, value):
+        self.store[field] = str(int(self.store.get(field, 0)) + value)
+
+    def hincrbyfloat(self, key, field, value):
+        self.store[field] = str(float(self.store.get(field, 0)) + value)
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        pass
+
+
+class TestUsageLedger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.store: dict[str, str] = {}
+        client = MagicMock()
+        client.pipeline = lambda transaction=False: FakePipeline(self.store)
+        client.hgetall = AsyncMock(side_effect=lambda key: dict(self.store))
+        patcher = patch(
+            "app.utils.data_recorder.redis_manager.get_client",
+            new=AsyncMock(return_value=client),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_callbacks_aggregate_per_agent_and_stage(self):
+        metrics = AgentMetrics()
+        recorder = metrics.recorder("task")
+        start = datetime.datetime(2025, 1, 1)
+        response = SimpleNamespace(
+            usage=SimpleNamespace(
+                prompt_tokens=100,
+                completion_tokens=20,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=64),
+            )
+        )
+        kwargs = {
+            "model": "deepseek-chat",
+            "response_cost": 0.5,
+            "litellm_params": {
+                "metadata": {
+                    "task_id": "task",
+                    "agent_name": "CoderAgent",
+                    "stage": "eda",
+                    "attempt": 1,
+                }
+            },
+        }
+        await metrics.async_log_failure_event(
+            kwargs, None, start, start + datetime.timedelta(seconds=1)
+        )
+        await metrics.async_log_success_event(
+            kwargs, response, start, start + datetime.timedelta(seconds=2)
+        )
+
+        eda = recorder.usage_ledger["CoderAgent"]["eda"]
+        self.assertEqual(eda["calls"], 1)
+        self.assertEqual(eda["failures"], 1)
+        self.assertEqual(eda["retries"], 1)
+
+        usage = await get_task_usage("task")
+        stage = usage["agents"]["CoderAgent"]["stages"]["eda"]
+        self.assertEqual(stage["prompt_tokens"], 100)
+        self.assertEqual(stage["total_tokens"], 120)
+        self.assertEqual(stage["cache_hits"], 1)
+        self.assertAlmostEqual(stage["latency"], 3.0)
+        self.assertAlmostEqual(usage["total"]["cost"], 0.5)
+        self.assertEqual(usage["currency"]["cost"], "USD")
+
+    async def test_unpriced_calls_are_estimated_separately(self):
+        recorder = DataRecorder("task")
+        await recorder.record_usage("CoderAgent", "eda", "gpt-4", 1000, 1000, cost=0.25)
+        await recorder.record_usage("CoderAgent", "eda", "gpt-4", 1000, 1000)
+
+        total = (await get_task_usage("task"))["total"]
+        self.assertAlmostEqual(total["cost"], 0.25)
+        self.assertAlmostEqual(total["estimated_cost"], 0.09)
+        self.assertEqual(total["calls"], 2)
+
+    async def test_concurrent_writes_keep_ledger_file_complete(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            recorder = DataRecorder("task", work_dir)
+            await asyncio.gather(
+                *[
+                    recorder.record_usage(f"Agent{i % 3}", "eda", "m", 10, 5, cost=0.01)
+                    for i in range(30)
+                ]
+            )
+            with open(os.path.join(work_dir, "usage_ledger.json"), encoding="utf-8") as f:
+                ledger = json.load(f)
+        self.assertEqual(sum(a["eda"]["calls"] for a in ledger.values()), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from app.models.user_output import UserOutput
+from app.schemas.A2A import WriterResponse
+
+
+class TestUserOutput(unittest.TestCase):
+    def test_footnotes_numbered_in_section_order(self):
+        user_output = UserOutput(tempfile.gettempdir(), ques_count=1)
+        for key in user_output.seq:
+            user_output.set_res(key, WriterResponse(response_content=f"{key}。"))
+        user_output.set_res(
+            "eda",
+            WriterResponse(response_content="数据{[^1]: 文献B.}，方法{[^2]: 文献A}"),
+        )
+        user_output.set_res(
+            "RepeatQues",
+            WriterResponse(response_content="背景{[^1]: 文献A}与{[^1]: 文献A.}"),
+        )
+
+        res = user_output.get_result_to_save()
+        # RepeatQues 在 eda 之前，文献A 先编号，重复引用使用相同编号
+        self.assertIn("背景[^1]与[^1]", res)
+        self.assertIn("数据[^2]，方法[^1]", res)
+        self.assertTrue(res.endswith("## 参考文献\n\n[^1]: 文献A\n\n[^2]: 文献B"))
+
+
+    def test_partial_result_saved_incrementally(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            user_output = UserOutput(work_dir, ques_count=1)
+            user_output.set_res(
+                "eda", WriterResponse(response_content="数据{[^1]: 文献A}")
+            )
+            user_output.save_result()
+            with open(os.path.join(work_dir, "res.md"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "数据[^1]\n\n ## 参考文献\n\n[^1]: 文献A")
+
+            # 新增的章节在 eda 之前，已缓存的章节重新编号
+            user_output.set_res(
+                "RepeatQues", WriterResponse(response_content="背景{[^1]: 文献B}")
+            )
+            user_output.save_result()
+            with open(os.path.join(work_dir, "res.md"), encoding="utf-8") as f:
+                self.assertTrue(f.read().startswith("背景[^1]\n\n数据[^2]"))
+            self.assertTrue(os.path.exists(os.path.join(work_dir, "res.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app.routers import ws_router
+from app.services.metrics import MetricsRegistry
+
+
+class FakePubSub:
+    """按顺序返回已到达的消息，取完后返回 None（与 redis PubSub.get_message 一致）"""
+
+    def __init__(self, messages: list[dict]):
+        self.messages = list(messages)
+        self.calls = 0
+
+    async def get_message(self, ignore_subscribe_messages: bool = False):
+        self.calls += 1
+        return self.messages.pop(0) if self.messages else None
+
+
+class TestReadPending(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.depth = self.registry.histogram(
+            "websocket_queue_depth", "积压", buckets=(1, 2, 5, 10, 20, 50, 100)
+        )
+        patcher = patch.object(ws_router, "WS_QUEUE_DEPTH", self.depth)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backlog_is_drained_in_one_poll(self):
+        # 原先每 100ms 只取一条，30 条积压消息要 3 秒才能发完
+        messages = [{"type": "message", "data": f'{{"seq": {i}}}'} for i in range(30)]
+        pubsub = FakePubSub(messages)
+
+        pending = asyncio.run(ws_router.read_pending(pubsub))
+
+        self.assertEqual(pending, messages)
+        text = self.registry.render()
+        self.assertIn("mathmodel_websocket_queue_depth_count 1", text)
+        self.assertIn("mathmodel_websocket_queue_depth_sum 30", text)
+        self.assertIn('mathmodel_websocket_queue_depth_bucket{le="20"} 0', text)
+        self.assertIn('mathmodel_websocket_queue_depth_bucket{le="50"} 1', text)
+
+    def test_empty_poll_is_not_observed(self):
+        self.assertEqual(asyncio.run(ws_router.read_pending(FakePubSub([]))), [])
+        self.assertNotIn("websocket_queue_depth_count", self.registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,14 @@
 # base_interpreter.py
 import abc
+import functools
 import re
 from typing import Awaitable, List  # 关键：添加这行导入
 from typing import Optional, Tuple, Union  # 若已有其他typing导入，合并进去即可
 from app.tools.notebook_serializer import NotebookSerializer
+from app.services.metrics import KERNEL_EXECUTION
+from app.services.tracing import tracer
 from app.services.redis_manager import redis_manager
-from app.utils.log_util import logger
+from app.utils.log_util import log_payload, logger
 from app.schemas.response import (
     OutputItem,
     InterpreterMessage,
@@ -24,6 +27,28 @@ class BaseCodeInterpreter(abc.ABC):
         self.notebook_serializer = notebook_serializer
         self.section_output: dict[str, dict[str, list[str]]] = {}
         self.last_created_images = set()
+        # 执行成功的代码单元，恢复任务时按顺序重放以重建内核状态
+        self.executed_cells: list[str] = []
+        # 各 section 开始时已记录的代码单元数，重新运行 section 时据此截断
+        self.section_cells: dict[str, int] = {}
+        # 最近一次内核快照 {"name": 快照名称, "cells": 快照时已执行的代码单元数}
+        self.snapshot_info: dict | None = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 子类实现的 execute_code 统一记录执行耗时与 span
+        execute_code = cls.__dict__.get("execute_code")
+        if execute_code is None or getattr(execute_code, "__isabstractmethod__", False):
+            return
+
+        @functools.wraps(execute_code)
+        async def timed_execute_code(self, code: str) -> tuple[str, bool, str]:
+            with KERNEL_EXECUTION.time(interpreter=cls.__name__), tracer.span(
+                "execute_code", "kernel", interpreter=cls.__name__
+            ):
+                return await execute_code(self, code)
+
+        cls.execute_code = timed_execute_code
 
     @abc.abstractmethod
     async def initialize(self):
@@ -40,6 +65,11 @@ class BaseCodeInterpreter(abc.ABC):
         """执行一段代码，返回 (输出文本, 是否出错, 错误信息)"""
         ...
 
+    @abc.abstractmethod
+    async def _execute_silently(self, code: str) -> str | None:
+        """执行代码但不写入 notebook、不推送消息，返回错误信息"""
+        ...
+
     @abc.abstractmethod
     async def cleanup(self):
         """清理资源，比如关闭沙箱或内核"""
@@ -56,7 +86,7 @@ class BaseCodeInterpreter(abc.ABC):
         agent_msg = InterpreterMessage(
             output=content_to_display,
         )
-        logger.debug(f"发送消息: {agent_msg.model_dump_json()}")
+        log_payload("publish", "发送消息:", agent_msg.model_dump_json)
         await redis_manager.publish_message(
             self.task_id,
             agent_msg,
@@ -67,6 +97,73 @@ class BaseCodeInterpreter(abc.ABC):
         """列出工作目录中的文件"""
         ...
 
+    def get_state(self) -> dict:
+        """解释器状态，用于断点保存"""
+        return {
+            "section_output": self.section_output,
+            "last_created_images": sorted(self.last_created_images),
+            "executed_cells": self.executed_cells,
+            "section_cells": self.section_cells,
+            "snapshot": self.snapshot_info,
+        }
+
+    def restore_state(self, state: dict) -> None:
+        """从断点恢复 section 输出与图片记录，内核状态需另外调用 replay_cells"""
+        self.section_output = state.get("section_output", {})
+        self.last_created_images = set(state.get("last_created_images", []))
+        self.executed_cells = list(state.get("executed_cells", []))
+        self.section_cells = dict(state.get("section_cells", {}))
+        self.snapshot_info = state.get("snapshot")
+
+    def begin_section(self, section: str) -> None:
+        """记录 section 开始执行代码时的位置"""
+        self.section_cells[section] = len(self.executed_cells)
+
+    def rewind_to_section(self, section: str) -> None:
+        """丢弃 section 及其之后记录的代码单元，重新运行该 section 前调用
+
+        重放只重建该 section 之前的内核状态，新执行的代码单元接在其后，
+        之后的恢复不会把新旧两版代码都执行一遍。
+        """
+        start = self.section_cells.get(section)
+        if start is None:
+            logger.warning(f"断点中没有 {section} 的代码位置，保留全部代码单元")
+            return
+        self.executed_cells = self.executed_cells[:start]
+        self.section_cells = {k: v for k, v in self.section_cells.items() if v < start}
+        # 快照包含被丢弃的代码产生的变量
+        if self.snapshot_info and self.snapshot_info["cells"] > start:
+            self.snapshot_info = None
+
+    async def snapshot(self, name: str) -> dict | None:
+        """保存内核命名空间快照，不支持快照的解释器返回 None"""
+        return None
+
+    async def restore_snapshot(self, name: str) -> list[str] | None:
+        """从快照恢复内核命名空间，返回未能恢复的变量名；不支持、快照不存在或恢复失败时返回 None"""
+        return None
+
+    def _record_cell(self, code: str) -> None:
+        """按执行顺序记录成功的代码单元，相同代码再次执行时也要记录（如修改数据后重新加载）"""
+        self.executed_cells.append(code)
+
+    async def replay_cells(self) -> None:
+        """重建内核中的变量：有快照时先恢复快照，再按顺序重新执行其后成功的代码单元"""
+        start = 0
+        if self.snapshot_info:
+            missing = await self.restore_snapshot(self.snapshot_info["name"])
+            if missing == []:
+                start = self.snapshot_info["cells"]
+            elif missing:
+                # 快照不完整，缺少的变量只能通过重新执行代码得到
+                logger.warning(f"快照缺少变量 {missing}，重放全部代码单元")
+        cells = self.executed_cells[start:]
+        logger.info(f"重放代码单元: {len(cells)} 个")
+        for code in cells:
+            error = await self._execute_silently(code)
+            if error:
+                logger.warning(f"重放代码单元失败: {self._truncate_text(error, 300)}")
+
     def add_section(self, section_name: str) -> None:
         """确保添加的section结构正确"""
 
@@ -1,5 +1,4 @@
 import os
-from e2b_code_interpreter import AsyncSandbox
 from app.schemas.response import (
     ErrorModel,
     OutputItem,
@@ -9,7 +8,9 @@ from app.schemas.response import (
     SystemMessage,
 )
 from app.services.redis_manager import redis_manager
+from app.services.sandbox_pool import sandbox_pool, E2B_INIT_CODE
 from app.tools.notebook_serializer import NotebookSerializer
+from app.tools.file_sync import SandboxFileSync
 from app.utils.log_util import logger
 from app.config.setting import settings
 import json
@@ -25,6 +26,7 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
     ):
         super().__init__(task_id, work_dir, notebook_serializer)
         self.sbx = None
+        self.file_sync: SandboxFileSync | None = None
 
     @classmethod
     async def create(
@@ -40,10 +42,13 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
     async def initialize(self, timeout: int = 3000):
         """异步初始化沙箱环境"""
         try:
-            self.sbx = await AsyncSandbox.create(
-                api_key=settings.E2B_API_KEY, timeout=timeout
-            )
+            self.sbx = await sandbox_pool.acquire(timeout=timeout)
             logger.info("沙箱环境初始化成功")
+            self.file_sync = SandboxFileSync(
+                self.sbx,
+                self.work_dir,
+                max_concurrency=settings.E2B_SYNC_MAX_CONCURRENCY,
+            )
             await self._pre_execute_code()
             await self._upload_all_files()
         except Exception as e:
@@ -51,7 +56,7 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
             raise
 
     async def _upload_all_files(self):
-        """上传工作目录中的所有文件到沙箱"""
+        """上传工作目录中的数据文件到沙箱，内容未变化的文件跳过"""
         try:
             logger.info(f"开始上传文件，工作目录: {self.work_dir}")
             if not os.path.exists(self.work_dir):
@@ -59,37 +64,28 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
                 raise FileNotFoundError(f"工作目录不存在: {self.work_dir}")
 
             files = [
-                f for f in os.listdir(self.work_dir) if f.endswith((".csv", ".xlsx"))
+                f
+                for f in os.listdir(self.work_dir)
+                if f.endswith((".csv", ".xlsx", ".parquet"))
+                and os.path.isfile(os.path.join(self.work_dir, f))
             ]
             logger.info(f"工作目录中的文件列表: {files}")
 
-            for file in files:
-                file_path = os.path.join(self.work_dir, file)
-                if os.path.isfile(file_path):
-                    try:
-                        with open(file_path, "rb") as f:
-                            content = f.read()
-                            # 使用官方推荐的 files.write 方法
-                            await self.sbx.files.write(f"/home/user/{file}", content)
-                            logger.info(f"成功上传文件到沙箱: {file}")
-                    except Exception as e:
-                        logger.error(f"上传文件 {file} 失败: {str(e)}")
-                        raise
+            # 先上传原始文件再上传 Parquet 副本，保证副本的 mtime 不早于原始文件
+            originals = [f for f in files if not f.endswith(".parquet")]
+            copies = [f for f in files if f.endswith(".parquet")]
+            uploaded = await self.file_sync.upload(originals)
+            uploaded += await self.file_sync.upload(copies)
+            logger.info(f"上传文件数: {len(uploaded)}/{len(files)}")
 
         except Exception as e:
             logger.error(f"文件上传过程失败: {str(e)}")
             raise
 
     async def _pre_execute_code(self):
-        init_code = (
-            "import matplotlib.pyplot as plt\n"
-            "import matplotlib as mpl\n"
-            "plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei', 'PingFang SC']\n"
-            "plt.rcParams['axes.unicode_minus'] = False\n"
-            "plt.rcParams['font.family'] = 'sans-serif'\n"
-            "mpl.rcParams['font.size'] = 12\n"
-        )
-        await self.execute_code(init_code)
+        """沙箱池交付的沙箱已执行过初始化代码，这里只记录到 notebook（恢复任务时已有记录）"""
+        if not self.notebook_serializer.has_code_cell(E2B_INIT_CODE):
+            self.notebook_serializer.add_code_cell_to_notebook(E2B_INIT_CODE)
 
     async def execute_code(self, code: str) -> tuple[str, bool, str]:
         """执行代码并返回结果"""
@@ -312,6 +308,8 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
         # 保存到分段内容
         ## TODO: Base64 等图像需要优化
         await self._push_to_websocket(content_to_display)
+        if not error_occurred:
+            self._record_cell(code)
 
         return (
             combined_text,
@@ -319,6 +317,12 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
             error_message,
         )
 
+    async def _execute_silently(self, code: str) -> str | None:
+        execution = await self.sbx.run_code(code)
+        if execution.error:
+            return f"{execution.error.name}: {execution.error.value}"
+        return None
+
     async def get_created_images(self, section: str) -> list[str]:
         """获取当前 section 创建的图片列表"""
         if not self.sbx:
@@ -360,53 +364,14 @@ class E2BCodeInterpreter(BaseCodeInterpreter):
             # 这里可以选择不抛出异常，因为这是清理步骤
 
     async def download_all_files_from_sandbox(self) -> None:
-        """从沙箱中下载所有文件并与本地同步"""
+        """从沙箱中增量下载新增或内容变化的文件"""
         try:
-            # 获取沙箱中的文件列表
-            sandbox_files = await self.sbx.files.list("/home/user")
-            sandbox_files_dict = {f.name: f for f in sandbox_files}
-
-            # 获取本地文件列表
-            local_files = set()
-            if os.path.exists(self.work_dir):
-                local_files = set(os.listdir(self.work_dir))
-
-            # 下载新文件或更新已修改的文件
-            for file in sandbox_files:
-                try:
-                    # 排除 .bash_logout、.bashrc 和 .profile 文件
-                    if file.name in [".bash_logout", ".bashrc", ".profile"]:
-                        continue
-
-                    local_path = os.path.join(self.work_dir, file.name)
-                    should_download = True
-
-                    # 检查文件是否需要更新
-                    if file.name in local_files:
-                        # 这里可以添加文件修改时间或内容哈希的比较
-                        # 暂时简单处理，有同名文件就更新
-                        pass
-
-                    if should_download:
-                        # 使用 bytes 格式读取文件内容，确保正确处理二进制数据
-                        content = await self.sbx.files.read(file.path, format="bytes")
-
-                        # 确保目标目录存在
-                        os.makedirs(self.work_dir, exist_ok=True)
-
-                        # 写入文件
-                        with open(local_path, "wb") as f:
-                            f.write(content)
-                        logger.info(f"同步文件: {file.name}")
-
-                except Exception as e:
-                    logger.error(f"同步文件 {file.name} 失败: {str(e)}")
-                    continue
-
-            logger.info("文件同步完成")
+            downloaded = await self.file_sync.download()
+            logger.info(f"文件同步完成，下载文件数: {len(downloaded)}")
 
         except Exception as e:
             logger.error(f"文件同步失败: {str(e)}")
+
     async def list_files(self) -> list[str]:
         """列出沙箱中的文件"""
         if not self.sbx:
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+from aiofile import async_open
+from app.utils.log_util import logger
+
+# 流式传输的分块大小
+CHUNK_SIZE = 1024 * 1024
+# 本地保存同步清单的文件名
+MANIFEST_NAME = ".sync_manifest.json"
+# 沙箱中不需要同步的文件
+IGNORED_FILES = {".bash_logout", ".bashrc", ".profile", MANIFEST_NAME}
+
+
+def file_sha256(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """分块计算文件的 sha256，避免一次性读入内存"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class SandboxFileSync:
+    """本地工作目录与 E2B 沙箱之间基于内容哈希的增量同步
+
+    两侧各维护一份清单 {文件名: {size, mtime, sha256}}，保存在工作目录下，
+    沙箱侧清单记录所属的沙箱 id，绑定到新沙箱（恢复、重新生成等）时清空:
+    - 上传时本地文件哈希与沙箱清单一致则跳过
+    - 下载时先比较沙箱侧的 size/mtime，有变化再在沙箱内计算哈希，
+      与本地一致的只更新清单，不重新下载
+    """
+
+    def __init__(
+        self,
+        sbx,
+        work_dir: str,
+        remote_dir: str = "/home/user",
+        max_concurrency: int = 4,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.sbx = sbx
+        self.work_dir = work_dir
+        self.remote_dir = remote_dir.rstrip("/")
+        self.chunk_size = chunk_size
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.sandbox_id = getattr(sbx, "sandbox_id", None)
+        self.manifest_path = os.path.join(work_dir, MANIFEST_NAME)
+        self.manifest: dict = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        manifest = {"sandbox_id": self.sandbox_id, "local": {}, "remote": {}}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                manifest["local"] = saved.get("local", {})
+                # 沙箱侧清单只对记录它的沙箱有效，新沙箱中没有这些文件
+                if saved.get("sandbox_id") == self.sandbox_id:
+                    manifest["remote"] = saved.get("remote", {})
+                else:
+                    logger.info("绑定到新的沙箱，重置沙箱侧同步清单")
+            except Exception as e:
+                logger.warning(f"读取同步清单失败，重新建立: {str(e)}")
+        return manifest
+
+    def _save_manifest(self) -> None:
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+    def _remote_path(self, name: str) -> str:
+        return f"{self.remote_dir}/{name}"
+
+    async def _local_entry(self, name: str) -> dict:
+        """获取本地文件清单条目，size/mtime 未变化时复用已记录的哈希"""
+        path = os.path.join(self.work_dir, name)
+        stat = os.stat(path)
+        cached = self.manifest["local"].get(name)
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime"] == stat.st_mtime
+        ):
+            return cached
+        sha256 = await asyncio.to_thread(file_sha256, path, self.chunk_size)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+        self.manifest["local"][name] = entry
+        return entry
+
+    async def _scan_remote(self) -> dict[str, dict]:
+        """一次命令获取沙箱目录下所有文件的 size 和 mtime"""
+        result = await self.sbx.commands.run(
+            f"find {shlex.quote(self.remote_dir)} -maxdepth 1 -type f "
+            f"-printf '%f\\t%s\\t%T@\\n'"
+        )
+        entries = {}
+        for line in result.stdout.splitlines():
+            parts = line.rsplit("\t", 2)
+            if len(parts) != 3 or parts[0] in IGNORED_FILES:
+                continue
+            name, size, mtime = parts
+            entries[name] = {"size": int(size), "mtime": float(mtime)}
+        return entries
+
+    async def _hash_remote(self, names: list[str]) -> dict[str, str]:
+        """在沙箱内批量计算文件哈希，避免为比对而下载"""
+        if not names:
+            return {}
+        quoted = " ".join(shlex.quote(name) for name in names)
+        result = await self.sbx.commands.run(
+            f"cd {shlex.quote(self.remote_dir)} && sha256sum -- {quoted}"
+        )
+        hashes = {}
+        for line in result.stdout.splitlines():
+            sha256, _, name = line.partition("  ")
+            if name:
+                hashes[name] = sha256
+        return hashes
+
+    async def _upload_file(self, name: str) -> None:
+        async with self.semaphore:
+            path = os.path.join(self.work_dir, name)
+            # 传入文件对象，由 SDK 分块读取，避免整文件读入内存
+            with open(path, "rb") as f:
+                await self.sbx.files.write(self._remote_path(name), f)
+            logger.info(f"成功上传文件到沙箱: {name}")
+
+    async def _download_file(self, name: str) -> dict:
+        async with self.semaphore:
+            local_path = os.path.join(self.work_dir, name)
+            tmp_path = f"{local_path}.part"
+            sha = hashlib.sha256()
+            try:
+                stream = await self.sbx.files.read(
+                    self._remote_path(name), format="stream"
+                )
+                async with async_open(tmp_path, "wb") as afp:
+                    async for chunk in stream:
+                        sha.update(chunk)
+                        await afp.write(chunk)
+                os.replace(tmp_path, local_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            logger.info(f"同步文件: {name}")
+            stat = os.stat(local_path)
+            entry = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": sha.hexdigest(),
+            }
+            self.manifest["local"][name] = entry
+            return entry
+
+    async def upload(self, names: list[str]) -> list[str]:
+        """上传本地文件，内容未变化的跳过，返回实际上传的文件名"""
+        to_upload = []
+        for name in names:
+            local = await self._local_entry(name)
+            remote = self.manifest["remote"].get(name)
+            if remote and remote.get("sha256") == local["sha256"]:
+                logger.debug(f"沙箱中文件未变化，跳过上传: {name}")
+                continue
+            to_upload.append(name)
+
+        results = await asyncio.gather(
+            *(self._upload_file(name) for name in to_upload), return_exceptions=True
+        )
+        uploaded = []
+        errors = []
+        for name, result in zip(to_upload, results):
+            if isinstance(result, Exception):
+                logger.error(f"上传文件 {name} 失败: {str(result)}")
+                errors.append(result)
+            else:
+                uploaded.append(name)
+
+        if uploaded:
+            # 记录上传后沙箱侧的 size/mtime，后续下载时可据此跳过
+            remote_stats = await self._scan_remote()
+            for name in uploaded:
+                if name in remote_stats:
+                    self.manifest["remote"][name] = {
+                        **remote_stats[name],
+                        "sha256": self.manifest["local"][name]["sha256"],
+                    }
+        self._save_manifest()
+
+        if errors:
+            raise errors[0]
+        return uploaded
+
+    async def download(self) -> list[str]:
+        """下载沙箱中新增或内容变化的文件，返回实际下载的文件名"""
+        remote_stats = await self._scan_remote()
+
+        changed = [
+            name
+            for name, stat in remote_stats.items()
+            if not (
+                (known := self.manifest["remote"].get(name))
+                and known["size"] == stat["size"]
+                and known["mtime"] == stat["mtime"]
+            )
+        ]
+        if not changed:
+            return []
+
+        remote_hashes = await self._hash_remote(changed)
+        to_download = []
+        for name in changed:
+            sha256 = remote_hashes.get(name)
+            local_path = os.path.join(self.work_dir, name)
+            if sha256 and os.path.exists(local_path):
+                local = await self._local_entry(name)
+                if local["sha256"] == sha256:
+                    # 内容一致，仅更新清单
+                    self.manifest["remote"][name] = {**remote_stats[name], "sha256": sha256}
+                    continue
+            to_download.append(name)
+
+        results = await asyncio.gather(
+            *(self._download_file(name) for name in to_download),
+            return_exceptions=True,
+        )
+        downloaded = []
+        for name, result in zip(to_download, results):
+            if isinstance(result, Exception):
+                logger.error(f"同步文件 {name} 失败: {str(result)}")
+                continue
+            self.manifest["remote"][name] = {
+                **remote_stats[name],
+                "sha256": remote_hashes.get(name) or result["sha256"],
+            }
+            downloaded.append(name)
+
+        self._save_manifest()
+        return downloaded
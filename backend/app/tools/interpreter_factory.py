@@ -1,28 +1,30 @@
 # interpreter_factory.py
 from typing import Literal
-from app.tools.e2b_interpreter import E2BCodeInterpreter
-from app.tools.local_interpreter import LocalCodeInterpreter
 from app.tools.notebook_serializer import NotebookSerializer
 from app.config.setting import settings
 from app.utils.log_util import logger
 
 
 async def create_interpreter(
-    kind: Literal["remote", "local"] = "local",
+    kind: Literal["remote", "local"] | None = None,
     *,
     task_id: str,
     work_dir: str,
     notebook_serializer: NotebookSerializer,
     timeout=3000,
 ):
-    if not settings.E2B_API_KEY:
-        logger.info("默认使用本地解释器")
+    # 未指定时按配置选择：配置了 E2B 使用远程沙箱（沙箱池），否则使用本地内核
+    if kind is None:
+        kind = "remote" if settings.E2B_API_KEY else "local"
+    elif kind == "remote" and not settings.E2B_API_KEY:
+        logger.warning("未配置 E2B_API_KEY，改用本地解释器")
         kind = "local"
-    else:
-        logger.info("使用远程解释器")
-        kind = "remote"
+    logger.info("使用远程解释器" if kind == "remote" else "使用本地解释器")
 
+    # 解释器按需导入，未配置 E2B 时不加载其 SDK
     if kind == "remote":
+        from app.tools.e2b_interpreter import E2BCodeInterpreter
+
         interp: E2BCodeInterpreter = await E2BCodeInterpreter.create(
             task_id=task_id,
             work_dir=work_dir,
@@ -31,6 +33,8 @@ async def create_interpreter(
         await interp.initialize(timeout=timeout)
         return interp
     elif kind == "local":
+        from app.tools.local_interpreter import LocalCodeInterpreter
+
         interp: LocalCodeInterpreter = LocalCodeInterpreter(
             task_id=task_id,
             work_dir=work_dir,
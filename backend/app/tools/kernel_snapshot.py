@@ -0,0 +1,150 @@
+import json
+import os
+
+# 快照保存在工作目录下，按名称区分（如 eda）
+SNAPSHOT_DIR = ".kernel_snapshot"
+MANIFEST_NAME = "manifest.json"
+# 超过该大小的 DataFrame 以 Arrow 类型直接引用内存映射的文件，不复制到内存
+MMAP_THRESHOLD = 64 * 1024 * 1024
+# 恢复代码输出的未能反序列化的变量列表的前缀
+RESTORE_MARKER = "__snapshot_restore_failed__:"
+
+# 在内核中执行：DataFrame 写为未压缩的 Arrow 文件，其余可序列化的变量用 cloudpickle
+# （不可用时为 pickle）保存，模块只记录名称，无法序列化的变量跳过。
+# 先写入新目录再整体替换：恢复过快照的内核仍以内存映射引用旧的 Arrow 文件，原地覆盖
+# 会截断这些文件，内核再访问时收到 SIGBUS；旧文件删除后映射仍然有效
+SNAPSHOT_CODE = '''
+def _snapshot_namespace(snapshot_dir):
+    import json, os, pickle, types
+    try:
+        import cloudpickle as pickler
+    except ImportError:
+        pickler = pickle
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    skip = {"In", "Out", "get_ipython", "exit", "quit", "open"}
+    manifest = {"modules": {}, "frames": [], "objects": [], "skipped": []}
+    objects = {}
+    for name, value in list(globals().items()):
+        if name.startswith("_") or name in skip:
+            continue
+        if isinstance(value, types.ModuleType):
+            manifest["modules"][name] = value.__name__
+            continue
+        if isinstance(value, pd.DataFrame):
+            try:
+                table = pa.Table.from_pandas(value, preserve_index=True)
+                feather.write_feather(
+                    table, os.path.join(snapshot_dir, f"{name}.arrow"), compression="uncompressed"
+                )
+                manifest["frames"].append(name)
+                continue
+            except Exception:
+                pass
+        try:
+            objects[name] = pickler.dumps(value)
+            manifest["objects"].append(name)
+        except Exception:
+            manifest["skipped"].append(name)
+    with open(os.path.join(snapshot_dir, "objects.pkl"), "wb") as f:
+        pickle.dump(objects, f)
+    with open(os.path.join(snapshot_dir, "{manifest}"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def _replace_snapshot(snapshot_dir):
+    import os, shutil, uuid
+
+    tmp_dir = f"{snapshot_dir}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        _snapshot_namespace(tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    old_dir = None
+    if os.path.exists(snapshot_dir):
+        old_dir = f"{snapshot_dir}.old-{uuid.uuid4().hex}"
+        os.replace(snapshot_dir, old_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+_replace_snapshot(r"{snapshot_dir}")
+del _snapshot_namespace, _replace_snapshot
+'''
+
+RESTORE_CODE = '''
+def _restore_namespace(snapshot_dir, mmap_threshold):
+    import importlib, json, os, pickle
+    import pandas as pd
+    import pyarrow.feather as feather
+
+    with open(os.path.join(snapshot_dir, "{manifest}"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    namespace = globals()
+    for name, module in manifest["modules"].items():
+        try:
+            namespace[name] = importlib.import_module(module)
+        except ImportError:
+            pass
+    for name in manifest["frames"]:
+        path = os.path.join(snapshot_dir, f"{name}.arrow")
+        table = feather.read_table(path, memory_map=True)
+        if os.path.getsize(path) > mmap_threshold:
+            # Arrow 类型的列直接引用内存映射的缓冲区，不复制到内核内存
+            namespace[name] = table.to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            namespace[name] = table.to_pandas()
+    with open(os.path.join(snapshot_dir, "objects.pkl"), "rb") as f:
+        objects = pickle.load(f)
+    failed = []
+    for name, data in objects.items():
+        try:
+            namespace[name] = pickle.loads(data)
+        except Exception:
+            failed.append(name)
+    print("{marker}" + json.dumps(failed))
+
+
+_restore_namespace(r"{snapshot_dir}", {mmap_threshold})
+del _restore_namespace
+'''
+
+
+def snapshot_dir(work_dir: str, name: str) -> str:
+    return os.path.join(os.path.abspath(work_dir), SNAPSHOT_DIR, name)
+
+
+def get_snapshot_code(work_dir: str, name: str) -> str:
+    return SNAPSHOT_CODE.replace("{snapshot_dir}", snapshot_dir(work_dir, name)).replace(
+        "{manifest}", MANIFEST_NAME
+    )
+
+
+def get_restore_code(work_dir: str, name: str) -> str:
+    return (
+        RESTORE_CODE.replace("{snapshot_dir}", snapshot_dir(work_dir, name))
+        .replace("{manifest}", MANIFEST_NAME)
+        .replace("{mmap_threshold}", str(MMAP_THRESHOLD))
+        .replace("{marker}", RESTORE_MARKER)
+    )
+
+
+def parse_restore_output(stdout: str) -> list[str]:
+    """从恢复代码的输出中取出未能反序列化的变量名"""
+    for line in stdout.splitlines():
+        if line.startswith(RESTORE_MARKER):
+            return json.loads(line[len(RESTORE_MARKER):])
+    return []
+
+
+def read_manifest(work_dir: str, name: str) -> dict | None:
+    path = os.path.join(snapshot_dir(work_dir, name), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
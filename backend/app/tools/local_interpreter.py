@@ -1,9 +1,18 @@
 from app.tools.base_interpreter import BaseCodeInterpreter
 from app.tools.notebook_serializer import NotebookSerializer
 import jupyter_client
-from app.utils.log_util import logger
+import asyncio
+from app.utils.log_util import log_payload, logger
 import os
+import weakref
 from app.services.redis_manager import redis_manager
+from app.utils.data_cache import DATA_LOADER_CODE
+from app.tools.kernel_snapshot import (
+    get_restore_code,
+    get_snapshot_code,
+    parse_restore_output,
+    read_manifest,
+)
 from app.schemas.response import (
     OutputItem,
     ResultModel,
@@ -11,6 +20,20 @@ from app.schemas.response import (
     SystemMessage,
 )
 
+# 运行中的本地解释器，供采样分析按任务查找内核进程
+_running: "weakref.WeakSet[LocalCodeInterpreter]" = weakref.WeakSet()
+
+
+def kernel_pids(task_id: str) -> list[int]:
+    """任务运行中的内核进程 pid（包括派生的子内核）"""
+    pids = []
+    for interpreter in list(_running):
+        if interpreter.task_id == task_id and interpreter.km is not None:
+            pid = getattr(interpreter.km.provisioner, "pid", None)
+            if pid:
+                pids.append(pid)
+    return pids
+
 
 class LocalCodeInterpreter(BaseCodeInterpreter):
     def __init__(
@@ -27,10 +50,12 @@ class LocalCodeInterpreter(BaseCodeInterpreter):
         # 本地内核一般不需异步上传文件，直接切换目录即可
         # 初始化 Jupyter 内核管理器和客户端
         logger.info("初始化本地内核")
-        self.km, self.kc = jupyter_client.manager.start_new_kernel(
-            kernel_name="python3"
+        # 内核启动和初始化代码都是阻塞调用，放到线程中以便与 LLM 调用并行
+        self.km, self.kc = await asyncio.to_thread(
+            jupyter_client.manager.start_new_kernel, kernel_name="python3"
         )
-        self._pre_execute_code()
+        _running.add(self)
+        await asyncio.to_thread(self._pre_execute_code)
 
     def _pre_execute_code(self):
         init_code = (
@@ -50,11 +75,10 @@ class LocalCodeInterpreter(BaseCodeInterpreter):
             f"mpl.rcParams['xtick.labelsize'] = 10\n"
             f"mpl.rcParams['ytick.labelsize'] = 10\n"
             # 设置DPI以获得更清晰的显示
-        )
+        ) + DATA_LOADER_CODE
         self.execute_code_(init_code)
 
     async def execute_code(self, code: str) -> tuple[str, bool, str]:
-        logger.info(f"执行代码: {code}")
         #  添加代码到notebook
         self.notebook_serializer.add_code_cell_to_notebook(code)
 
@@ -119,8 +143,10 @@ class LocalCodeInterpreter(BaseCodeInterpreter):
                 self.notebook_serializer.add_code_cell_error_to_notebook(out_str)
                 content_to_display.append(StdErrModel(msg=out_str))
 
-        logger.info(f"text_to_gpt: {text_to_gpt}")
+        log_payload("code.output", "text_to_gpt:", text_to_gpt)
         combined_text = "\n".join(text_to_gpt)
+        if not error_occurred:
+            self._record_cell(code)
 
         await self._push_to_websocket(content_to_display)
 
@@ -130,9 +156,80 @@ class LocalCodeInterpreter(BaseCodeInterpreter):
             error_message,
         )
 
+    async def _execute_silently(self, code: str) -> str | None:
+        outputs = await asyncio.to_thread(self.execute_code_, code)
+        errors = [out for mark, out in outputs if mark == "error"]
+        return errors[0] if errors else None
+
+    async def snapshot(self, name: str) -> dict | None:
+        """保存内核命名空间快照：DataFrame 写为 Arrow 文件，其余变量序列化"""
+        error = await self._execute_silently(get_snapshot_code(self.work_dir, name))
+        if error:
+            logger.warning(f"内核快照 {name} 失败: {self._truncate_text(error, 300)}")
+            return None
+        manifest = read_manifest(self.work_dir, name)
+        self.snapshot_info = {"name": name, "cells": len(self.executed_cells)}
+        logger.info(
+            f"内核快照 {name} 完成: DataFrame {len(manifest['frames'])} 个，"
+            f"其他变量 {len(manifest['objects'])} 个，跳过 {manifest['skipped']}"
+        )
+        return manifest
+
+    async def restore_snapshot(self, name: str) -> list[str] | None:
+        manifest = read_manifest(self.work_dir, name)
+        if manifest is None:
+            return None
+        outputs = await asyncio.to_thread(
+            self.execute_code_, get_restore_code(self.work_dir, name)
+        )
+        errors = [out for mark, out in outputs if mark == "error"]
+        if errors:
+            logger.warning(f"恢复内核快照 {name} 失败: {self._truncate_text(errors[0], 300)}")
+            return None
+        stdout = "".join(out for mark, out in outputs if mark == "stdout")
+        # 快照时无法序列化的变量与恢复时无法反序列化的变量
+        missing = manifest["skipped"] + parse_restore_output(stdout)
+        if missing:
+            logger.warning(f"内核快照 {name} 中以下变量未能恢复: {missing}")
+        else:
+            logger.info(f"已从快照 {name} 恢复内核变量")
+        return missing
+
+    async def fork(self, count: int) -> list["LocalCodeInterpreter"]:
+        """从当前快照派生 count 个子内核，用于并行执行的子任务
+
+        子内核共享工作目录，各自写入独立的 notebook；大 DataFrame 通过内存映射的
+        Arrow 文件共享，不会在每个子内核中复制一份。快照不完整时子内核重放快照之前的
+        代码单元补齐变量。
+        """
+        if not self.snapshot_info:
+            raise RuntimeError("派生子内核前需要先保存内核快照")
+        name, cells = self.snapshot_info["name"], self.snapshot_info["cells"]
+        children = [
+            LocalCodeInterpreter(
+                self.task_id,
+                self.work_dir,
+                NotebookSerializer(self.work_dir, f"notebook_{name}_{i}.ipynb"),
+            )
+            for i in range(count)
+        ]
+        try:
+            await asyncio.gather(*(child.initialize() for child in children))
+            for child in children:
+                child.executed_cells = self.executed_cells[:cells]
+                child.snapshot_info = dict(self.snapshot_info)
+                child.last_created_images = set(self.last_created_images)
+            await asyncio.gather(*(child.replay_cells() for child in children))
+        except BaseException:
+            await asyncio.gather(
+                *(child.cleanup() for child in children), return_exceptions=True
+            )
+            raise
+        return children
+
     def execute_code_(self, code) -> list[tuple[str, str]]:
         msg_id = self.kc.execute(code)
-        logger.info(f"执行代码: {code}")
+        log_payload("code", "执行代码:", code)
         # Get the output of the code
         msg_list = []
         while True:
@@ -211,6 +308,10 @@ class LocalCodeInterpreter(BaseCodeInterpreter):
 
     async def cleanup(self):
         # 关闭内核
+        _running.discard(self)
+        if self.kc is None:
+            # 只用于读取断点中的代码输出，没有启动内核
+            return
         self.kc.shutdown()
         logger.info("关闭内核")
         self.km.shutdown_kernel()
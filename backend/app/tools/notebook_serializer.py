@@ -53,6 +53,20 @@ class NotebookSerializer:
             #         f"文件 {self.notebook_path} 已存在。请选择其他文件名。"
             #     )
 
+    def load(self) -> bool:
+        """读取已存在的 notebook，恢复任务时在其后继续追加"""
+        if not self.notebook_path or not os.path.exists(self.notebook_path):
+            return False
+        self.nb = nbformat.read(self.notebook_path, as_version=4)
+        return True
+
+    def has_code_cell(self, code: str) -> bool:
+        """notebook 中是否已有相同的代码单元"""
+        return any(
+            cell["cell_type"] == "code" and cell["source"] == code
+            for cell in self.nb["cells"]
+        )
+
     def ansi_to_html(self, ansi_text):
         converter = ansi2html.Ansi2HTMLConverter()
         html_text = converter.convert(ansi_text)
@@ -1,5 +1,8 @@
+import asyncio
 import requests
 from typing import List, Dict, Any
+from app.services.metrics import SCHOLAR_QUERY
+from app.services.tracing import tracer
 from app.services.redis_manager import redis_manager
 from app.schemas.response import ScholarMessage
 
@@ -14,6 +17,8 @@ class OpenAlexScholar:
         self.base_url = "https://api.openalex.org"
         self.email = email
         self.task_id = task_id
+        self._cache: dict[tuple[str, int], List[Dict[str, Any]]] = {}
+        self.prefetched: List[Dict[str, Any]] = []
 
     def _get_request_url(self, endpoint: str) -> str:
         """Construct request URL with email parameter if provided."""
@@ -49,16 +54,27 @@ class OpenAlexScholar:
         # 拼接单词形成文本
         return " ".join(words).strip()
 
-    async def search_papers(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+    async def prefetch(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """任务开始时预取与题目相关的文献，供写作手直接引用"""
+        self.prefetched = await self.search_papers(query, limit, notify=False)
+        return self.prefetched
+
+    async def search_papers(
+        self, query: str, limit: int = 8, notify: bool = True
+    ) -> List[Dict[str, Any]]:
         """Search for papers using OpenAlex API.
 
         Args:
             query: Search query string
             limit: Maximum number of results to return
+            notify: Whether to publish the result titles to the task channel
 
         Returns:
             List of papers with their details
         """
+        if (query, limit) in self._cache:
+            return self._cache[(query, limit)]
+
         # 构建基础 URL
         base_url = self._get_request_url("works")
 
@@ -85,7 +101,13 @@ class OpenAlexScholar:
         # 让 requests 处理参数编码和 URL 构建
         try:
             print(f"请求 URL: {base_url} 参数: {params}")
-            response = requests.get(base_url, params=params, headers=headers)
+            # requests 为同步调用，放到线程中执行避免阻塞事件循环
+            with SCHOLAR_QUERY.time(source="openalex"), tracer.span(
+                "search_papers", "tool", query=query
+            ):
+                response = await asyncio.to_thread(
+                    requests.get, base_url, params=params, headers=headers
+                )
             print(f"响应状态: {response.status_code}")
 
             response.raise_for_status()
@@ -150,13 +172,16 @@ class OpenAlexScholar:
             papers.append(paper)
             paper_titles.append(paper["title"])  # 添加标题到列表
 
-        await redis_manager.publish_message(
-            self.task_id,
-            ScholarMessage(
-                input={"query": query},
-                output=paper_titles,  # 只发送论文标题列表
-            ),
-        )
+        self._cache[(query, limit)] = papers
+
+        if notify:
+            await redis_manager.publish_message(
+                self.task_id,
+                ScholarMessage(
+                    input={"query": query},
+                    output=paper_titles,  # 只发送论文标题列表
+                ),
+            )
 
         return papers
 
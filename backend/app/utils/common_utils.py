@@ -5,9 +5,7 @@ import tomllib
 from app.schemas.enums import CompTemplate
 from app.utils.log_util import logger
 import re
-import pypandoc
 from app.config.setting import settings
-from icecream import ic
 
 
 def create_task_id() -> str:
@@ -69,6 +67,8 @@ def get_current_files(folder_path: str, type: str = "all") -> list[str]:
         return [
             file for file in files if file.endswith(".xlsx") or file.endswith(".csv")
         ]
+    elif type == "parquet":
+        return [file for file in files if file.endswith(".parquet")]
     elif type == "image":
         return [
             file for file in files if file.endswith(".png") or file.endswith(".jpg")
@@ -85,31 +85,6 @@ def transform_link(task_id: str, content: str):
     return content
 
 
-# TODO: fix 公式显示
-def md_2_docx(task_id: str):
-    work_dir = get_work_dir(task_id)
-    md_path = os.path.join(work_dir, "res.md")
-    docx_path = os.path.join(work_dir, "res.docx")
-
-    extra_args = [
-        "--resource-path", str(work_dir),
-        "--mathml",
-        "--standalone",
-        "--pdf-engine=xelatex",  # 新增：支持LaTeX公式
-        "-V", "mainfont=SimHei",  # 新增：确保中文公式周围文字正常显示
-    ]
-
-    pypandoc.convert_file(
-        source_file=md_path,
-        to="docx",
-        outputfile=docx_path,
-        format="markdown+tex_math_dollars",
-        extra_args=extra_args,
-    )
-    print(f"转换完成: {docx_path}")
-    logger.info(f"转换完成: {docx_path}")
-
-
 def split_footnotes(text: str) -> tuple[str, list[tuple[str, str]]]:
     main_text = re.sub(
         r"\n\[\^\d+\]:.*?(?=\n\[\^|\n\n|\Z)", "", text, flags=re.DOTALL
@@ -0,0 +1,163 @@
+import os
+import shutil
+from app.utils.log_util import logger
+
+# 预先注入内核的数据读写函数：优先读取 Parquet 副本，不存在时回退到原始文件
+DATA_LOADER_CODE = '''
+import os as _os
+import pandas as _pd
+
+
+def load_data(filename, sheet_name=None, columns=None):
+    """读取数据文件，优先使用预先转换的 Parquet 副本"""
+    parquet_path = f"{filename}.parquet" if sheet_name is None else f"{filename}.{sheet_name}.parquet"
+    # 原始文件在副本生成后被改写时，副本视为过期
+    if _os.path.exists(parquet_path) and not (
+        _os.path.exists(filename)
+        and _os.path.getmtime(filename) > _os.path.getmtime(parquet_path)
+    ):
+        return _pd.read_parquet(parquet_path, columns=columns)
+    if filename.endswith(".parquet"):
+        return _pd.read_parquet(filename, columns=columns)
+    if filename.endswith(".csv"):
+        return _pd.read_csv(filename, usecols=columns)
+    return _pd.read_excel(filename, sheet_name=sheet_name or 0, usecols=columns)
+
+
+def save_data(df, filename, **kwargs):
+    """保存数据文件，并同时写出 Parquet 副本供后续 load_data 快速读取"""
+    # 先删除再写入新文件，不在仓库提供的原文件上原地改写
+    for path in (filename, f"{filename}.parquet"):
+        if _os.path.lexists(path):
+            _os.remove(path)
+    if filename.endswith(".csv"):
+        df.to_csv(filename, index=False, **kwargs)
+    elif filename.endswith(".xlsx"):
+        df.to_excel(filename, index=False, **kwargs)
+    try:
+        df.to_parquet(f"{filename}.parquet", index=False)
+    except Exception as e:
+        print(f"Parquet 副本保存失败: {e}")
+'''
+
+
+def detect_csv_encoding(path: str) -> str:
+    """根据文件开头判断 CSV 编码，竞赛数据常见 GBK 编码"""
+    size = 64 * 1024
+    with open(path, "rb") as f:
+        head = f.read(size)
+    for encoding in ("utf-8-sig", "gbk"):
+        try:
+            head.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # 读取截断在多字节字符中间导致的错误不算
+            if len(head) == size and e.start >= size - 4:
+                return encoding
+    return "latin-1"
+
+
+def csv_encodings(path: str) -> list[str]:
+    """候选编码，检测结果在前；检测只看文件开头，后续内容可能需要其他编码"""
+    return list(dict.fromkeys((detect_csv_encoding(path), "utf-8-sig", "gb18030")))
+
+
+def read_csv(path: str, **kwargs):
+    """读取 CSV，解码失败时依次尝试其他候选编码，都失败时替换无法解码的字符"""
+    import pandas as pd
+
+    for encoding in csv_encodings(path):
+        try:
+            return pd.read_csv(path, encoding=encoding, **kwargs)
+        except UnicodeDecodeError:
+            logger.warning(f"{os.path.basename(path)} 按 {encoding} 解码失败，尝试其他编码")
+    return pd.read_csv(path, encoding_errors="replace", **kwargs)
+
+
+def _to_parquet(df, path: str) -> None:
+    try:
+        df.to_parquet(path, index=False)
+    except Exception:
+        # Excel 中常见同一列混杂文本与数字/时间，Parquet 无法表示，
+        # 此类列按字符串保存（空值保持为空）
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            values = df[col]
+            if values.dropna().map(type).nunique() > 1:
+                df[col] = values.where(values.isna(), values.astype(str))
+        df.to_parquet(path, index=False)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def convert_data_file(path: str, dst_prefix: str | None = None) -> list[str]:
+    """将单个 CSV/XLSX 文件转为 Parquet
+
+    - data.csv -> {dst_prefix}.parquet
+    - data.xlsx 每个 sheet -> {dst_prefix}.<sheet>.parquet，第一个 sheet 同时为 {dst_prefix}.parquet
+    - 混杂多种类型的列以字符串保存
+
+    Args:
+        path: 数据文件路径
+        dst_prefix: 输出路径前缀，默认为原文件路径（保存在原文件旁边）
+
+    Returns:
+        生成的 Parquet 文件路径列表
+    """
+    import pandas as pd
+
+    dst_prefix = dst_prefix or path
+    created: list[str] = []
+    if path.endswith(".csv"):
+        _to_parquet(read_csv(path), f"{dst_prefix}.parquet")
+        created.append(f"{dst_prefix}.parquet")
+    else:
+        sheets = pd.read_excel(path, sheet_name=None)
+        for index, (sheet, df) in enumerate(sheets.items()):
+            sheet_path = f"{dst_prefix}.{sheet}.parquet"
+            _to_parquet(df, sheet_path)
+            created.append(sheet_path)
+            if index == 0:
+                _link_or_copy(sheet_path, f"{dst_prefix}.parquet")
+                created.append(f"{dst_prefix}.parquet")
+    return created
+
+
+def parquet_available() -> bool:
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def convert_data_files(work_dir: str) -> list[str]:
+    """将工作目录中的 CSV/XLSX 转为 Parquet 副本，保存在原文件旁边
+
+    Returns:
+        生成的 Parquet 文件名列表
+    """
+    if not parquet_available():
+        logger.warning("未安装 pyarrow，跳过数据文件 Parquet 转换")
+        return []
+
+    created: list[str] = []
+    for file in sorted(os.listdir(work_dir)):
+        path = os.path.join(work_dir, file)
+        if not os.path.isfile(path) or not file.endswith((".csv", ".xlsx")):
+            continue
+        try:
+            created.extend(os.path.basename(p) for p in convert_data_file(path))
+            logger.info(f"数据文件已转换为 Parquet: {file}")
+        except Exception as e:
+            # 转换失败不影响任务，内核中 load_data 会回退到原始文件
+            logger.warning(f"数据文件 {file} 转换 Parquet 失败: {str(e)}")
+    return created
@@ -0,0 +1,280 @@
+import json
+import os
+from app.utils.data_cache import csv_encodings, read_csv
+from app.utils.log_util import logger
+
+# 数据概况缓存文件名
+PROFILE_NAME = "data_profile.json"
+# 超过该大小的 CSV 分块统计，分位数与相关系数基于首块样本
+CHUNKED_THRESHOLD = 200 * 1024 * 1024
+CHUNK_ROWS = 200_000
+# 每列保留的高频取值数量 / 输出的强相关变量对数量
+TOP_VALUES = 5
+TOP_CORRELATIONS = 10
+
+
+def _round(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if value != value:  # NaN
+        return None
+    return float(f"{value:.4g}")
+
+
+def _top_correlations(numeric) -> list[dict]:
+    import numpy as np
+
+    if numeric.shape[1] < 2:
+        return []
+    corr = numeric.corr().to_numpy()
+    cols = numeric.columns
+    # 只取上三角，按绝对值排序
+    i, j = np.triu_indices_from(corr, k=1)
+    values = corr[i, j]
+    valid = ~np.isnan(values)
+    i, j, values = i[valid], j[valid], values[valid]
+    order = np.argsort(-np.abs(values))[:TOP_CORRELATIONS]
+    return [
+        {"a": str(cols[i[k]]), "b": str(cols[j[k]]), "r": _round(values[k])}
+        for k in order
+    ]
+
+
+def _profile_frame(df) -> dict:
+    """对完整 DataFrame 做向量化统计"""
+    numeric = df.select_dtypes("number")
+    missing = df.isna().sum()
+    nunique = df.nunique()
+    columns = {}
+
+    if not numeric.empty:
+        stats = numeric.agg(["mean", "std", "min", "max"])
+        quantiles = numeric.quantile([0.25, 0.5, 0.75])
+    for col in df.columns:
+        info = {
+            "dtype": str(df[col].dtype),
+            "missing": int(missing[col]),
+            "unique": int(nunique[col]),
+        }
+        if col in numeric.columns:
+            info.update(
+                {
+                    "mean": _round(stats.at["mean", col]),
+                    "std": _round(stats.at["std", col]),
+                    "min": _round(stats.at["min", col]),
+                    "q25": _round(quantiles.at[0.25, col]),
+                    "median": _round(quantiles.at[0.5, col]),
+                    "q75": _round(quantiles.at[0.75, col]),
+                    "max": _round(stats.at["max", col]),
+                }
+            )
+        else:
+            top = df[col].value_counts().head(TOP_VALUES)
+            info["top"] = [[str(k), int(v)] for k, v in top.items()]
+        columns[str(col)] = info
+
+    return {
+        "rows": int(len(df)),
+        "columns": columns,
+        "correlations": _top_correlations(numeric),
+        "sampled": False,
+    }
+
+
+def _profile_csv_chunked(path: str) -> dict:
+    """大文件分块统计，后续分块解码失败时换用下一个候选编码重新统计"""
+    for encoding in csv_encodings(path):
+        try:
+            return _aggregate_csv_chunks(path, encoding=encoding)
+        except UnicodeDecodeError:
+            logger.warning(f"{os.path.basename(path)} 按 {encoding} 解码失败，尝试其他编码")
+    return _aggregate_csv_chunks(path, encoding_errors="replace")
+
+
+def _aggregate_csv_chunks(path: str, **read_kwargs) -> dict:
+    """分块累加计数、缺失、均值方差、极值与高频取值"""
+    import numpy as np
+    import pandas as pd
+
+    rows = 0
+    sample_profile = None
+    missing = None
+    count = sums = sumsq = mins = maxs = None
+    value_counts: dict[str, pd.Series] = {}
+
+    reader = pd.read_csv(path, chunksize=CHUNK_ROWS, **read_kwargs)
+    for chunk in reader:
+        if sample_profile is None:
+            sample_profile = _profile_frame(chunk)
+        rows += len(chunk)
+        chunk_missing = chunk.isna().sum()
+        missing = chunk_missing if missing is None else missing.add(chunk_missing, fill_value=0)
+
+        numeric = chunk.select_dtypes("number").astype("float64")
+        chunk_count = numeric.count()
+        chunk_sum = numeric.sum()
+        chunk_sumsq = (numeric**2).sum()
+        if count is None:
+            count, sums, sumsq = chunk_count, chunk_sum, chunk_sumsq
+            mins, maxs = numeric.min(), numeric.max()
+        else:
+            count = count.add(chunk_count, fill_value=0)
+            sums = sums.add(chunk_sum, fill_value=0)
+            sumsq = sumsq.add(chunk_sumsq, fill_value=0)
+            # 按列名并集合并，后续分块才成为数值的列也保留极值
+            mins = mins.combine(numeric.min(), np.fmin)
+            maxs = maxs.combine(numeric.max(), np.fmax)
+
+        for col in chunk.columns.difference(numeric.columns):
+            counts = chunk[col].value_counts()
+            if col in value_counts:
+                counts = value_counts[col].add(counts, fill_value=0)
+            # 高基数列只保留计数最多的部分，高频取值为近似结果
+            value_counts[col] = counts.nlargest(1000)
+
+    if sample_profile is None:
+        return {"rows": 0, "columns": {}, "correlations": [], "sampled": False}
+
+    # 全量统计覆盖样本统计，分位数与相关系数保留样本结果
+    profile = sample_profile
+    profile["rows"] = rows
+    profile["sampled"] = True
+    for col, info in profile["columns"].items():
+        info["missing"] = int(missing[col])
+        info.pop("unique", None)
+        if col in count.index and count[col] > 0:
+            mean = sums[col] / count[col]
+            var = max(sumsq[col] / count[col] - mean**2, 0.0)
+            ddof = count[col] / (count[col] - 1) if count[col] > 1 else 1.0
+            info.update(
+                {
+                    "mean": _round(mean),
+                    "std": _round((var * ddof) ** 0.5),
+                    "min": _round(mins[col]),
+                    "max": _round(maxs[col]),
+                }
+            )
+        elif col in value_counts:
+            top = value_counts[col].sort_values(ascending=False).head(TOP_VALUES)
+            info["top"] = [[str(k), int(v)] for k, v in top.items()]
+    return profile
+
+
+def _read_frames(path: str, parquet_prefix: str | None = None) -> dict[str, object]:
+    """读取数据文件，优先使用 Parquet 副本，返回 {sheet: DataFrame}"""
+    import pandas as pd
+
+    parquet_prefix = parquet_prefix or path
+    if path.endswith(".csv"):
+        parquet = f"{parquet_prefix}.parquet"
+        if os.path.exists(parquet):
+            return {"": pd.read_parquet(parquet)}
+        return {"": read_csv(path)}
+
+    sheets = pd.ExcelFile(path).sheet_names
+    frames = {}
+    for sheet in sheets:
+        parquet = f"{parquet_prefix}.{sheet}.parquet"
+        if os.path.exists(parquet):
+            frames[sheet] = pd.read_parquet(parquet)
+        else:
+            frames[sheet] = pd.read_excel(path, sheet_name=sheet)
+    return frames
+
+
+def profile_data_file(path: str, parquet_prefix: str | None = None) -> dict:
+    """统计单个数据文件的概况，返回 {sheet: 概况}，CSV 的 sheet 为空字符串
+
+    Args:
+        path: 数据文件路径
+        parquet_prefix: Parquet 副本路径前缀，默认为原文件路径
+    """
+    if path.endswith(".csv") and os.path.getsize(path) > CHUNKED_THRESHOLD:
+        return {"": _profile_csv_chunked(path)}
+    return {
+        sheet: _profile_frame(df)
+        for sheet, df in _read_frames(path, parquet_prefix).items()
+    }
+
+
+def save_data_profile(work_dir: str, profile: dict) -> None:
+    with open(os.path.join(work_dir, PROFILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def profile_data_files(work_dir: str) -> dict:
+    """统计工作目录中所有数据文件的概况，并缓存为 data_profile.json"""
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        logger.warning("未安装 pandas，跳过数据概况统计")
+        return {}
+
+    profile: dict[str, dict] = {}
+    for file in sorted(os.listdir(work_dir)):
+        path = os.path.join(work_dir, file)
+        if not os.path.isfile(path) or not file.endswith((".csv", ".xlsx")):
+            continue
+        try:
+            profile[file] = profile_data_file(path)
+            logger.info(f"数据概况统计完成: {file}")
+        except Exception as e:
+            logger.warning(f"数据文件 {file} 概况统计失败: {str(e)}")
+
+    save_data_profile(work_dir, profile)
+    return profile
+
+
+def load_data_profile(work_dir: str) -> dict:
+    """读取缓存的数据概况，不存在时现场统计"""
+    path = os.path.join(work_dir, PROFILE_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return profile_data_files(work_dir)
+
+
+def format_data_profile(profile: dict, max_columns: int = 60) -> str:
+    """将数据概况格式化为紧凑的文本，用于提示词"""
+    lines = []
+    for file, sheets in profile.items():
+        for sheet, info in sheets.items():
+            title = f"{file} [{sheet}]" if sheet else file
+            columns = info["columns"]
+            sampled = "，分位数与相关系数基于前若干行样本" if info.get("sampled") else ""
+            lines.append(f"## {title}: {info['rows']}行 × {len(columns)}列{sampled}")
+            for name, col in list(columns.items())[:max_columns]:
+                parts = [col["dtype"], f"缺失{col['missing']}"]
+                if "unique" in col:
+                    parts.append(f"唯一值{col['unique']}")
+                if "mean" in col:
+                    parts.append(
+                        f"均值={col['mean']} 标准差={col['std']} 最小={col['min']} "
+                        f"Q1={col.get('q25')} 中位数={col.get('median')} "
+                        f"Q3={col.get('q75')} 最大={col['max']}"
+                    )
+                elif col.get("top"):
+                    top = ", ".join(f"{k}({v})" for k, v in col["top"])
+                    parts.append(f"高频取值: {top}")
+                lines.append(f"- {name}: " + ", ".join(parts))
+            if len(columns) > max_columns:
+                lines.append(f"- ... 其余 {len(columns) - max_columns} 列省略")
+            if info["correlations"]:
+                corr = ", ".join(
+                    f"{c['a']}~{c['b']}={c['r']}" for c in info["correlations"]
+                )
+                lines.append(f"相关系数绝对值最大的变量对: {corr}")
+    return "\n".join(lines)
+
+
+def summarize_data_files(profile: dict) -> str:
+    """数据文件名与规模的一行摘要"""
+    return ", ".join(
+        f"'{file}'" + (f"[{sheet}]" if sheet else "") + f"({info['rows']}×{len(info['columns'])})"
+        for file, sheets in profile.items()
+        for sheet, info in sheets.items()
+    )
@@ -1,14 +1,72 @@
+import asyncio
 import json
 import os
+import threading
+from app.services.redis_manager import redis_manager
 from app.utils.log_util import logger
 from typing import Any, Dict
 
+# Redis 中按任务汇总的用量 {agent|stage|指标: 数值}，过期时间与 task_id 一致
+USAGE_KEY = "task_usage:{task_id}"
+USAGE_TTL = 36000
+# 每次调用记录的指标，浮点数用 HINCRBYFLOAT 累加
+USAGE_INT_FIELDS = (
+    "calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "cached_tokens",
+    "cache_hits",
+    "retries",
+    "failures",
+)
+# cost 为 litellm 按官方价格计算的费用（美元）；litellm 无法定价的模型按 calculate_cost
+# 的价格表估算，单独记入 estimated_cost（人民币），两者不能相加
+USAGE_FLOAT_FIELDS = ("latency", "cost", "estimated_cost")
+USAGE_CURRENCY = {"cost": "USD", "estimated_cost": "RMB"}
+
+
+def _empty_usage() -> dict:
+    usage = {field: 0 for field in USAGE_INT_FIELDS}
+    usage.update({field: 0.0 for field in USAGE_FLOAT_FIELDS})
+    return usage
+
+
+async def get_task_usage(task_id: str) -> dict:
+    """读取任务的用量台账，按 agent -> stage 汇总，并给出每个 agent 与整个任务的合计"""
+    client = await redis_manager.get_client()
+    raw = await client.hgetall(USAGE_KEY.format(task_id=task_id))
+
+    agents: dict[str, dict] = {}
+    for field, value in raw.items():
+        agent_name, stage, metric = field.rsplit("|", 2)
+        stages = agents.setdefault(agent_name, {})
+        usage = stages.setdefault(stage, _empty_usage())
+        usage[metric] = float(value) if metric in USAGE_FLOAT_FIELDS else int(value)
+
+    total = _empty_usage()
+    result = {
+        "task_id": task_id,
+        "currency": USAGE_CURRENCY,
+        "agents": {},
+        "total": total,
+    }
+    for agent_name, stages in agents.items():
+        agent_total = _empty_usage()
+        for usage in stages.values():
+            for metric, value in usage.items():
+                agent_total[metric] += value
+                total[metric] += value
+        result["agents"][agent_name] = {"stages": stages, "total": agent_total}
+    return result
+
 
 # TODO: 记录数据
 # data analysis : save all data and result
 # agent-histroy, token usgae, , cost , workflow cost , res
 class DataRecorder:
-    def __init__(self, log_work_dir: str = ""):
+    def __init__(self, task_id: str | None = None, log_work_dir: str = ""):
+        self.task_id = task_id
         self.total_cost = 0.0
         self.agents_chat_history = {}
         # {"agent_name": [{}, {}, ...]
@@ -20,6 +78,12 @@ class DataRecorder:
         # }
         self.log_work_dir = log_work_dir
         self.token_usage = {}
+        # {agent_name: {stage: {指标: 数值}}}，由 litellm 回调写入
+        self.usage_ledger: dict[str, dict[str, dict]] = {}
+        # 并发的 LLM 回调依次写 usage_ledger.json，只写入比已写出的更新的版本
+        self._ledger_lock = threading.Lock()
+        self._ledger_version = 0
+        self._ledger_written = 0
 
         self.initialized = True
 
@@ -182,6 +246,93 @@ class DataRecorder:
         # 写入 JSON 文件
         self.write_to_json(self.token_usage, "token_usage.json")
 
+    async def record_usage(
+        self,
+        agent_name: str,
+        stage: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_hit: bool = False,
+        latency: float = 0.0,
+        cost: float | None = None,
+        retries: int = 0,
+    ) -> None:
+        """记录一次成功的 LLM 调用，同时累加到 Redis 中的任务台账
+
+        cost 为 litellm 计算的费用（美元），为 None 时按价格表估算，记入 estimated_cost（人民币）
+        """
+        delta = {
+            "calls": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hits": int(cache_hit or cached_tokens > 0),
+            "retries": retries,
+            "latency": latency,
+        }
+        if cost is None:
+            delta["estimated_cost"] = self.calculate_cost(
+                model, prompt_tokens, completion_tokens
+            )
+        else:
+            delta["cost"] = cost
+            self.total_cost += cost
+        await self._add_usage(agent_name, stage, delta)
+
+    async def record_failure(
+        self, agent_name: str, stage: str, latency: float = 0.0
+    ) -> None:
+        """记录一次失败的 LLM 调用"""
+        await self._add_usage(agent_name, stage, {"failures": 1, "latency": latency})
+
+    async def _add_usage(self, agent_name: str, stage: str, delta: dict) -> None:
+        usage = self.usage_ledger.setdefault(agent_name, {}).setdefault(
+            stage, _empty_usage()
+        )
+        for metric, value in delta.items():
+            usage[metric] += value
+        if self.log_work_dir:
+            # 在事件循环中序列化，线程中写入时台账可能正被其他回调修改
+            self._ledger_version += 1
+            content = json.dumps(self.usage_ledger, ensure_ascii=False, indent=4)
+            await asyncio.to_thread(self._write_ledger, self._ledger_version, content)
+        if not self.task_id:
+            return
+
+        key = USAGE_KEY.format(task_id=self.task_id)
+        try:
+            client = await redis_manager.get_client()
+            # API 与 worker 进程的调用累加到同一份台账
+            async with client.pipeline(transaction=False) as pipe:
+                for metric, value in delta.items():
+                    field = f"{agent_name}|{stage}|{metric}"
+                    if metric in USAGE_FLOAT_FIELDS:
+                        pipe.hincrbyfloat(key, field, value)
+                    else:
+                        pipe.hincrby(key, field, value)
+                pipe.expire(key, USAGE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[{self.task_id}] 写入用量台账失败: {str(e)}")
+
+    def _write_ledger(self, version: int, content: str) -> None:
+        """先写临时文件再替换，并发写入时文件始终完整，且不会被旧版本覆盖"""
+        path = os.path.join(self.log_work_dir, "usage_ledger.json")
+        with self._ledger_lock:
+            if version <= self._ledger_written:
+                return
+            try:
+                tmp = f"{path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(tmp, path)
+                self._ledger_written = version
+            except Exception as e:
+                logger.error(f"写入用量台账文件失败: {e}")
+
     def calculate_cost(
         self, model: str, prompt_tokens: int, completion_tokens: int
     ) -> float:
@@ -0,0 +1,11 @@
+from app.config.setting import settings
+from app.utils.log_util import logger
+
+# 调试追踪开关，导入时确定。调用点写作 `if TRACE: trace(f"...")`，
+# 关闭时只有一次全局变量判断，f-string 不会被格式化
+TRACE: bool = settings.DEBUG_TRACE
+
+
+def trace(message: str) -> None:
+    """输出调试追踪信息，位置信息指向调用方"""
+    logger.opt(depth=1).debug(message)
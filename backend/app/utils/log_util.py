@@ -1,7 +1,22 @@
+import json
 import os
+import random
 import sys
 import time
 from loguru import logger as _logger
+from app.config.setting import settings
+from app.utils.task_context import current_task_id
+
+
+def clip(value, limit: int | None = None) -> str:
+    """将载荷（或返回载荷的函数）转为字符串并截断到 limit 个字符，附上被截掉的长度"""
+    limit = settings.LOG_PAYLOAD_LIMIT if limit is None else limit
+    if callable(value):
+        value = value()
+    text = value if isinstance(value, str) else str(value)
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
 
 
 class LoggerInitializer:
@@ -26,9 +41,35 @@ class LoggerInitializer:
         """
         return log
 
+    @staticmethod
+    def __patch(record: dict):
+        """在调用方线程中附加当前任务，后台写出时上下文已不可用"""
+        record["extra"].setdefault("task_id", current_task_id.get())
+
+    @staticmethod
+    def __format_json(record: dict) -> str:
+        """结构化 JSON 日志，每条一行"""
+        extra = {k: v for k, v in record["extra"].items() if not k.startswith("_")}
+        payload = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "name": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+            **extra,
+        }
+        if record["exception"] is not None:
+            payload["exception"] = str(record["exception"].value)
+        record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+        return "{extra[_json]}\n"
+
     def init_log(self):
         """
         初始化日志配置
+
+        LOG_ENQUEUE 开启时各 sink 通过队列在后台线程中写出，调用方只负责生成消息；
+        LOG_FORMAT=json 时输出结构化 JSON，附带任务 id 与载荷类别。
         """
         # 自定义日志格式
         format_str = (
@@ -37,16 +78,26 @@ class LoggerInitializer:
             "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
             "<level>{message}</level>"
         )
+        if settings.LOG_FORMAT == "json":
+            format_str = self.__format_json
         _logger.remove()
+        _logger.configure(patcher=self.__patch)
         # 移除后重新添加sys.stderr, 目的: 控制台输出与文件日志内容和结构一致
-        _logger.add(sys.stderr, filter=self.__filter, format=format_str, enqueue=False)
+        _logger.add(
+            sys.stderr,
+            level=settings.LOG_LEVEL,
+            filter=self.__filter,
+            format=format_str,
+            enqueue=settings.LOG_ENQUEUE,
+        )
         _logger.add(
             self.log_path_error,
+            level=settings.LOG_LEVEL,
             filter=self.__filter,
             format=format_str,
             rotation="50MB",
             encoding="utf-8",
-            enqueue=False,
+            enqueue=settings.LOG_ENQUEUE,
             compression="zip",
         )
 
@@ -56,3 +107,17 @@ class LoggerInitializer:
 # 初始化日志处理器
 log_initializer = LoggerInitializer()
 logger = log_initializer.init_log()
+
+
+def log_payload(category: str, message: str, payload, level: str = "DEBUG") -> None:
+    """记录大体积载荷（LLM 响应、代码、消息内容）
+
+    按 LOG_SAMPLE_RATES 中类别的采样率抽样，载荷只在采样命中且日志级别开启时才转为字符串，
+    并截断到 LOG_PAYLOAD_LIMIT 个字符，日志开销不再随载荷大小增长。
+    """
+    rate = settings.LOG_SAMPLE_RATES.get(category, 1.0)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    logger.bind(category=category).opt(lazy=True, depth=1).log(
+        level, message.replace("{", "{{").replace("}", "}}") + " {}", lambda: clip(payload)
+    )
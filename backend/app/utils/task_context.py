@@ -0,0 +1,14 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 当前协程所属的建模任务，任务内创建的子任务与 to_thread 线程会继承该值
+current_task_id: ContextVar[str | None] = ContextVar("current_task_id", default=None)
+
+
+@contextmanager
+def bind_task_id(task_id: str):
+    token = current_task_id.set(task_id)
+    try:
+        yield
+    finally:
+        current_task_id.reset(token)
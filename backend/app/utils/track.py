@@ -1,20 +1,84 @@
 from litellm.integrations.custom_logger import CustomLogger
-import litellm
+from app.utils.data_recorder import DataRecorder
+from app.utils.log_util import logger
+
+
+def _metadata(kwargs) -> dict:
+    return (kwargs.get("litellm_params") or {}).get("metadata") or {}
+
+
+def _latency(start_time, end_time) -> float:
+    try:
+        return (end_time - start_time).total_seconds()
+    except Exception:
+        return 0.0
 
 
 class AgentMetrics(CustomLogger):
+    """litellm 回调，将每次调用的 token、耗时、费用、缓存命中与重试写入任务的 DataRecorder
+
+    LLM.chat 在 metadata 中传入 task_id、agent_name、stage（sub_title）与当前重试次数，
+    任务开始时通过 recorder() 注册 DataRecorder，未注册的任务只汇总到 Redis。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.recorders: dict[str, DataRecorder] = {}
+
+    def recorder(self, task_id: str, log_work_dir: str = "") -> DataRecorder:
+        """获取任务的 DataRecorder，不存在时创建"""
+        if task_id not in self.recorders:
+            self.recorders[task_id] = DataRecorder(task_id, log_work_dir)
+        return self.recorders[task_id]
+
+    def release(self, task_id: str) -> None:
+        self.recorders.pop(task_id, None)
+
+    def _get(self, metadata: dict) -> DataRecorder | None:
+        task_id = metadata.get("task_id")
+        if not task_id:
+            return None
+        return self.recorders.get(task_id) or DataRecorder(task_id)
+
     #### ASYNC ####
 
     async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
         try:
-            # response_cost = kwargs.get("response_cost", 0)
-            # print("streaming response_cost", response_cost)
-            print("agent_name", kwargs["litellm_params"]["metadata"]["agent_name"])
-        except:
-            pass
+            metadata = _metadata(kwargs)
+            recorder = self._get(metadata)
+            if recorder is None:
+                return
+            usage = getattr(response_obj, "usage", None)
+            details = getattr(usage, "prompt_tokens_details", None)
+            await recorder.record_usage(
+                agent_name=metadata.get("agent_name", "unknown"),
+                stage=metadata.get("stage") or "-",
+                model=kwargs.get("model", ""),
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+                cache_hit=bool(kwargs.get("cache_hit")),
+                latency=_latency(start_time, end_time),
+                cost=kwargs.get("response_cost"),
+                retries=metadata.get("attempt", 0),
+            )
+        except Exception as e:
+            # 统计失败不影响任务
+            logger.error(f"记录 LLM 用量失败: {str(e)}")
 
     async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
-        print(f"On Async Failure")
+        try:
+            metadata = _metadata(kwargs)
+            recorder = self._get(metadata)
+            if recorder is None:
+                return
+            await recorder.record_failure(
+                agent_name=metadata.get("agent_name", "unknown"),
+                stage=metadata.get("stage") or "-",
+                latency=_latency(start_time, end_time),
+            )
+        except Exception as e:
+            logger.error(f"记录 LLM 调用失败次数失败: {str(e)}")
 
 
 # 全局指标收集器实例
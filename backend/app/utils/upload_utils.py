@@ -0,0 +1,105 @@
+import hashlib
+import os
+from aiofile import async_open
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+# 每次从上传文件读取并写入磁盘的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadQuotaExceeded(Exception):
+    """上传文件超过大小限制
+
+    Args:
+        filename: 超出限制的文件
+        limit: 超出的限制（字节）
+        task_quota: True 表示超出的是单任务总配额的剩余部分，否则为单文件大小限制
+    """
+
+    def __init__(self, filename: str, limit: int, task_quota: bool = False):
+        self.filename = filename
+        self.limit = limit
+        self.task_quota = task_quota
+        limit_mb = limit // (1024 * 1024)
+        if task_quota:
+            message = f"上传文件总大小超过单任务限制，文件 {filename} 超出剩余配额 {limit_mb}MB"
+        else:
+            message = f"文件 {filename} 超过单文件大小限制 {limit_mb}MB"
+        super().__init__(message)
+
+
+class UploadLimitMiddleware:
+    """按实际接收的字节数限制请求体大小
+
+    Content-Length 超限时直接拒绝；没有 Content-Length（分块传输）或声明不实时，
+    在接收过程中累计字节数，超过限制立即中止，不再继续读取和暂存剩余数据。
+    """
+
+    def __init__(self, app, paths: set[str], max_bytes: int, detail: str):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": self.detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI 解析请求体时原样抛出 HTTPException，返回 413
+                    raise HTTPException(status_code=413, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def save_upload_file(
+    file: UploadFile,
+    dst_path: str,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    task_quota: bool = False,
+) -> tuple[int, str]:
+    """分块将上传文件写入磁盘，边写边计算 sha256
+
+    超过 max_bytes 时删除已写入的部分并抛出 UploadQuotaExceeded（task_quota 标明
+    max_bytes 来自单任务剩余配额），整个过程内存中只保留一个块。
+
+    Returns:
+        (文件大小, sha256)
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadQuotaExceeded(file.filename, max_bytes, task_quota)
+
+    sha = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dst_path}.part"
+    try:
+        async with async_open(tmp_path, "wb") as afp:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadQuotaExceeded(file.filename, max_bytes, task_quota)
+                sha.update(chunk)
+                await afp.write(chunk)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, sha.hexdigest()
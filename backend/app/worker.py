@@ -0,0 +1,71 @@
+"""建模任务 worker
+
+启动方式（可在多台机器上启动，project/ 需为共享存储）:
+    celery -A app.worker worker --loglevel=info
+
+- 每个 worker 进程同时只执行一个任务，并发数由 WORKER_CONCURRENCY 控制
+- 任务执行完成后才确认（acks_late），worker 崩溃或被杀时任务在可见性超时后重新投递，
+  重新投递的任务从断点恢复
+- 同时执行的任务总数为各节点 WORKER_CONCURRENCY 之和，排队中的任务按优先级出队
+"""
+
+import asyncio
+from celery import Celery
+from app.config.setting import settings
+from app.schemas.enums import CompTemplate, FormatOutPut
+from app.services.loop_monitor import loop_monitor
+from app.services.redis_manager import redis_manager
+from app.services.task_queue import run_modeling_task_async
+from app.utils.log_util import logger
+
+celery_app = Celery(
+    "mathmodelagent",
+    broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
+)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    task_ignore_result=True,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    worker_concurrency=settings.WORKER_CONCURRENCY,
+    # 任务内部按 TASK_TIMEOUT 超时，这里兜底强制结束卡死的进程
+    task_time_limit=settings.TASK_TIMEOUT + 600,
+    # 按优先级出队（0 最高），对应 TaskPriority 的 high/normal/low
+    broker_transport_options={
+        "visibility_timeout": settings.TASK_VISIBILITY_TIMEOUT,
+        "queue_order_strategy": "priority",
+        "priority_steps": [0, 3, 6],
+    },
+    broker_connection_retry_on_startup=True,
+)
+
+
+async def _run(
+    task_id: str, ques_all: str, comp_template: str, format_output: str, resume: bool
+):
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    try:
+        await run_modeling_task_async(
+            task_id,
+            ques_all,
+            CompTemplate(comp_template),
+            FormatOutPut(format_output),
+            resume,
+        )
+    finally:
+        # 每个任务使用新的事件循环，Redis 连接不能跨循环复用
+        await loop_monitor.stop()
+        await redis_manager.close()
+
+
+@celery_app.task(name="modeling.run")
+def run_modeling_task(
+    task_id: str, ques_all: str, comp_template: str, format_output: str
+):
+    logger.info(f"worker 开始执行任务: {task_id}")
+    # 总是尝试从断点恢复：新任务没有断点，按正常流程执行；
+    # worker 崩溃后重新投递的任务以及恢复接口提交的任务从断点继续
+    asyncio.run(_run(task_id, ques_all, comp_template, format_output, resume=True))
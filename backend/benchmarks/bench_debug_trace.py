@@ -0,0 +1,107 @@
+"""调试追踪开销基准：测量每个 LLM 轮次中工具调用校验与记忆管理的耗时
+
+对比三种情况：
+- off：DEBUG_TRACE 关闭（默认），调用点只判断一次全局变量
+- format：开启追踪但丢弃输出，只计格式化 f-string 的开销
+- icecream：原先的 ic() 调用（关闭输出，只计参数格式化与源码解析）
+
+运行（backend 目录下）:
+    ENV=dev python -m benchmarks.bench_debug_trace
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.core.agents import agent as agent_module
+from app.core.agents.agent import Agent
+from app.core.llm import llm as llm_module
+from app.core.llm.llm import LLM
+
+
+def build_history(turns: int) -> list[dict]:
+    """系统提示 + turns 轮「用户 -> 工具调用 -> 工具结果 -> 助手」"""
+    history = [{"role": "system", "content": "你是代码手"}]
+    for i in range(turns):
+        history.append({"role": "user", "content": f"子任务 {i}"})
+        history.append(
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": f"call_{i}",
+                        "type": "function",
+                        "function": {
+                            "name": "execute_code",
+                            "arguments": json.dumps({"code": "print(1)"}),
+                        },
+                    }
+                ],
+            }
+        )
+        history.append({"role": "tool", "tool_call_id": f"call_{i}", "content": "1"})
+        history.append({"role": "assistant", "content": f"子任务 {i} 完成"})
+    return history
+
+
+def set_mode(mode: str):
+    enabled = mode != "off"
+    if mode == "icecream":
+        from icecream import ic
+
+        ic.configureOutput(outputFunction=lambda s: None)
+        sink = ic
+    else:
+        def sink(message):
+            return None
+
+    for module in (llm_module, agent_module):
+        module.TRACE = enabled
+        module.trace = sink
+
+
+async def one_turn(llm: LLM, agent: Agent, history: list[dict]):
+    """一个 LLM 轮次中与追踪相关的调用：请求前校验工具调用，追加消息并检查记忆"""
+    llm._validate_and_fix_tool_calls(history)
+    agent.chat_history = list(history)
+    await agent.append_chat_history({"role": "user", "content": "继续"})
+    agent._find_safe_preserve_point()
+    agent._is_safe_cut_point(len(history) // 2)
+
+
+async def bench(mode: str, turns: int, repeat: int) -> float:
+    set_mode(mode)
+    llm = LLM(api_key=None, model="bench", base_url=None, task_id="bench")
+    agent = Agent("bench", llm, max_memory=10_000)
+    history = build_history(turns)
+    for _ in range(10):
+        await one_turn(llm, agent, history)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await one_turn(llm, agent, history)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20, help="历史中的对话轮数")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {
+        mode: asyncio.run(bench(mode, args.turns, args.repeat))
+        for mode in ("off", "format", "icecream")
+    }
+    print(f"history: {args.turns * 4 + 1} messages, median per turn")
+    for mode, seconds in results.items():
+        ratio = seconds / results["off"]
+        print(f"{mode:<10}{seconds * 1e6:>10.1f} us  x{ratio:.1f}")
+
+
+if __name__ == "__main__":
+    main()
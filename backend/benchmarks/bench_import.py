@@ -0,0 +1,107 @@
+"""启动导入耗时基准：在新的解释器中以 python -X importtime 导入 app.main
+
+输出导入总耗时（多次运行的中位数）、最耗时的模块，以及启动时是否加载了
+litellm、e2b 等应在首次使用时才导入的库。
+
+运行（backend 目录下）:
+    ENV=dev python -m benchmarks.bench_import
+    ENV=dev python -m benchmarks.bench_import --module app.worker --output import.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 不应在 API 进程启动时导入的库
+LAZY_PACKAGES = [
+    "litellm",
+    "openai",
+    "e2b_code_interpreter",
+    "jupyter_client",
+    "nbformat",
+    "ansi2html",
+    "jsonschema",
+    "pypandoc",
+    "pandas",
+    "pyarrow",
+    "celery",
+]
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """解析 -X importtime 的输出，返回 {模块: (自身耗时 us, 累计耗时 us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(module: str) -> tuple[float, dict[str, tuple[int, int]]]:
+    env = {**os.environ, "ENV": os.environ.get("ENV", "dev")}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="列出自身耗时最多的模块数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    walls, totals, runs = [], [], []
+    for _ in range(args.repeat):
+        wall, modules = run_once(args.module)
+        walls.append(wall)
+        totals.append(modules[args.module][1] / 1e6)
+        runs.append(modules)
+
+    # 各模块取多次运行的自身耗时中位数
+    names = set().union(*runs)
+    self_times = {
+        name: statistics.median(run.get(name, (0, 0))[0] for run in runs) for name in names
+    }
+    top = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[: args.top]
+    loaded = [pkg for pkg in LAZY_PACKAGES if pkg in runs[-1]]
+
+    report = {
+        "benchmark": "import",
+        "module": args.module,
+        "repeat": args.repeat,
+        "import_s": round(statistics.median(totals), 4),
+        "process_s": round(statistics.median(walls), 4),
+        "modules": len(runs[-1]),
+        "lazy_packages_loaded": loaded,
+        "top_self_us": dict((name, int(us)) for name, us in top),
+    }
+
+    print(f"import {args.module}: {report['import_s']:.3f}s "
+          f"(进程总耗时 {report['process_s']:.3f}s，{report['modules']} 个模块)")
+    print("启动时加载的延迟导入库: " + (", ".join(loaded) or "无"))
+    for name, us in top:
+        print(f"  {us / 1000:>8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""论文拼接基准：合成 100 页、300 处引用的论文，测量 UserOutput 生成 res.md 的耗时
+
+分别统计 cold：所有章节都需重新拆分（首次拼接）；one：只有一个章节变化（每完成一章
+保存一次）；warm：全部命中缓存。
+
+运行（backend 目录下）:
+    ENV=dev python -m benchmarks.bench_user_output
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from app.models.user_output import UserOutput
+from app.schemas.A2A import WriterResponse
+
+# 每页约 3000 字符
+PAGE_CHARS = 3000
+PARAGRAPH = "本文基于所给数据建立模型，对问题进行分析求解，并检验模型的稳定性与适用范围。"
+
+
+def build_paper(
+    pages: int, citations: int, ques_count: int = 4, seed: int = 0
+) -> UserOutput:
+    rng = random.Random(seed)
+    user_output = UserOutput(tempfile.gettempdir(), ques_count=ques_count)
+    sections = user_output.seq
+    # 约三分之一的引用为重复引用同一文献
+    refs = [
+        f"Author{i}, Title of paper {i}, Journal, 20{i % 25:02d}."
+        for i in range(citations * 2 // 3)
+    ]
+    per_section = pages * PAGE_CHARS // len(sections)
+    cites = [rng.choice(refs) for _ in range(citations)]
+    slots = sorted(rng.randrange(len(sections)) for _ in cites)
+
+    for idx, key in enumerate(sections):
+        chunks = []
+        size = 0
+        section_cites = [c for c, s in zip(cites, slots) if s == idx]
+        while size < per_section:
+            chunks.append(PARAGRAPH)
+            size += len(PARAGRAPH)
+            if section_cites and rng.random() < 0.5:
+                chunks.append(f"{{[^{len(chunks)}]: {section_cites.pop()}}}")
+        chunks += [f"{{[^{i}]: {c}}}" for i, c in enumerate(section_cites)]
+        user_output.set_res(key, WriterResponse(response_content="".join(chunks)))
+    return user_output
+
+
+def timed(user_output: UserOutput, dirty: list[str], repeat: int) -> float:
+    """每轮先把 dirty 中的章节重新写入（标记为需要重新拆分），再计时拼接"""
+    timings = []
+    for _ in range(repeat):
+        for key in dirty:
+            user_output.set_res(key, WriterResponse(**user_output.res[key]))
+        start = time.perf_counter()
+        user_output.get_result_to_save()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench(pages: int, citations: int, repeat: int) -> dict[str, float]:
+    user_output = build_paper(pages, citations)
+    sections = [key for key in user_output.seq if key in user_output.res]
+    return {
+        "cold": timed(user_output, sections, repeat),
+        "one": timed(user_output, sections[-1:], repeat),
+        "warm": timed(user_output, [], repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--citations", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # 同时测量 2 倍、4 倍规模，线性拼接时耗时随规模线性增长
+    print(" " * 25 + "".join(f"{k:>15}" for k in ("cold", "one", "warm")))
+    for scale in (1, 2, 4):
+        pages, citations = args.pages * scale, args.citations * scale
+        result = bench(pages, citations, args.repeat)
+        print(
+            f"{pages:>4} 页 / {citations:>5} 处引用: "
+            + "".join(f"{result[k] * 1000:>13.2f}ms" for k in ("cold", "one", "warm"))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""端到端基准：在进程内启动 API，通过 /modeling 与 WebSocket 并发执行 N 个建模任务
+
+LLM 使用回放后端（LLM_BACKEND=replay），默认回放合成的录制，也可以用 --fixture
+指定 LLM_BACKEND=record 录制的真实任务；代码解释器使用本地内核，需要可用的 Redis。
+结果（任务吞吐、各阶段 p50/p95 耗时、事件循环延迟、峰值内存、Redis 命令数、写盘字节数）
+输出到终端并保存为 JSON，便于对比不同提交的变化。
+
+运行（backend 目录下）:
+    ENV=dev python -m benchmarks.bench_workflow --tasks 4
+    ENV=dev python -m benchmarks.bench_workflow --tasks 8 --latency 0.5 --tokens-per-second 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import tempfile
+import time
+
+# 合成录制中的 agent 输出
+SOLUTION_TEXT = "采用多元线性回归与灰色预测模型，结合交叉验证评估模型的稳定性。"
+WRITER_TEXT = "本节根据模型求解结果进行分析，给出结论与建议{[^1]: Author, Title, Journal, 2024.}。"
+WRITE_FLOWS = ["firstPage", "RepeatQues", "analysisQues", "modelAssumption", "symbol", "judge"]
+BENCH_CODE = "import numpy as np\nprint(np.arange(1000).sum())"
+DATASET_ROWS = 2000
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return round(values[index], 4)
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+def configure(args, fixture_dir: str) -> None:
+    """在导入 app 之前通过环境变量覆盖配置"""
+    os.environ.setdefault("ENV", "dev")
+    os.environ["LLM_BACKEND"] = "replay"
+    os.environ["LLM_FIXTURE_DIR"] = fixture_dir
+    os.environ["LLM_FIXTURE"] = args.fixture or "synthetic"
+    os.environ["LLM_REPLAY_LATENCY"] = str(args.latency)
+    os.environ["LLM_REPLAY_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["TASK_QUEUE"] = "local"
+    os.environ["MAX_CONCURRENT_TASKS"] = str(args.tasks)
+    os.environ["MAX_TASKS_PER_USER"] = "0"
+    # 不访问外部文献检索
+    os.environ["OPENALEX_EMAIL"] = ""
+    for role in ("COORDINATOR", "MODELER", "CODER", "WRITER"):
+        os.environ.setdefault(f"{role}_MODEL", "deepseek/deepseek-chat")
+
+
+async def write_synthetic_fixture(fixture_dir: str, ques_count: int) -> None:
+    """生成覆盖完整工作流的合成录制，token 数按内容长度估算"""
+    from litellm import ModelResponse
+    from app.core.llm.replay import LLMFixtureStore
+
+    store = LLMFixtureStore(fixture_dir)
+    path = store.path("synthetic")
+    if os.path.exists(path):
+        os.remove(path)
+
+    async def add(agent: str, stage: str | None, content: str, tool_calls=None):
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        completion_tokens = max(1, len(content) * 2 // 3)
+        response = ModelResponse(
+            model="deepseek-chat",
+            choices=[{"index": 0, "message": message, "finish_reason": "stop"}],
+            usage={
+                "prompt_tokens": 2000,
+                "completion_tokens": completion_tokens,
+                "total_tokens": 2000 + completion_tokens,
+            },
+        )
+        kwargs = {"metadata": {"agent_name": agent, "stage": stage}}
+        await store.record("synthetic", kwargs, response)
+
+    ques_keys = [f"ques{i}" for i in range(1, ques_count + 1)]
+    questions = {
+        "title": "基准测试题目",
+        "background": "合成的建模问题，用于端到端基准测试。",
+        "ques_count": ques_count,
+        **{key: f"第{key[4:]}问：建立模型并预测。" for key in ques_keys},
+    }
+    await add("CoordinatorAgent", None, f"```json\n{json.dumps(questions, ensure_ascii=False)}\n```")
+
+    solution_keys = ["eda", *ques_keys, "sensitivity_analysis"]
+    solution = {key: SOLUTION_TEXT for key in solution_keys}
+    await add("ModelerAgent", None, f"```json\n{json.dumps(solution, ensure_ascii=False)}\n```")
+
+    for i, key in enumerate(solution_keys):
+        tool_call = {
+            "id": f"call_{i}",
+            "type": "function",
+            "function": {
+                "name": "execute_code",
+                "arguments": json.dumps({"code": BENCH_CODE}),
+            },
+        }
+        await add("CoderAgent", key, "", [tool_call])
+        await add("CoderAgent", key, f"{key} 求解完成。{SOLUTION_TEXT}")
+
+    for key in solution_keys + WRITE_FLOWS:
+        await add("WriterAgent", key, WRITER_TEXT * 20)
+    # 对话历史压缩时的总结
+    for _ in range(10):
+        await add("memory", None, "以上对话完成了数据分析与模型求解。")
+
+
+def dataset_bytes(rows: int = DATASET_ROWS) -> bytes:
+    lines = ["id,x1,x2,x3,y"]
+    lines += [f"{i},{i % 97},{(i * 7) % 13},{i / 3:.3f},{(i % 11) * 1.5}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class LoopLagMonitor:
+    """周期性休眠，以实际唤醒时间与预期的差值作为事件循环延迟"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def rss_mb() -> tuple[float, float]:
+    """当前进程与已回收子进程（内核）的峰值 RSS（MB）"""
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(self_peak, 1), round(children_peak, 1)
+
+
+def current_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except OSError:
+        return None
+
+
+def process_write_bytes() -> int | None:
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+async def redis_commands() -> int:
+    from app.services.redis_manager import redis_manager
+
+    client = await redis_manager.get_client()
+    info = await client.info("stats")
+    return int(info["total_commands_processed"])
+
+
+async def run_task(client, base_url: str, ws_url: str, index: int, timeout: float) -> dict:
+    import websockets
+
+    start = time.perf_counter()
+    result = {"index": index, "task_id": None, "status": "timeout", "messages": 0}
+    response = await client.post(
+        f"{base_url}/modeling",
+        data={
+            "ques_all": "基准测试题目：根据数据建立模型并预测。",
+            "comp_template": "CHINA",
+            "format_output": "Markdown",
+        },
+        files=[("files", ("data.csv", dataset_bytes(), "text/csv"))],
+    )
+    response.raise_for_status()
+    task_id = result["task_id"] = response.json()["task_id"]
+    result["submit_s"] = round(time.perf_counter() - start, 4)
+
+    try:
+        async with asyncio.timeout(timeout):
+            async with websockets.connect(f"{ws_url}/task/{task_id}", max_size=None) as ws:
+                async for raw in ws:
+                    message = json.loads(raw)
+                    result["messages"] += 1
+                    result.setdefault("first_message_s", round(time.perf_counter() - start, 4))
+                    content = message.get("content") or ""
+                    if message.get("msg_type") != "system":
+                        continue
+                    if content == "任务处理完成":
+                        result["status"] = "completed"
+                        break
+                    if content.startswith(("任务处理超时", "任务执行失败")):
+                        result["status"] = "failed"
+                        break
+    except TimeoutError:
+        pass
+    result["duration_s"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def stage_latencies(task_ids: list[str]) -> dict:
+    from app.services.tracing import load_spans
+
+    stages: dict[str, list[float]] = {}
+    for task_id in task_ids:
+        for span in load_spans(task_id):
+            if span["kind"] != "stage" or not span.get("end"):
+                continue
+            name = span["name"].split(":")[0]
+            stages.setdefault(name, []).append(span["end"] - span["start"])
+    return {name: summarize(values) for name, values in sorted(stages.items())}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench(args, fixture_dir: str) -> dict:
+    import httpx
+    import uvicorn
+    from app.main import app
+    from app.services.tracing import tracer
+    from app.utils.common_utils import create_work_dir
+
+    if not args.fixture:
+        await write_synthetic_fixture(fixture_dir, args.questions)
+
+    port = free_port()
+    # 推送接口在下一条消息到达前察觉不到客户端断开，限定关闭等待时间，避免统计结束后一直挂起
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+            lifespan="on",
+            timeout_graceful_shutdown=5,
+        )
+    )
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    ws_url = f"ws://127.0.0.1:{port}"
+    monitor = LoopLagMonitor()
+    baseline_rss = current_rss_mb()
+    redis_before = await redis_commands()
+    write_before = process_write_bytes()
+
+    monitor.start()
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=60) as client:
+        results = await asyncio.gather(
+            *[
+                run_task(client, base_url, ws_url, i, args.task_timeout)
+                for i in range(args.tasks)
+            ]
+        )
+    wall = time.perf_counter() - start
+    await monitor.stop()
+
+    # 任务完成后还会导出 docx，等待后台收尾再统计
+    await asyncio.sleep(args.settle)
+    tracer.exporter.flush()
+    redis_after = await redis_commands()
+    write_after = process_write_bytes()
+    server.should_exit = True
+    await serve
+
+    task_ids = [r["task_id"] for r in results if r["task_id"]]
+    completed = [r for r in results if r["status"] == "completed"]
+    self_peak, kernel_peak = rss_mb()
+    work_dir_bytes = sum(dir_bytes(create_work_dir(task_id)) for task_id in task_ids)
+
+    return {
+        "benchmark": "workflow",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "tasks": args.tasks,
+            "questions": args.questions,
+            "fixture": args.fixture or "synthetic",
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+        },
+        "wall_s": round(wall, 3),
+        "completed": len(completed),
+        "tasks_per_hour": round(len(completed) / wall * 3600, 2) if wall else None,
+        "task_duration_s": summarize([r["duration_s"] for r in completed]),
+        "first_message_s": summarize(
+            [r["first_message_s"] for r in results if "first_message_s" in r]
+        ),
+        "stage_s": stage_latencies(task_ids),
+        "loop_lag_s": {
+            **summarize(monitor.samples),
+            "p99": percentile(monitor.samples, 99),
+        },
+        "memory_mb": {
+            "baseline_rss": baseline_rss,
+            "peak_rss": self_peak,
+            "peak_kernel_rss": kernel_peak,
+            # API 进程的增量按任务均摊，加上单个内核的峰值
+            "peak_rss_per_task": round(
+                (self_peak - (baseline_rss or 0)) / args.tasks + kernel_peak, 1
+            ),
+        },
+        "redis_commands": redis_after - redis_before,
+        "redis_commands_per_task": round((redis_after - redis_before) / args.tasks, 1),
+        "bytes_written": {
+            "work_dirs": work_dir_bytes,
+            "process": (
+                write_after - write_before
+                if write_before is not None and write_after is not None
+                else None
+            ),
+        },
+        "tasks": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=4, help="并发任务数")
+    parser.add_argument("--questions", type=int, default=2, help="合成题目的小问数")
+    parser.add_argument("--fixture", default=None, help="回放的录制名称，默认使用合成录制")
+    parser.add_argument("--fixture-dir", default=None, help="录制所在目录")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次 LLM 调用的固定延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="模拟的生成速度")
+    parser.add_argument("--task-timeout", type=float, default=600, help="单个任务的超时（秒）")
+    parser.add_argument("--settle", type=float, default=2.0, help="任务结束后等待收尾的时间（秒）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or (
+        "project/llm_fixtures" if args.fixture else tempfile.mkdtemp(prefix="bench-fixture-")
+    )
+    configure(args, fixture_dir)
+    report = asyncio.run(bench(args, fixture_dir))
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"workflow-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'completed':<24}{report['completed']}/{args.tasks}")
+    print(f"{'tasks/hour':<24}{report['tasks_per_hour']}")
+    print(f"{'task p50/p95 (s)':<24}{report['task_duration_s']['p50']} / {report['task_duration_s']['p95']}")
+    for name, stage in report["stage_s"].items():
+        print(f"{'stage ' + name + ' p50/p95':<24}{stage['p50']} / {stage['p95']}")
+    lag = report["loop_lag_s"]
+    print(f"{'loop lag p95/max (s)':<24}{lag['p95']} / {lag['max']}")
+    print(f"{'peak RSS/task (MB)':<24}{report['memory_mb']['peak_rss_per_task']}")
+    print(f"{'redis commands':<24}{report['redis_commands']}")
+    print(f"{'bytes written':<24}{report['bytes_written']}")
+    print(f"结果已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()